@@ -1,10 +1,14 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, redirect, stream_with_context, url_for
 from flask_cors import CORS
 import recorder
+from jobs import JobQueue, QueueFull
+from status_push import StatusChannel, StreamLimit
+from audio_serving import serve_file
+import metrics
 import json
-import time
-import threading
+import multiprocessing
 import os
+import threading
 
 app = Flask(__name__)
 # More permissive CORS settings for development
@@ -15,146 +19,297 @@ CORS(app, resources={r"/*": {"origins": "*"}})
 def test():
     return jsonify({"status": "API is working"})
 
-# Rest of your 
-# Initialize the recorder
-recorder.initialize_audio()
+# The audio device is opened by the first recording, not here, so the API
+# starts on hosts without one. Import the SDKs (or load the local STT model)
+# in the background instead of on the first request; /api/ready reports when
+# that is done. Not in spawned child processes (local STT workers).
+if os.getenv("WARM_UP", "1") == "1" and multiprocessing.parent_process() is None:
+    threading.Thread(target=recorder.warm_up, name="warm-up", daemon=True).start()
 
-# Status variables
-recording_status = {
-    "is_recording": False,
-    "start_time": None,
-    "elapsed_time": 0
-}
+# Worker pool for transcription + form extraction
+jobs = JobQueue(max_workers=int(os.getenv("PROCESS_WORKERS", "4")),
+                max_pending=int(os.getenv("PROCESS_MAX_PENDING", "32")),
+                store=recorder.shared_state)
 
-# Background recording thread
-recording_thread = None
-@app.route('/api/test', methods=['GET'])
+# Push channel for recording state and input levels (replaces /api/status polling)
+status_channel = StatusChannel(recorder.get_live_status,
+                               rate=float(os.getenv("STATUS_PUSH_RATE", "10")),
+                               heartbeat=float(os.getenv("STATUS_PUSH_HEARTBEAT", "15")))
+# Open SSE streams per process; see gunicorn.conf.py for how this relates to threads
+streams = StreamLimit(int(os.getenv("WEB_STREAMS", "240")))
+# Over the limit: end the stream at once and have EventSource reconnect later
+STREAMS_BUSY = "retry: 10000\n\n"
 
-def background_recording():
-    """Background thread for continuous recording"""
-    global recording_status
+def get_session_id():
+    """Session ID from the JSON body or query string; defaults to the shared session"""
+    data = request.get_json(silent=True) or {}
+    return data.get('session_id') or request.args.get('session_id') or recorder.DEFAULT_SESSION
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness: storage reachable, upstreams configured, clients loaded (503 until then).
     
-    while recording_status["is_recording"]:
-        recorder.record_chunk()
-        time.sleep(0.01)  # Small delay to prevent CPU overload
-        
-        # Update elapsed time
-        if recording_status["start_time"]:
-            recording_status["elapsed_time"] = time.time() - recording_status["start_time"]
+    /api/test is the liveness check: it answers as soon as the process serves requests.
+    """
+    is_ready, checks = recorder.readiness()
+    return jsonify({"ready": is_ready, "checks": checks}), 200 if is_ready else 503
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    """Get the current recording status"""
-    return jsonify({
-        "is_recording": recording_status["is_recording"],
-        "elapsed_time": recording_status["elapsed_time"]
-    })
+    """Get the current recording status of a session"""
+    return jsonify(recorder.get_status(get_session_id()))
+
+@app.route('/api/status-stream', methods=['GET'])
+def stream_status():
+    """Push recording state, elapsed time and input levels over Server-Sent Events"""
+    return Response(streams.wrap(status_channel.subscribe(get_session_id()), STREAMS_BUSY),
+                    mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/status-stream/stats', methods=['GET'])
+def get_status_stream_stats():
+    """Get subscriber and frame counters of the status push channel, and the stream limit"""
+    return jsonify({**status_channel.stats(), **streams.stats()})
+
+@app.route('/api/sessions', methods=['GET'])
+def list_sessions():
+    """List sessions that are currently recording"""
+    return jsonify({"sessions": recorder.active_sessions()})
 
 @app.route('/api/start-recording', methods=['POST'])
 def start_recording():
-    """Start the recording process"""
-    global recording_status, recording_thread
-    
-    if not recording_status["is_recording"]:
-        # Start recording
-        recorder.start_recording()
-        
-        # Update status
-        recording_status["is_recording"] = True
-        recording_status["start_time"] = time.time()
-        recording_status["elapsed_time"] = 0
-        
-        # Start background thread for recording
-        recording_thread = threading.Thread(target=background_recording)
-        recording_thread.daemon = True
-        recording_thread.start()
-        
-        return jsonify({"status": "recording_started", "time": 0})
+    """Start the recording process for a session.
     
-    return jsonify({"status": "already_recording", "time": recording_status["elapsed_time"]})
+    {"append_to": recording_id} records a follow-up onto a processed recording;
+    process it afterwards with {"incremental": true}.
+    """
+    session_id = get_session_id()
+    data = request.get_json(silent=True) or {}
+    result = recorder.start_recording(session_id, append_to=data.get('append_to'))
+    result["session_id"] = session_id
+    if result.get("status") == "audio_unavailable":
+        return jsonify(result), 503
+    if "error" in result:
+        return jsonify(result), 409
+    return jsonify(result)
 
 @app.route('/api/stop-recording', methods=['POST'])
 def stop_recording():
-    """Stop recording and process"""
-    global recording_status, recording_thread
+    """Stop recording a session and process"""
+    session_id = get_session_id()
+    result = recorder.stop_recording(session_id)
     
-    if recording_status["is_recording"]:
-        # Update status first
-        recording_status["is_recording"] = False
-        
-        # Wait for thread to complete
-        if recording_thread and recording_thread.is_alive():
-            recording_thread.join(timeout=1.0)
-        
-        # Stop the recording
-        result = recorder.stop_recording()
-        
-        # Reset status
-        recording_status["start_time"] = None
-        recording_status["elapsed_time"] = 0
-        
-        return jsonify({"status": "processing_started", "filename": result.get("filename")})
+    if result["status"] == "recording_stopped":
+        return jsonify({"status": "processing_started", "recording_id": result["recording_id"],
+                        "session_id": session_id})
     
-    return jsonify({"status": "not_recording"})
+    return jsonify({"status": "not_recording", "session_id": session_id})
 
 @app.route('/api/process', methods=['POST'])
 def process_recording():
-    """Process the recording and generate form data"""
+    """Queue the recording for processing; poll /api/jobs/<job_id> for the form.
+    
+    With "incremental": true only a follow-up's new audio is transcribed and
+    only transcript changes are re-extracted, keeping manual form edits.
+    With "trace": true (or ?trace=1) the finished job's stats include the
+    timing spans of every pipeline stage.
+    """
     data = request.json
-    filename = data.get('filename')
+    recording_id = data.get('recording_id')
     
-    if not filename:
-        return jsonify({"error": "No filename provided"}), 400
+    if not recording_id:
+        return jsonify({"error": "No recording_id provided"}), 400
     
-    # Process the recording
-    result = recorder.process_recording(filename)
+    # A double click joins the job already queued or running for this recording
+    job_id = jobs.active(recording_id)
+    if job_id is not None:
+        return jsonify({"status": "queued", "job_id": job_id}), 202
+    conflict = recorder.processing_conflict(recording_id)
+    if conflict:
+        return jsonify({"error": conflict}), 409
     
-    return jsonify(result)
+    fn = recorder.update_recording if data.get('incremental') else recorder.process_recording
+    if data.get('trace') or request.args.get('trace') == '1':
+        fn = metrics.traced(fn)
+    try:
+        job_id = jobs.submit(fn, recording_id, key=recording_id)
+    except QueueFull:
+        # Backpressure: tell the client to retry instead of piling up work
+        response = jsonify({"error": "Processing queue is full, try again shortly"})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    
+    return jsonify({"status": "queued", "job_id": job_id}), 202
+
+@app.route('/api/process-stream', methods=['GET'])
+def process_recording_stream():
+    """Process the recording, pushing form fields over Server-Sent Events as they fill in.
+    
+    The work runs as a queue job, so it counts against PROCESS_WORKERS and
+    finishes even if the client disconnects; the stream only relays it.
+    Opening it again while the job runs replays the events so far.
+    """
+    recording_id = request.args.get('recording_id')
+    
+    if not recording_id:
+        return jsonify({"error": "No recording_id provided"}), 400
+    if jobs.active(recording_id) is None:
+        conflict = recorder.processing_conflict(recording_id)
+        if conflict:
+            return jsonify({"error": conflict}), 409
+    try:
+        job_id = jobs.submit(recorder.stream_job, recording_id, key=recording_id, stream=True)
+    except QueueFull:
+        response = jsonify({"error": "Processing queue is full, try again shortly"})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    
+    def frame(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    def events():
+        finished = False
+        for item in jobs.follow(job_id):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            event, data = item
+            finished = finished or event in ("form", "failed")
+            yield frame(event, data)
+        if not finished:
+            # Joined a job submitted by /api/process, which has no events
+            job = jobs.get(job_id) or {}
+            if job.get("status") == "done":
+                yield frame("form", job["result"])
+            else:
+                yield frame("failed", {"error": job.get("error") or "Processing failed"})
+    
+    error = json.dumps({"error": "Too many open streams, try again shortly"})
+    busy = f"event: failed\ndata: {error}\n\n"
+    return Response(stream_with_context(streams.wrap(events(), busy)),
+                    mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status, current stage and result of a processing job"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs', methods=['GET'])
+def get_job_stats():
+    """Get processing queue occupancy"""
+    return jsonify(jobs.stats())
+
+@app.route('/api/upstream/stats', methods=['GET'])
+def get_upstream_stats():
+    """Get per-upstream latency histograms and retry/hedge counters"""
+    return jsonify(recorder.upstream_caller.stats())
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get hit/miss counters and size of the transcription/extraction cache"""
+    return jsonify(recorder.result_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Pipeline stage histograms in the Prometheus text format (per worker process)"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/recordings', methods=['GET'])
+def list_recordings():
+    """Paginated recording history, newest first; filter with status= and q= (patient)"""
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 20))
+    except ValueError:
+        return jsonify({"error": "page and per_page must be integers"}), 400
+    return jsonify(recorder.recordings.list(page, per_page, status=request.args.get('status'),
+                                            query=request.args.get('q')))
+
+@app.route('/api/recordings/<recording_id>', methods=['GET'])
+def get_recording(recording_id):
+    """Get the stored metadata of a recording"""
+    recording = recorder.recordings.get(recording_id)
+    if recording is None:
+        return jsonify({"error": "Recording not found"}), 404
+    return jsonify(recording)
 
 @app.route('/api/get-form', methods=['GET'])
 def get_form():
-    """Get the form data"""
-    try:
-        with open("filled_form100.json", "r", encoding="utf-8") as file:
-            form_data = json.load(file)
-        return jsonify(form_data)
-    except FileNotFoundError:
+    """Get the form data of a recording (recording_id=, default the latest)"""
+    form_data = recorder.get_form(request.args.get('recording_id'))
+    if form_data is None:
         return jsonify({"error": "Form data not found"}), 404
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return jsonify(form_data)
 
 @app.route('/api/get-transcription', methods=['GET'])
 def get_transcription():
-    """Get the raw transcription text"""
-    try:
-        with open("transcription.txt", "r", encoding="utf-8") as file:
-            transcription = file.read()
-        return jsonify({"transcription": transcription})
-    except FileNotFoundError:
+    """Get the raw transcription text of a recording (recording_id=, default the latest)"""
+    transcription = recorder.get_transcription(request.args.get('recording_id'))
+    if transcription is None:
         return jsonify({"error": "Transcription not found"}), 404
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return jsonify({"transcription": transcription})
+
+@app.route('/api/save-transcription', methods=['POST'])
+def save_transcription():
+    """Save a corrected transcript (recording_id=); re-extract with /api/process and "incremental": true"""
+    data = request.get_json(silent=True) or {}
+    recording_id = request.args.get('recording_id') or recorder.recordings.latest()
+    if recorder.recordings.get(recording_id) is None:
+        return jsonify({"error": "Recording not found"}), 404
+    if not isinstance(data.get('transcription'), str):
+        return jsonify({"error": "No transcription provided"}), 400
+    recorder.recordings.write_blob(recording_id, "transcript", data['transcription'])
+    return jsonify({"status": "transcription_saved", "recording_id": recording_id})
 
 @app.route('/api/save-form', methods=['POST'])
 def save_form():
-    """Save the edited form data"""
+    """Save the edited form data of a recording (recording_id=, default the latest)"""
     try:
         form_data = request.json
+        recording_id = request.args.get('recording_id') or recorder.recordings.latest()
         
-        with open("filled_form100.json", "w", encoding="utf-8") as file:
-            json.dump(form_data, file, ensure_ascii=False, indent=4)
+        if recorder.recordings.get(recording_id) is None:
+            return jsonify({"error": "Recording not found"}), 404
+        recorder.save_filled_form(recording_id, form_data)
         
-        return jsonify({"status": "form_saved"})
+        return jsonify({"status": "form_saved", "recording_id": recording_id})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/get-audio/<filename>', methods=['GET'])
-def get_audio(filename):
-    """Get the audio file"""
-    if os.path.exists(filename):
-        return send_file(filename, mimetype='audio/wav')
+@app.route('/api/get-audio/<recording_id>', methods=['GET', 'HEAD'])
+def get_audio(recording_id):
+    """Get the audio of a recording; only stored recording IDs resolve to a file.
+
+    Supports Range and conditional requests. ?format=opus redirects to the
+    compact Opus copy for playback once it has been encoded, and to the WAV
+    until then; the redirect itself is never cached.
+    """
+    if recorder.recordings.get(recording_id) is None:
+        return jsonify({"error": "Audio file not found"}), 404
+    if request.args.get('format') == 'opus':
+        endpoint = 'get_audio_opus' if recorder.playback_rendition(recording_id) else 'get_audio'
+        response = redirect(url_for(endpoint, recording_id=recording_id))
+        response.headers["Cache-Control"] = "no-store"
+        return response
+    path = recorder.recordings.path(recording_id, "audio")
+    if os.path.exists(path):
+        return serve_file(request, path, 'audio/wav')
     return jsonify({"error": "Audio file not found"}), 404
 
+@app.route('/api/get-audio/<recording_id>/opus', methods=['GET', 'HEAD'])
+def get_audio_opus(recording_id):
+    """Get the Opus playback copy of a recording (404 until it has been encoded)"""
+    if recorder.recordings.get(recording_id) is None:
+        return jsonify({"error": "Audio file not found"}), 404
+    path = recorder.playback_rendition(recording_id)
+    if path is None:
+        return jsonify({"error": "Opus copy not ready"}), 404
+    return serve_file(request, path, 'audio/ogg')
+
 @app.errorhandler(Exception)
 def handle_error(e):
     """Global error handler"""
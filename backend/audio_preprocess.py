@@ -0,0 +1,231 @@
+"""Shrink recordings to a compact speech format before uploading them to STT.
+
+Recordings are captured at 44.1 kHz, up to stereo, int16. Speech
+recognition only needs 16 kHz mono, so we downmix and resample with NumPy
+and cut long silences (see vad.py) before upload. The WAV is read and
+resampled in blocks, so only the 16 kHz mono result grows with the
+recording's length. FLAC/Opus encoding uses soundfile and falls back to
+16-bit WAV when it is not installed.
+"""
+import math
+import os
+import time
+import wave
+from io import BytesIO
+
+import numpy as np
+
+import metrics
+import vad
+
+TARGET_RATE = 16000
+# "wav", "flac" or "opus"
+DEFAULT_FORMAT = os.getenv("STT_AUDIO_FORMAT", "flac")
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1") == "1"
+# Source frames read and resampled at a time (about 1.5 s at 44.1 kHz)
+BLOCK_FRAMES = 65536
+
+
+def read_blocks(wf, frames, block=BLOCK_FRAMES):
+    """(n, channels) int16 blocks of the next `frames` frames of an open WAV"""
+    if wf.getsampwidth() != 2:
+        raise ValueError(f"Unsupported sample width: {wf.getsampwidth()}")
+    channels = wf.getnchannels()
+    seconds = 0.0
+    read = 0
+    try:
+        while frames > 0:
+            started = time.perf_counter()
+            data = wf.readframes(min(block, frames))
+            seconds += time.perf_counter() - started
+            if not data:
+                break
+            read += len(data)
+            frames -= len(data) // (2 * channels)
+            yield np.frombuffer(data, dtype='<i2').reshape(-1, channels)
+    finally:
+        # Reading is interleaved with resampling; report only the time spent reading
+        metrics.record("file_read", seconds, bytes=read)
+
+
+def downmix(samples):
+    """Average channels into a float32 mono signal in [-1, 1)"""
+    return samples.astype(np.float32).mean(axis=1) / 32768.0
+
+
+class Resampler:
+    """Polyphase windowed-sinc resampler fed block by block.
+
+    Output sample n sits at source position n * src_rate / dst_rate; its
+    fractional part takes one of `up` values, so one low-pass kernel per
+    phase is computed up front. Only 2 * half_width source samples are
+    kept between blocks.
+    """
+
+    def __init__(self, src_rate, dst_rate, half_width=32):
+        g = math.gcd(src_rate, dst_rate)
+        self.up = dst_rate // g
+        self.down = src_rate // g
+        self.half_width = half_width
+        # Keep 90% of the lower Nyquist band to leave room for the filter roll-off
+        cutoff = 0.45 * min(1.0, dst_rate / src_rate)
+        # Distance from output sample to each tap, in source samples, per phase
+        d = (np.arange(self.up)[:, None] / self.up
+             + (half_width - 1 - np.arange(2 * half_width))[None, :])
+        window = 0.54 + 0.46 * np.cos(np.pi * d / half_width)
+        kernels = 2 * cutoff * np.sinc(2 * cutoff * d) * window
+        self.kernels = (kernels / kernels.sum(axis=1, keepdims=True)).astype(np.float32)
+        # Zeros before the first sample, as if the signal were silent before it
+        self._buffer = np.zeros(half_width, dtype=np.float32)
+        self._buffer_start = -half_width
+        self._next = 0
+        self._consumed = 0
+
+    def process(self, mono):
+        """Resampled output for the samples so far that no longer need more input"""
+        self._buffer = np.concatenate((self._buffer, mono))
+        self._consumed += len(mono)
+        return self._emit(None)
+
+    def flush(self):
+        """The rest of the output, with silence assumed after the last sample"""
+        self._buffer = np.concatenate((self._buffer, np.zeros(self.half_width, dtype=np.float32)))
+        return self._emit(self._consumed * self.up // self.down)
+
+    def _emit(self, total, chunk=16384):
+        # Last source index whose full kernel window has arrived
+        last = self._buffer_start + len(self._buffer) - 1 - self.half_width
+        end = ((last + 1) * self.up - 1) // self.down + 1 if last >= 0 else 0
+        if total is not None:
+            end = min(end, total)
+        taps = np.arange(2 * self.half_width)
+        parts = []
+        # A bounded number of outputs at a time keeps the tap matrix small
+        for start in range(self._next, end, chunk):
+            n = np.arange(start, min(start + chunk, end))
+            base = n * self.down // self.up - self.half_width + 1 - self._buffer_start
+            window = self._buffer[base[:, None] + taps]
+            parts.append(np.einsum('ij,ij->i', window, self.kernels[n * self.down % self.up]))
+        self._next = max(self._next, end)
+        # Drop the samples no later output needs
+        keep = self._next * self.down // self.up - self.half_width + 1 - self._buffer_start
+        if keep > 0:
+            self._buffer = self._buffer[keep:]
+            self._buffer_start += keep
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+
+def resample_blocks(blocks, frames, src_rate, dst_rate=TARGET_RATE):
+    """Downmix and resample int16 blocks holding `frames` frames into one float32 array"""
+    if src_rate == dst_rate:
+        out = np.empty(frames, dtype=np.float32)
+        position = 0
+        for block in blocks:
+            out[position:position + len(block)] = downmix(block)
+            position += len(block)
+        return out[:position]
+
+    resampler = Resampler(src_rate, dst_rate)
+    # Preallocated so the blocks never coexist with a concatenated copy
+    out = np.empty(frames * resampler.up // resampler.down, dtype=np.float32)
+    position = 0
+    for block in blocks:
+        chunk = resampler.process(downmix(block))
+        out[position:position + len(chunk)] = chunk
+        position += len(chunk)
+    chunk = resampler.flush()
+    out[position:position + len(chunk)] = chunk
+    return out[:position + len(chunk)]
+
+
+def resample(mono, src_rate, dst_rate=TARGET_RATE):
+    """Resample a float mono signal"""
+    if src_rate == dst_rate or len(mono) == 0:
+        return mono
+    resampler = Resampler(src_rate, dst_rate)
+    return np.concatenate((resampler.process(mono.astype(np.float32)), resampler.flush()))
+
+
+def load_mono(path, rate=TARGET_RATE, start_frame=0):
+    """16 kHz (or `rate`) float32 mono of an int16 WAV from start_frame on, read in blocks"""
+    with wave.open(path, 'rb') as wf:
+        wf.setpos(start_frame)
+        frames = wf.getnframes() - start_frame
+        return resample_blocks(read_blocks(wf, frames), frames, wf.getframerate(), rate)
+
+
+def to_int16(mono):
+    return (np.clip(mono, -1.0, 1.0 - 1 / 32768) * 32768).astype('<i2')
+
+
+def encode(mono, rate, fmt=DEFAULT_FORMAT):
+    """Encode float mono audio; returns (BytesIO, format actually used)"""
+    if fmt in ("flac", "opus"):
+        try:
+            import soundfile
+        except ImportError:
+            print(f"soundfile not installed, uploading WAV instead of {fmt}")
+            fmt = "wav"
+        else:
+            buffer = BytesIO()
+            if fmt == "flac":
+                soundfile.write(buffer, to_int16(mono), rate, format='FLAC', subtype='PCM_16')
+            else:
+                soundfile.write(buffer, mono, rate, format='OGG', subtype='OPUS')
+            buffer.seek(0)
+            buffer.name = f"audio.{'ogg' if fmt == 'opus' else 'flac'}"
+            return buffer, fmt
+
+    buffer = BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(to_int16(mono).tobytes())
+    buffer.seek(0)
+    buffer.name = "audio.wav"
+    return buffer, "wav"
+
+
+def _prepare(mono, original_bytes, fmt, rate, trim):
+    audio_seconds = len(mono) / rate
+    time_map = vad.TimeMap([(0.0, 0.0, audio_seconds)])
+    if trim:
+        mono, time_map = vad.trim_silence(mono, rate)
+    payload, used_format = encode(mono, rate, fmt)
+
+    upload_bytes = payload.getbuffer().nbytes
+    stats = {
+        "audio_format": used_format,
+        "audio_seconds": round(audio_seconds, 2),
+        "upload_seconds": round(len(mono) / rate, 2),
+        "speech_segments": len(time_map.pieces),
+        "original_bytes": original_bytes,
+        "upload_bytes": upload_bytes,
+        "bytes_saved": original_bytes - upload_bytes,
+        "compression_ratio": round(original_bytes / upload_bytes, 2) if upload_bytes else None,
+    }
+    return payload, stats, time_map
+
+
+def prepare_for_stt(path, fmt=DEFAULT_FORMAT, rate=TARGET_RATE, trim=VAD_ENABLED, start_frame=0):
+    """Downmix, resample, trim silence and encode a recording for upload.
+
+    Returns (file-like payload, stats, time_map): stats reports the byte and
+    duration savings, time_map maps upload timestamps to the original audio,
+    counted from start_frame (e.g. where a follow-up recording begins).
+    """
+    with wave.open(path, 'rb') as wf:
+        wf.setpos(start_frame)
+        frames = wf.getnframes() - start_frame
+        mono = resample_blocks(read_blocks(wf, frames), frames, wf.getframerate(), rate)
+        original_bytes = frames * wf.getnchannels() * wf.getsampwidth()
+    return _prepare(mono, original_bytes, fmt, rate, trim)
+
+
+def prepare_pcm(pcm, channels, src_rate, fmt=DEFAULT_FORMAT, rate=TARGET_RATE, trim=VAD_ENABLED):
+    """Same as prepare_for_stt for raw interleaved int16 PCM, e.g. a live segment"""
+    samples = np.frombuffer(pcm, dtype='<i2').reshape(-1, channels)
+    blocks = (samples[i:i + BLOCK_FRAMES] for i in range(0, len(samples), BLOCK_FRAMES))
+    mono = resample_blocks(blocks, len(samples), src_rate, rate)
+    return _prepare(mono, len(pcm), fmt, rate, trim)
@@ -0,0 +1,144 @@
+"""HTTP serving of recorded audio for playback.
+
+Files are memory-mapped once and served from the mapping: a Range request
+copies only the requested slice out of the page cache, and full responses
+stream in blocks instead of reading the whole WAV up front. Every response
+carries a strong ETag and Last-Modified so browsers can revalidate with
+If-None-Match / If-Modified-Since and resume with If-Range.
+"""
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response
+from werkzeug.http import http_date, parse_date, quote_etag, unquote_etag
+
+BLOCK_SIZE = 256 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def file_etag(stat):
+    """Strong validator from size and modification time"""
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single "bytes=" range, or None to send the whole file.
+
+    Multi-range requests are answered with the whole file, as RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+class MappedFiles:
+    """Small LRU of read-only memory maps, keyed by path and revalidated by ETag"""
+
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self._maps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, etag, size):
+        with self._lock:
+            entry = self._maps.get(path)
+            if entry is not None and entry[0] == etag:
+                self._maps.move_to_end(path)
+                return entry[1]
+
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        with self._lock:
+            # Evicted maps are not closed here: a response may still be
+            # streaming from them; they are released once unreferenced.
+            self._maps[path] = (etag, mapped)
+            self._maps.move_to_end(path)
+            while len(self._maps) > self.capacity:
+                self._maps.popitem(last=False)
+        return mapped
+
+
+mapped_files = MappedFiles()
+
+
+def _blocks(mapped, start, end):
+    for offset in range(start, end + 1, BLOCK_SIZE):
+        yield mapped[offset:min(offset + BLOCK_SIZE, end + 1)]
+
+
+def serve_file(request, path, mimetype, max_age=3600):
+    """Flask response for path honouring Range, If-Range and conditional headers"""
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": quote_etag(etag),
+        "Last-Modified": http_date(stat.st_mtime),
+        "Cache-Control": f"private, max-age={max_age}",
+    }
+
+    # Conditional GET: the client's copy is still current
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        tags = [unquote_etag(tag.strip())[0] for tag in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status=304, headers=headers)
+    else:
+        since = parse_date(request.headers.get("If-Modified-Since"))
+        if since is not None and int(stat.st_mtime) <= since.timestamp():
+            return Response(status=304, headers=headers)
+
+    # If-Range: only honour the range if the client's copy is the current one
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and if_range and unquote_etag(if_range)[0] != etag:
+        range_header = None
+
+    size = stat.st_size
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status=416, headers=headers)
+
+    if size == 0:
+        return Response(b"", status=200, mimetype=mimetype, headers=headers)
+
+    start, end = byte_range if byte_range else (0, size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    status = 200
+    if byte_range:
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    if request.method == "HEAD":
+        return Response(status=status, mimetype=mimetype, headers=headers)
+
+    mapped = mapped_files.get(path, etag, size)
+    if end - start < BLOCK_SIZE:
+        body = mapped[start:end + 1]
+    else:
+        body = _blocks(mapped, start, end)
+    response = Response(body, status=status, mimetype=mimetype, headers=headers)
+    # Keep werkzeug from recomputing the length of a streamed body
+    response.direct_passthrough = True
+    return response
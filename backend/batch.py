@@ -0,0 +1,280 @@
+"""Process a directory or manifest of existing WAV recordings offline.
+
+    python batch.py /path/to/wavs --workers 4 --stt-rpm 30 --llm-rpm 60
+    python batch.py manifest.csv --output batch_output
+
+A manifest is a .csv with a "path" column (and optionally "session_id"),
+a .json list of paths or {"path": ..., "session_id": ...} objects, or a
+text file with one path per line; relative paths are resolved against
+the manifest's directory.
+
+Every file is imported into the recording store, so it shows up in the
+history view, and run through recorder.process_recording on a bounded
+worker pool, with STT and LLM attempts rate-limited per API. Progress
+is appended to a JSON-lines checkpoint: rerunning the same command after
+an interruption skips the files already done (unless they changed since)
+and reuses recordings that were imported but not finished. Writes one
+result JSON per file and report.json with totals, throughput and
+failures; the report is also printed to stdout.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import metrics
+import recorder
+from storage import write_atomic
+
+BATCH_SESSION = "batch"
+
+
+def find_inputs(source):
+    """[(path, session_id)] for a directory of WAVs (recursively) or a manifest"""
+    if os.path.isdir(source):
+        paths = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            paths.extend(os.path.join(root, name) for name in sorted(files)
+                         if name.lower().endswith(".wav"))
+        return [(os.path.abspath(path), None) for path in paths]
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8", newline="") as f:
+        if source.lower().endswith(".json"):
+            rows = [row if isinstance(row, dict) else {"path": row} for row in json.load(f)]
+        elif source.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [{"path": line.strip()} for line in f
+                    if line.strip() and not line.lstrip().startswith("#")]
+    missing = [row for row in rows if not row.get("path")]
+    if missing:
+        raise ValueError(f"{source}: {len(missing)} manifest entries have no path")
+    return [(os.path.abspath(os.path.join(base, row["path"])), row.get("session_id") or None)
+            for row in rows]
+
+
+def fingerprint(path):
+    """Changes when the file is replaced or edited, so a resumed run reprocesses it"""
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def audio_seconds(path):
+    try:
+        with wave.open(path, "rb") as wf:
+            return wf.getnframes() / wf.getframerate()
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f"Not a readable WAV file: {e!r}")
+
+
+class Checkpoint:
+    """Append-only JSON-lines log of per-file progress; the last entry for a source wins"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by the interruption we are resuming from
+                        continue
+                    self.entries[entry["source"]] = entry
+
+    def get(self, source, fingerprint):
+        """The latest entry for an unchanged source, or None"""
+        entry = self.entries.get(source)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            return None
+        return entry
+
+    def write(self, **entry):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.entries[entry["source"]] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def result_path(output_dir, root, source):
+    """results/<path relative to the input root>.json"""
+    relative = os.path.splitext(os.path.relpath(source, root))[0]
+    return os.path.join(output_dir, "results", relative.replace(os.sep, "__") + ".json")
+
+
+def stage_seconds(trace):
+    """Total seconds per pipeline stage from a job trace"""
+    stages = {}
+    for entry in trace:
+        stages[entry["name"]] = stages.get(entry["name"], 0.0) + entry["duration_ms"] / 1000
+    return {name: round(seconds, 3) for name, seconds in stages.items()}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(int(len(values) * q / 100), len(values) - 1)], 3)
+
+
+class Batch:
+    def __init__(self, inputs, output_dir, checkpoint_path=None, workers=4, retry_failed=True):
+        self.inputs = inputs
+        self.output_dir = output_dir
+        self.workers = workers
+        self.retry_failed = retry_failed
+        os.makedirs(os.path.join(output_dir, "results"), exist_ok=True)
+        self.checkpoint = Checkpoint(checkpoint_path or os.path.join(output_dir, "checkpoint.jsonl"))
+        self.root = os.path.commonpath([os.path.dirname(path) for path, _ in inputs]) if inputs else ""
+        self.stop = threading.Event()
+        self._process = metrics.traced(recorder.process_recording)
+
+    def pending(self):
+        """Inputs still to process, and how many a previous run already finished"""
+        pending, skipped = [], 0
+        for path, session_id in self.inputs:
+            try:
+                entry = self.checkpoint.get(path, fingerprint(path))
+            except FileNotFoundError:
+                entry = None
+            finished = ("done",) if self.retry_failed else ("done", "failed")
+            if entry is not None and entry["status"] in finished:
+                skipped += 1
+            else:
+                pending.append((path, session_id))
+        return pending, skipped
+
+    def process_file(self, path, session_id):
+        """Import (or reuse) and process one file; returns its result, or None if stopped"""
+        if self.stop.is_set():
+            return None
+        started = time.perf_counter()
+        result = {"source": path, "recording_id": None}
+        version = None
+        try:
+            version = fingerprint(path)
+            result["audio_seconds"] = round(audio_seconds(path), 3)
+            entry = self.checkpoint.get(path, version)
+            recording_id = entry and entry.get("recording_id")
+            if not recording_id or recorder.recordings.get(recording_id) is None:
+                recording_id = recorder.recordings.import_audio(path, session_id or BATCH_SESSION)
+            # Left "processing" by a run that was killed mid-file; ours to process again
+            recorder.recordings.transition(recording_id, "processing", "recorded")
+            result["recording_id"] = recording_id
+            self.checkpoint.write(source=path, fingerprint=version, status="imported",
+                                  recording_id=recording_id)
+
+            stats = {}
+            form = self._process(recording_id, stats=stats)
+            result["stages"] = stage_seconds(stats.pop("trace", []))
+            result["stats"] = stats
+            if "error" in form:
+                result.update(status="failed", error=form["error"])
+            else:
+                result.update(status="done", form=form)
+        except Exception as e:
+            result.update(status="failed", error=f"{type(e).__name__}: {e}")
+        result["seconds"] = round(time.perf_counter() - started, 3)
+
+        output = result_path(self.output_dir, self.root, path)
+        write_atomic(output, json.dumps(result, ensure_ascii=False, indent=2))
+        self.checkpoint.write(source=path, fingerprint=version, status=result["status"],
+                              recording_id=result["recording_id"], error=result.get("error"),
+                              result=output)
+        return result
+
+    def run(self):
+        """Process the pending files; Ctrl-C (or stop.set()) finishes the files in flight and reports"""
+        pending, skipped = self.pending()
+        results, interrupted = [], False
+        started = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch")
+        futures = [executor.submit(self.process_file, path, session_id)
+                   for path, session_id in pending]
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                if result is None:
+                    continue
+                results.append(result)
+                print(f"[{len(results)}/{len(pending)}] {result['status']}: {result['source']}",
+                      file=sys.stderr)
+        except KeyboardInterrupt:
+            interrupted = True
+            self.stop.set()
+            print("Interrupted; finishing the files in flight...", file=sys.stderr)
+            executor.shutdown(wait=True, cancel_futures=True)
+            results = [future.result() for future in futures
+                       if future.done() and not future.cancelled() and future.result() is not None]
+        executor.shutdown(wait=True)
+        return self.report(results, skipped, len(pending), time.perf_counter() - started, interrupted)
+
+    def report(self, results, skipped, pending, wall, interrupted):
+        done = [result for result in results if result["status"] == "done"]
+        failed = [result for result in results if result["status"] == "failed"]
+        audio = sum(result.get("audio_seconds", 0) for result in done)
+        upstream = {name: {key: round(value, 3) if isinstance(value, float) else value
+                           for key, value in counters.items() if key != "latency"}
+                    for name, counters in recorder.upstream_caller.stats().items()}
+        interrupted = interrupted or self.stop.is_set()
+        report = {
+            "files": len(self.inputs),
+            "done": len(done),
+            "failed": len(failed),
+            "skipped": skipped,
+            "not_started": pending - len(results),
+            "interrupted": interrupted,
+            "workers": self.workers,
+            "wall_seconds": round(wall, 3),
+            "audio_seconds": round(audio, 3),
+            "files_per_minute": round(60 * len(done) / wall, 2) if wall else None,
+            "audio_minutes_per_minute": round(audio / wall, 2) if wall else None,
+            "file_seconds": {"p50": percentile([result["seconds"] for result in done], 50),
+                             "p95": percentile([result["seconds"] for result in done], 95)},
+            "upstream": upstream,
+            "failures": [{"source": result["source"], "error": result["error"]} for result in failed],
+        }
+        write_atomic(os.path.join(self.output_dir, "report.json"),
+                     json.dumps(report, ensure_ascii=False, indent=2))
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', help="directory of .wav files or a manifest (.csv, .json, .txt)")
+    parser.add_argument('--output', default="batch_output", help="directory for results and the report")
+    parser.add_argument('--checkpoint', help="checkpoint file (default OUTPUT/checkpoint.jsonl)")
+    parser.add_argument('--workers', type=int, default=4, help="files processed concurrently")
+    parser.add_argument('--stt-rpm', type=float, default=0, help="STT requests per minute (0: no limit)")
+    parser.add_argument('--llm-rpm', type=float, default=0, help="LLM requests per minute (0: no limit)")
+    parser.add_argument('--burst', type=int, default=1, help="requests allowed at once under a limit")
+    parser.add_argument('--skip-failed', action='store_true',
+                        help="don't retry files that failed in a previous run")
+    args = parser.parse_args()
+
+    recorder.upstream_caller.limit("stt", args.stt_rpm / 60, args.burst)
+    recorder.upstream_caller.limit("llm", args.llm_rpm / 60, args.burst)
+    batch = Batch(find_inputs(args.source), args.output, args.checkpoint, args.workers,
+                  retry_failed=not args.skip_failed)
+    # The recorder logs to stdout; keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = batch.run()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(1 if report["failed"] or report["interrupted"] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Time to first byte and bytes transferred when playing back a long recording.
+
+    python benchmarks/bench_audio_serving.py --seconds 900 --repeat 5
+
+Imports a --seconds long WAV fixture into a temporary RecordingStore and
+serves app.py on a local port, then fetches /api/get-audio/<id> the ways
+an <audio> element does: the whole WAV, a 1 MiB Range seek into the middle,
+a revalidation with If-None-Match, and the Opus playback copy via
+?format=opus (the first request, redirected to the WAV while the copy is
+encoded in the background, then the encoded copy). Redirects are followed
+and included in the timings. Needs the app's dependencies
+(including PyAudio and the API keys in .env) to import.
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..'))
+sys.path.insert(0, BENCHMARKS)
+
+from fixtures import fixture
+
+
+def fetch(port, path, headers=None):
+    """(status, seconds to first body byte, total seconds, body bytes, response headers)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    start = time.perf_counter()
+    conn.request('GET', path, headers=headers or {})
+    response = conn.getresponse()
+    while response.status in (301, 302, 303, 307, 308):
+        response.read()
+        conn.request('GET', response.getheader('Location'), headers=headers or {})
+        response = conn.getresponse()
+    first = response.read(1)
+    ttfb = time.perf_counter() - start
+    size = len(first) + len(response.read())
+    total = time.perf_counter() - start
+    conn.close()
+    return response.status, ttfb, total, size, dict(response.getheaders())
+
+
+def measure(port, path, headers, repeat):
+    runs = [fetch(port, path, headers) for _ in range(repeat)]
+    ttfbs = sorted(run[1] for run in runs)
+    totals = sorted(run[2] for run in runs)
+    return {"status": runs[0][0], "bytes": runs[0][3],
+            "ttfb_ms": round(1000 * ttfbs[len(ttfbs) // 2], 2),
+            "total_ms": round(1000 * totals[len(totals) // 2], 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=900, help="recording length")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--port', type=int, default=5097)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ.update(RECORDINGS_DIR=os.path.join(workdir, 'recordings'),
+                          STATE_PATH=os.path.join(workdir, 'state.sqlite3'),
+                          CACHE_PATH=os.path.join(workdir, 'cache.sqlite3'))
+        from werkzeug.serving import make_server
+        import app as app_module
+        import recorder
+
+        recording_id = recorder.recordings.import_audio(fixture(workdir, args.seconds))
+        server = make_server('127.0.0.1', args.port, app_module.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        path = f'/api/get-audio/{recording_id}'
+        size = os.path.getsize(recorder.recordings.path(recording_id, "audio"))
+        etag = fetch(args.port, path)[4]['ETag']
+        middle = size // 2
+
+        # The first Opus request is sent to the WAV and queues the encode; time it to completion
+        opus_first = fetch(args.port, path + '?format=opus', {'Range': 'bytes=0-65535'})
+        start = time.perf_counter()
+        while recorder.playback_rendition(recording_id) is None:
+            time.sleep(0.05)
+        encode_seconds = time.perf_counter() - start
+        result = {
+            "audio_seconds": args.seconds,
+            "wav_bytes": size,
+            "wav_full": measure(args.port, path, None, args.repeat),
+            "wav_seek_1mib": measure(args.port, path, {'Range': f'bytes={middle}-{middle + (1 << 20) - 1}'},
+                                     args.repeat),
+            "wav_revalidate": measure(args.port, path, {'If-None-Match': etag}, args.repeat),
+            "opus_first_request": {"status": opus_first[0], "bytes": opus_first[3],
+                                   "content_type": opus_first[4]['Content-Type'],
+                                   "ttfb_ms": round(1000 * opus_first[1], 2),
+                                   "total_ms": round(1000 * opus_first[2], 2)},
+            "opus_encode_seconds": round(encode_seconds, 2),
+            "opus_cached": measure(args.port, path + '?format=opus', None, args.repeat),
+        }
+        result["opus_ratio"] = round(result["opus_cached"]["bytes"] / size, 4)
+        server.shutdown()
+        recorder.cleanup()
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
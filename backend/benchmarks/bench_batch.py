@@ -0,0 +1,128 @@
+"""Batch throughput against the stub server: scaling with workers, rate limits and resume.
+
+    python benchmarks/bench_batch.py --files 16 --seconds 10 --workers 1 2 4 8 \\
+        --stt-latency 1.5 --llm-latency 1.5 --llm-rpm 60
+
+Runs batch.py's Batch over --files distinct fixture WAVs at each worker
+count, with STT and LLM served by stub_server.py in a child process.
+Reports files per minute and the speed-up over one worker; then repeats
+the largest worker count under --stt-rpm/--llm-rpm to show throughput
+flattening at the limit. Finally a two-worker run is interrupted
+halfway and resumed from its checkpoint, checking that finished files
+are skipped and no recording is imported twice.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..'))
+sys.path.insert(0, BENCHMARKS)
+
+from fixtures import fixture
+from stub_server import start_stub_server, stub_clients
+
+
+def summary(report):
+    return {key: report[key] for key in ("done", "failed", "skipped", "wall_seconds",
+                                         "files_per_minute", "audio_minutes_per_minute", "file_seconds")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=16)
+    parser.add_argument('--seconds', type=int, default=10, help="length of each recording")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--stt-latency', type=float, default=1.5)
+    parser.add_argument('--llm-latency', type=float, default=1.5)
+    parser.add_argument('--stt-rpm', type=float, default=0, help="limit for the rate-limited run")
+    parser.add_argument('--llm-rpm', type=float, default=60, help="limit for the rate-limited run")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(stt_latency=args.stt_latency, llm_latency=args.llm_latency)
+    try:
+        with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(sys.stderr):
+            os.environ.update(STATE_PATH=os.path.join(workdir, "state.sqlite3"),
+                              CACHE_PATH=os.path.join(workdir, "cache.sqlite3"),
+                              RECORDINGS_DIR=os.path.join(workdir, "recordings"),
+                              CACHE_MAX_BYTES="0", PLAYBACK_OPUS="0")
+            import batch
+            import recorder
+            recorder.elevenlabs_client, recorder.openai_client = stub_clients(url, recorder.get_http_client())
+
+            inputs_dir = os.path.join(workdir, "inputs")
+            os.makedirs(inputs_dir)
+            for i in range(args.files):
+                fixture(inputs_dir, args.seconds, seed=i)
+            inputs = batch.find_inputs(inputs_dir)
+
+            def run(name, workers):
+                return batch.Batch(inputs, os.path.join(workdir, name), workers=workers).run()
+
+            scaling = {}
+            for workers in args.workers:
+                scaling[workers] = summary(run(f"workers-{workers}", workers))
+            base = scaling[args.workers[0]]["files_per_minute"] * args.workers[0]
+            for workers, result in scaling.items():
+                result["speedup"] = round(result["files_per_minute"] / base, 2)
+                result["efficiency"] = round(result["speedup"] / workers, 2)
+
+            workers = max(args.workers)
+            recorder.upstream_caller.limit("stt", args.stt_rpm / 60)
+            recorder.upstream_caller.limit("llm", args.llm_rpm / 60)
+            limited = summary(run("rate-limited", workers))
+            limited["throttled"] = {name: {"attempts": counters["throttled"],
+                                           "seconds": round(counters["throttle_seconds"], 1)}
+                                    for name, counters in recorder.upstream_caller.stats().items()}
+            recorder.upstream_caller.limit("stt", None)
+            recorder.upstream_caller.limit("llm", None)
+
+            # Interrupt once half the files are done, then resume from the checkpoint;
+            # two workers so few files are still in flight when the stop comes
+            first = batch.Batch(inputs, os.path.join(workdir, "resume"), workers=2)
+            done = threading.Semaphore(0)
+            process_file = first.process_file
+
+            def counted(*file_args):
+                result = process_file(*file_args)
+                done.release()
+                return result
+
+            first.process_file = counted
+            thread = threading.Thread(target=first.run)
+            thread.start()
+            for _ in range(args.files // 2):
+                done.acquire()
+            first.stop.set()
+            thread.join()
+            before = recorder.recordings.list(per_page=1)["total"]
+            resumed = batch.Batch(inputs, os.path.join(workdir, "resume"), workers=workers).run()
+            imported = recorder.recordings.list(per_page=1)["total"] - before
+            resume = {"done_before_resume": resumed["skipped"], "processed_on_resume": resumed["done"],
+                      "imported_on_resume": imported,
+                      "no_duplicates": resumed["skipped"] + imported == args.files}
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(json.dumps({
+        "files": args.files,
+        "seconds": args.seconds,
+        "stt_latency": args.stt_latency,
+        "llm_latency": args.llm_latency,
+        "cpus": os.cpu_count(),
+        "scaling": scaling,
+        "rate_limited": {"workers": workers, "stt_rpm": args.stt_rpm, "llm_rpm": args.llm_rpm,
+                         "ceiling_files_per_minute": min(rpm for rpm in (args.stt_rpm, args.llm_rpm) if rpm)
+                         if args.stt_rpm or args.llm_rpm else None,
+                         **limited},
+        "resume": resume,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Per-request overhead of building the extraction model/prompt and mapping the result.
+
+    python benchmarks/bench_form_schema.py --iterations 2000
+
+"legacy" redoes what analyze_medical_transcription used to do on every
+call: define the Pydantic model, build the prompt and the form literal, and
+map the parsed fields back through a chain of title comparisons.
+"precompiled" uses the FormSchema loaded once at startup.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pydantic import Field, create_model
+
+from form_schema import FormSchema
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'form.json')
+
+
+def legacy_request(spec, values):
+    """Emulates the old per-call work with the same field set"""
+    leaves = []
+    for section in spec["sections"]:
+        leaves.extend(section.get("subsections", [section]))
+
+    model = create_model("Form100Content", **{
+        leaf["field"]: (str, Field(description=f"{leaf['title']} - {leaf['description']}"))
+        for leaf in leaves})
+    prompt = "\n".join([spec["prompt"]["role"], spec["prompt"]["task"]]
+                       + [f"- {leaf['title']}" for leaf in leaves] + spec["prompt"]["rules"])
+    form = {"document": spec["document"], "sections": [
+        {"title": s["title"], "subsections": [{"title": sub["title"], "content": ""}
+                                              for sub in s["subsections"]]}
+        if "subsections" in s else {"title": s["title"], "content": ""}
+        for s in spec["sections"]]}
+
+    # if/elif chain: every section compared against each title in turn
+    chain = [(leaf["title"], leaf["field"]) for leaf in leaves]
+    for section in form["sections"]:
+        for target in section.get("subsections", [section]):
+            for title, field in chain:
+                if target["title"] == title:
+                    target["content"] = values[field]
+                    break
+    return model, prompt, form
+
+
+def precompiled_request(schema, values):
+    return schema.model, schema.system_prompt, schema.fill(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(SCHEMA_PATH, encoding="utf-8") as f:
+        spec = json.load(f)
+    schema = FormSchema(spec)
+    values = {name: f"{name} value" for name in schema.field_names}
+    assert legacy_request(spec, values)[2] == precompiled_request(schema, values)[2]
+
+    legacy = timeit.timeit(lambda: legacy_request(spec, values), number=args.iterations)
+    precompiled = timeit.timeit(lambda: precompiled_request(schema, values), number=args.iterations)
+    startup = timeit.timeit(lambda: FormSchema(spec), number=10) / 10
+
+    print(json.dumps({
+        "fields": len(schema.fields),
+        "legacy_us_per_request": round(1e6 * legacy / args.iterations, 1),
+        "precompiled_us_per_request": round(1e6 * precompiled / args.iterations, 1),
+        "speedup": round(legacy / precompiled, 1),
+        "schema_compile_ms_at_startup": round(1000 * startup, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Repeat-processing cost: full reprocessing vs incremental updates.
+
+    python benchmarks/bench_incremental.py --seconds 600 --followup-seconds 60
+
+Processes a --seconds consult with stubbed STT/LLM clients that count
+upload bytes and tokens, has the "doctor" edit one form field, and then
+compares, for a follow-up recording appended to the consult and for a
+one-sentence transcript correction:
+
+- full: process_recording on a copy of the audio (or a full extraction of
+  the corrected transcript), what was possible before
+- incremental: recorder.update_recording
+
+and checks that the doctor's edit survives the incremental updates.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import wave
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..'))
+sys.path.insert(0, BENCHMARKS)
+
+from fixtures import fixture
+from stubs import SAMPLE_TRANSCRIPT, StubElevenLabs, StubOpenAI
+from wav_writer import StreamingWavWriter
+
+# One sentence per this many seconds of consult, as in stub_server.py
+SECONDS_PER_SENTENCE = 8.0
+DOCTOR_EDIT = "ექიმის მიერ შესწორებული მნიშვნელობა"
+
+
+def transcript(seconds, start=0):
+    """Distinct sentences so the diff can tell them apart"""
+    count = max(1, round(seconds / SECONDS_PER_SENTENCE))
+    return "\n".join(f"{SAMPLE_TRANSCRIPT} ({start + i})" for i in range(count))
+
+
+def append_audio(path, source):
+    """Extend a stored WAV in place, as a follow-up recording does"""
+    with wave.open(source, 'rb') as wf:
+        channels, sample_width, rate = wf.getnchannels(), wf.getsampwidth(), wf.getframerate()
+        pcm = wf.readframes(wf.getnframes())
+    writer = StreamingWavWriter(path, channels, sample_width, rate, append=True)
+    writer.write(pcm)
+    writer.close()
+
+
+class Meter:
+    def __init__(self, stt, llm):
+        self.stt = stt
+        self.llm = llm
+
+    def _counters(self):
+        return {"stt_calls": self.stt.calls, "stt_upload_bytes": self.stt.bytes_received,
+                "llm_calls": self.llm.calls, "prompt_tokens": self.llm.prompt_tokens,
+                "completion_tokens": self.llm.completion_tokens}
+
+    def measure(self, fn):
+        before = self._counters()
+        start = time.perf_counter()
+        stats = {}
+        result = fn(stats)
+        wall = time.perf_counter() - start
+        if isinstance(result, dict) and "error" in result:
+            raise RuntimeError(result["error"])
+        after = self._counters()
+        report = {"wall_seconds": round(wall, 3),
+                  **{key: after[key] - before[key] for key in after}}
+        if "mode" in stats:
+            report["mode"] = stats["mode"]
+            report["updated_fields"] = stats.get("updated_fields", [])
+            report["conflicts"] = len(stats.get("conflicts", []))
+        return report
+
+
+def savings(full, incremental):
+    return {key: round(100 * (1 - incremental[key] / full[key]), 1) if full[key] else None
+            for key in ("wall_seconds", "stt_upload_bytes", "prompt_tokens", "completion_tokens")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=int, default=600, help="length of the first recording")
+    parser.add_argument('--followup-seconds', type=int, default=60)
+    parser.add_argument('--stt-latency', type=float, default=1.0)
+    parser.add_argument('--llm-latency', type=float, default=1.0)
+    parser.add_argument('--token-latency', type=float, default=0.01, help="per completion token")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ.update(STATE_PATH=os.path.join(workdir, "state.sqlite3"),
+                          CACHE_PATH=os.path.join(workdir, "cache.sqlite3"),
+                          RECORDINGS_DIR=os.path.join(workdir, "recordings"),
+                          CACHE_MAX_BYTES="0", PLAYBACK_OPUS="0")
+        import recorder
+        stt = recorder.elevenlabs_client = StubElevenLabs(latency=args.stt_latency)
+        llm = recorder.openai_client = StubOpenAI(latency=args.llm_latency,
+                                                  token_latency=args.token_latency)
+        meter = Meter(stt, llm)
+        store = recorder.recordings
+        schema = recorder.FORM_SCHEMA
+
+        # First consult, processed in full, then one field edited by hand
+        recording_id = store.import_audio(fixture(workdir, args.seconds))
+        stt.transcript = transcript(args.seconds)
+        initial = meter.measure(lambda stats: recorder.process_recording(recording_id, stats=stats))
+        edited_field = schema.field_names[-1]
+        form = schema.fill({edited_field: DOCTOR_EDIT}, recorder.get_form(recording_id))
+        recorder.save_filled_form(recording_id, form)
+
+        # Follow-up recording appended to the consult
+        append_audio(store.path(recording_id, "audio"),
+                     fixture(workdir, args.followup_seconds, seed=1))
+        store.update(recording_id, status="recorded")
+        copy_id = store.import_audio(store.path(recording_id, "audio"))
+        stt.transcript = transcript(args.seconds + args.followup_seconds)
+        follow_up_full = meter.measure(lambda stats: recorder.process_recording(copy_id, stats=stats))
+        stt.transcript = transcript(args.followup_seconds, start=10000)
+        follow_up = meter.measure(lambda stats: recorder.update_recording(recording_id, stats=stats))
+
+        # The doctor corrects one sentence of the transcript
+        text = store.read_blob(recording_id, "transcript")
+        corrected = text.replace("(3)", "(3, შესწორებული)", 1)
+        store.write_blob(recording_id, "transcript", corrected)
+        edit_full = meter.measure(
+            lambda stats: recorder.analyze_medical_transcription(corrected))
+        edit = meter.measure(lambda stats: recorder.update_recording(recording_id, stats=stats))
+
+        kept = schema.values(recorder.get_form(recording_id))[edited_field] == DOCTOR_EDIT
+        shutil.rmtree(store.root, ignore_errors=True)
+
+    print(json.dumps({
+        "audio_seconds": args.seconds,
+        "followup_seconds": args.followup_seconds,
+        "initial": initial,
+        "follow_up": {"full": follow_up_full, "incremental": follow_up,
+                      "saved_percent": savings(follow_up_full, follow_up)},
+        "transcript_edit": {"full": edit_full, "incremental": edit,
+                            "saved_percent": savings(edit_full, edit)},
+        "manual_edit_kept": kept,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
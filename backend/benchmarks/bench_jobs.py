@@ -0,0 +1,78 @@
+"""Throughput of the /api/process job queue against stubbed STT/LLM clients.
+
+    python benchmarks/bench_jobs.py --jobs 32 --pool-sizes 1 2 4 8
+
+Runs the real recorder.process_recording on copies of a synthetic recording
+with the upstream clients replaced by sleeping stubs, for each worker pool
+size.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import recorder
+from cache import ResultCache
+from fixtures import fixture
+from jobs import JobQueue
+from storage import RecordingStore
+from stubs import StubElevenLabs, StubOpenAI
+
+
+def run(pool_size, num_jobs, source):
+    # One recording per job: a recording that is being processed can't be claimed again
+    recording_ids = [recorder.recordings.import_audio(source) for _ in range(num_jobs)]
+    queue = JobQueue(max_workers=pool_size, max_pending=num_jobs)
+    start = time.perf_counter()
+    job_ids = [queue.submit(recorder.process_recording, recording_id) for recording_id in recording_ids]
+
+    while True:
+        jobs = [queue.get(job_id) for job_id in job_ids]
+        if all(job["finished_at"] for job in jobs):
+            break
+        time.sleep(0.01)
+    wall = time.perf_counter() - start
+    queue.shutdown()
+
+    latencies = sorted(job["finished_at"] - job["created_at"] for job in jobs)
+    return {
+        "pool_size": pool_size,
+        "jobs": num_jobs,
+        "failed": sum(job["status"] == "failed" for job in jobs),
+        "wall_seconds": round(wall, 3),
+        "jobs_per_second": round(num_jobs / wall, 2),
+        "p50_latency": round(latencies[len(latencies) // 2], 3),
+        "max_latency": round(latencies[-1], 3),
+        "upload_bytes_per_job": jobs[0]["stats"].get("upload_bytes"),
+        "bytes_saved_per_job": jobs[0]["stats"].get("bytes_saved"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=16)
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--stt-latency', type=float, default=0.5)
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--seconds', type=int, default=30, help="length of the recording")
+    args = parser.parse_args()
+
+    recorder.elevenlabs_client = StubElevenLabs(latency=args.stt_latency)
+    recorder.openai_client = StubOpenAI(latency=args.llm_latency)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        recorder.recordings = RecordingStore(os.path.join(workdir, "recordings"))
+        source = fixture(workdir, args.seconds)
+        # Every job processes the same audio; a zero-byte cache keeps them all misses
+        recorder.result_cache = ResultCache(os.path.join(workdir, "cache.sqlite3"), max_bytes=0)
+        results = [run(size, args.jobs, source) for size in args.pool_sizes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Time from stop to transcript: live segmented STT vs. whole-file STT.
+
+    python benchmarks/bench_live_transcription.py --seconds 120 --speed 8
+
+Uses a local stub STT whose latency grows with audio length and whose
+output is one word per 0.4 s of audio, so the stitched transcript can be
+checked word for word against a whole-file transcription.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_audio import FakePyAudio
+from fixtures import fixture
+from live_transcription import SegmentedTranscriber
+from sessions import SessionManager
+
+WORD_SECONDS = 0.4
+
+
+class StubSTT:
+    def __init__(self, frame_size, rate, base_latency, latency_per_second):
+        self.frame_size = frame_size
+        self.rate = rate
+        self.base_latency = base_latency
+        self.latency_per_second = latency_per_second
+
+    def __call__(self, pcm, start_seconds):
+        duration = len(pcm) / self.frame_size / self.rate
+        time.sleep(self.base_latency + self.latency_per_second * duration)
+        # Words whose midpoint falls inside the segment
+        first = math.ceil(start_seconds / WORD_SECONDS - 0.5)
+        last = math.floor((start_seconds + duration) / WORD_SECONDS - 0.5)
+        words = [{"text": f"w{k}", "start": k * WORD_SECONDS, "end": (k + 1) * WORD_SECONDS}
+                 for k in range(first, last + 1)]
+        return " ".join(word["text"] for word in words), words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=int, default=120)
+    parser.add_argument('--speed', type=float, default=8.0)
+    parser.add_argument('--segment-seconds', type=float, default=30)
+    parser.add_argument('--overlap-seconds', type=float, default=3)
+    parser.add_argument('--base-latency', type=float, default=0.5)
+    parser.add_argument('--latency-per-second', type=float, default=0.02)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source = fixture(workdir, args.seconds)
+        os.chdir(workdir)
+        pa = FakePyAudio(source, speed=args.speed)
+        stt = StubSTT(pa.channels * pa.sample_width, pa.rate,
+                      args.base_latency, args.latency_per_second)
+        executor = ThreadPoolExecutor(max_workers=4)
+
+        def factory(channels, sample_width, rate):
+            return SegmentedTranscriber(stt, executor, channels, sample_width, rate,
+                                        segment_seconds=args.segment_seconds,
+                                        overlap_seconds=args.overlap_seconds)
+
+        manager = SessionManager()
+        manager.start("bench", pa=pa, audio_format=8, channels=pa.channels,
+                      rate=pa.rate, transcriber_factory=factory)
+        time.sleep(args.seconds / args.speed + 0.2)
+
+        # Live: stop, then wait for the remaining segment(s)
+        start = time.perf_counter()
+        session = manager.stop("bench")
+        live_text = session.transcriber.result()
+        live_words = session.transcriber.words()
+        live_latency = time.perf_counter() - start
+
+        # Whole file: the pre-existing flow, everything is sent after stop
+        start = time.perf_counter()
+        with wave.open(session.filename, 'rb') as wf:
+            pcm = wf.readframes(wf.getnframes())
+        full_text, full_words = stt(pcm, 0.0)
+        full_latency = time.perf_counter() - start
+        executor.shutdown()
+
+    print(json.dumps({
+        "audio_seconds": args.seconds,
+        "segments": session.transcriber.segments,
+        "live_stop_to_transcript_seconds": round(live_latency, 3),
+        "whole_file_stop_to_transcript_seconds": round(full_latency, 3),
+        "transcripts_match": live_text == full_text,
+        "words_match": live_words == full_words,
+        "words": len(full_text.split()),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""End-to-end pipeline benchmark: capture, stop, processing and concurrent jobs.
+
+    python benchmarks/bench_pipeline.py --lengths 30 120 600 --concurrency 1 4 8 \\
+        --stt-latency 1.5 --llm-latency 3 --output run.json [--baseline previous.json]
+
+For each fixture length, a FakePyAudio replays the consult through
+recorder.start_recording / stop_recording (live transcription included),
+then the recording is processed with recorder.process_recording, and a
+second copy without live segments goes through whole-file STT. A final
+pass runs --jobs recordings through a JobQueue at each concurrency level.
+
+STT and LLM calls go through the real SDKs and pooled HTTP client to
+stub_server.py, which runs in a child process so only our own work counts
+towards the reported CPU. Every result is cache-cold. Reported per run:
+capture CPU (also as a share of one core at real time), wall time per
+processing stage, peak RSS and, with --trace-memory, the peak Python
+allocation per stage. --baseline adds the change against an earlier
+--output file. Needs the OpenAI and ElevenLabs SDKs; PyAudio is not
+needed, the recorder imports it only when opening a real device.
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..'))
+sys.path.insert(0, BENCHMARKS)
+
+from fake_audio import FakePyAudio
+from fixtures import fixture
+from stub_server import start_stub_server, stub_clients, stub_stats
+
+
+def rss_peak_mb():
+    """High-water resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class StageTimer:
+    """progress callback recording the wall time (and traced memory peak) of each stage"""
+
+    def __init__(self):
+        self.stages = {}
+        self._stage = None
+        self._started = None
+
+    def __call__(self, stage):
+        self._close()
+        self._stage = stage
+        self._started = time.perf_counter()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    def _close(self):
+        if self._stage is None:
+            return
+        entry = self.stages.setdefault(self._stage, {"seconds": 0.0})
+        entry["seconds"] = round(entry["seconds"] + time.perf_counter() - self._started, 4)
+        if tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            entry["traced_peak_mb"] = round(max(entry.get("traced_peak_mb", 0), peak), 1)
+        self._stage = None
+
+    def finish(self):
+        self._close()
+        return self.stages
+
+
+def process(recorder, recording_id):
+    timer = StageTimer()
+    stats = {}
+    start = time.perf_counter()
+    result = recorder.process_recording(recording_id, progress=timer, stats=stats)
+    return {
+        "error": result.get("error"),
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "stages": timer.finish(),
+        "upload_bytes": stats.get("upload_bytes"),
+        "live_segments": stats.get("live_segments"),
+        "rss_peak_mb": rss_peak_mb(),
+    }
+
+
+def capture(recorder, source, seconds, speed):
+    """Record the fixture through a fake device; returns (recording ID, metrics)"""
+    recorder.p = None
+    recorder.initialize_audio(FakePyAudio(source, speed=speed))
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    recorder.start_recording("bench")
+    # Let the fake stream replay the whole fixture
+    time.sleep(seconds / speed + 0.2)
+    stop_start = time.perf_counter()
+    recording_id = recorder.stop_recording("bench")["recording_id"]
+    stop_seconds = time.perf_counter() - stop_start
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    return recording_id, {
+        "speed": speed,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        # The same work spread over the real duration of the consult
+        "cpu_percent_at_realtime": round(100 * cpu / seconds, 2),
+        "stop_seconds": round(stop_seconds, 4),
+        "rss_peak_mb": rss_peak_mb(),
+    }
+
+
+def concurrency(recorder, source, seconds, workers, num_jobs):
+    from jobs import JobQueue
+
+    recording_ids = [recorder.recordings.import_audio(source) for _ in range(num_jobs)]
+    queue = JobQueue(max_workers=workers, max_pending=num_jobs)
+    start = time.perf_counter()
+    job_ids = [queue.submit(recorder.process_recording, recording_id) for recording_id in recording_ids]
+    while True:
+        jobs = [queue.get(job_id) for job_id in job_ids]
+        if all(job["finished_at"] for job in jobs):
+            break
+        time.sleep(0.01)
+    wall = time.perf_counter() - start
+    queue.shutdown()
+
+    latencies = sorted(job["finished_at"] - job["created_at"] for job in jobs)
+    return {
+        "workers": workers,
+        "jobs": num_jobs,
+        "audio_seconds": seconds,
+        "failed": sum(job["status"] == "failed" for job in jobs),
+        "wall_seconds": round(wall, 3),
+        "jobs_per_second": round(num_jobs / wall, 3),
+        "audio_minutes_per_minute": round(num_jobs * seconds / wall, 2),
+        "p50_latency": round(latencies[len(latencies) // 2], 3),
+        # Nearest rank
+        "p95_latency": round(latencies[math.ceil(len(latencies) * 0.95) - 1], 3),
+        "rss_peak_mb": rss_peak_mb(),
+    }
+
+
+def compare(baseline, current, path=""):
+    """path -> {baseline, current, change_percent} for every number present in both runs"""
+    changes = {}
+    if isinstance(baseline, dict) and isinstance(current, dict):
+        for key in baseline.keys() & current.keys():
+            changes.update(compare(baseline[key], current[key], f"{path}.{key}" if path else key))
+    elif isinstance(baseline, list) and isinstance(current, list):
+        for i, (old, new) in enumerate(zip(baseline, current)):
+            changes.update(compare(old, new, f"{path}[{i}]"))
+    elif (isinstance(baseline, (int, float)) and isinstance(current, (int, float))
+          and not isinstance(baseline, bool)):
+        changes[path] = {"baseline": baseline, "current": current,
+                         "change_percent": round(100 * (current - baseline) / baseline, 1)
+                         if baseline else None}
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lengths', type=int, nargs='+', default=[30, 120, 600],
+                        help="fixture lengths in seconds")
+    parser.add_argument('--speed', type=float, default=10.0, help="capture replay speed")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--jobs', type=int, default=16, help="recordings per concurrency level")
+    parser.add_argument('--job-seconds', type=int, default=120, help="length of those recordings")
+    parser.add_argument('--stt-latency', type=float, default=1.0)
+    parser.add_argument('--llm-latency', type=float, default=2.0)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="per-stage Python allocation peaks (slows the run)")
+    parser.add_argument('--output', help="also write the results to this file")
+    parser.add_argument('--baseline', help="results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(stt_latency=args.stt_latency, llm_latency=args.llm_latency)
+    try:
+        with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(sys.stderr):
+            # Recorder prints go to stderr so stdout is only the JSON report.
+            # Fresh state, storage and a zero-byte cache keep every run cache-cold.
+            os.environ.update(STATE_PATH=os.path.join(workdir, "state.sqlite3"),
+                              CACHE_PATH=os.path.join(workdir, "cache.sqlite3"),
+                              RECORDINGS_DIR=os.path.join(workdir, "recordings"),
+                              CACHE_MAX_BYTES="0", PLAYBACK_OPUS="0")
+            import recorder
+            recorder.elevenlabs_client, recorder.openai_client = stub_clients(url, recorder.get_http_client())
+            if args.trace_memory:
+                tracemalloc.start()
+
+            runs = []
+            for seconds in args.lengths:
+                source = fixture(workdir, seconds)
+                recording_id, captured = capture(recorder, source, seconds, args.speed)
+                runs.append({
+                    "audio_seconds": seconds,
+                    "capture": captured,
+                    "process_live": process(recorder, recording_id),
+                    "process_file": process(recorder, recorder.recordings.import_audio(source)),
+                })
+
+            source = fixture(workdir, args.job_seconds)
+            throughput = [concurrency(recorder, source, args.job_seconds, workers, args.jobs)
+                          for workers in args.concurrency]
+            upstream = stub_stats(url)
+            recorder.cleanup()
+    finally:
+        server.terminate()
+        server.wait()
+
+    results = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "config": {"speed": args.speed, "stt_latency": args.stt_latency,
+                   "llm_latency": args.llm_latency, "jobs": args.jobs,
+                   "job_seconds": args.job_seconds, "trace_memory": args.trace_memory},
+        "runs": runs,
+        "concurrency": throughput,
+        "upstream": upstream,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        results["comparison"] = compare({k: baseline.get(k) for k in ("runs", "concurrency")},
+                                        {k: results[k] for k in ("runs", "concurrency")})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
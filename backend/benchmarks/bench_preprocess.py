@@ -0,0 +1,41 @@
+"""Upload size and CPU cost of preparing recordings for STT.
+
+    python benchmarks/bench_preprocess.py --seconds 60 180 600
+
+Compares the raw 44.1 kHz stereo WAV with the 16 kHz mono rendition in
+each available format.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import audio_preprocess
+from fixtures import fixture
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=int, nargs='+', default=[60, 180])
+    parser.add_argument('--formats', nargs='+', default=["wav", "flac", "opus"])
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for seconds in args.seconds:
+            path = fixture(workdir, seconds)
+            for fmt in args.formats:
+                start = time.perf_counter()
+                _, stats, _ = audio_preprocess.prepare_for_stt(path, fmt)
+                elapsed = time.perf_counter() - start
+                results.append(dict(stats, requested_format=fmt,
+                                    preprocess_seconds=round(elapsed, 3)))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
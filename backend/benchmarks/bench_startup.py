@@ -0,0 +1,132 @@
+"""Startup time of the API process, with a regression budget.
+
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 500
+
+Runs `python -X importtime -c "import app"` --runs times in fresh
+processes (empty storage, WARM_UP=0) and reports the median cumulative
+import time of app and of its slowest dependencies. The heavy modules
+that must only load on first use (PyAudio, the OpenAI and ElevenLabs
+SDKs, Pydantic, requests, httpx, faster-whisper) are checked to be
+absent. One more process measures, from interpreter start, when
+/api/test first answers and when /api/ready turns 200 with the
+background warm-up on, i.e. the cost that moved off the import path.
+
+Exits with status 1 if the median import time is over --budget-ms or
+a lazy module was imported at startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+LAZY_MODULES = ("pyaudio", "openai", "elevenlabs", "pydantic", "requests", "httpx", "faster_whisper")
+
+# Time from interpreter start until the app answers /api/test and /api/ready
+READY_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import app
+client = app.app.test_client()
+client.get('/api/test')
+live = time.perf_counter()
+while client.get('/api/ready').status_code != 200 and time.perf_counter() - live < 60:
+    time.sleep(0.01)
+print(json.dumps({"import_seconds": live - started, "ready_seconds": time.perf_counter() - started,
+                  "checks": client.get('/api/ready').get_json()["checks"]}))
+"""
+
+
+def parse_importtime(stderr, root="app"):
+    """[(cumulative microseconds, depth, module)] of root and the imports under it.
+
+    -X importtime prints a module after everything it imported, indented
+    by depth, so root's subtree is what was printed since the previous
+    top-level entry.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        module = name.rstrip()
+        depth = (len(module) - len(module.lstrip())) // 2
+        entries.append((int(cumulative), depth, module.strip()))
+        if depth == 0:
+            if module.strip() == root:
+                return entries
+            entries = []
+    return []
+
+
+def environment(workdir, **overrides):
+    env = dict(os.environ, PYTHONPATH=BACKEND, RECORDINGS_DIR=os.path.join(workdir, "recordings"),
+               STATE_PATH=os.path.join(workdir, "state.sqlite3"),
+               CACHE_PATH=os.path.join(workdir, "cache.sqlite3"), WARM_UP="0")
+    env.update(overrides)
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=500, help="median import time of app")
+    parser.add_argument('--top', type=int, default=10, help="slowest dependencies to report")
+    args = parser.parse_args()
+
+    totals, slowest, imported_lazy = [], {}, set()
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                                    env=environment(workdir), cwd=workdir,
+                                    capture_output=True, text=True)
+        if result.returncode != 0:
+            sys.exit(f"import app failed:\n{result.stderr[-2000:]}")
+        entries = parse_importtime(result.stderr)
+        if not entries:
+            sys.exit("import app not found in the -X importtime output")
+        totals.append(entries[-1][0])
+        # Direct imports of app and what they import in turn
+        for us, depth, module in entries:
+            if depth in (1, 2):
+                slowest.setdefault(module, []).append(us)
+            if module.split(".")[0] in LAZY_MODULES:
+                imported_lazy.add(module.split(".")[0])
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Dummy keys: the checks only need them to be configured
+        result = subprocess.run([sys.executable, "-c", READY_SCRIPT], cwd=workdir,
+                                env=environment(workdir, WARM_UP="1",
+                                                OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "startup-bench"),
+                                                ELEVENLABS_API_KEY=os.getenv("ELEVENLABS_API_KEY", "startup-bench")),
+                                capture_output=True, text=True)
+        ready = (json.loads(result.stdout.strip().splitlines()[-1]) if result.returncode == 0
+                 else {"error": result.stderr[-2000:]})
+    for key in ("import_seconds", "ready_seconds"):
+        if key in ready:
+            ready[key] = round(ready[key], 3)
+
+    median_ms = statistics.median(totals) / 1000
+    report = {
+        "runs": args.runs,
+        "import_app_ms": {"median": round(median_ms, 1), "min": round(min(totals) / 1000, 1),
+                          "max": round(max(totals) / 1000, 1)},
+        "budget_ms": args.budget_ms,
+        "slowest_ms": {module: round(statistics.median(times) / 1000, 1) for module, times in
+                       sorted(slowest.items(), key=lambda item: -statistics.median(item[1]))[:args.top]},
+        "lazy_modules_imported": sorted(imported_lazy),
+        "warm_up": ready,
+        "passed": median_ms <= args.budget_ms and not imported_lazy,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == '__main__':
+    main()
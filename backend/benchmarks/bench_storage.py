@@ -0,0 +1,81 @@
+"""History queries and form reads against the per-recording store.
+
+    python benchmarks/bench_storage.py --recordings 10000 --iterations 500
+
+Fills a RecordingStore with --recordings indexed entries (one real form
+on disk), then times a page of history, a filtered page, an uncached form
+read (json.load of form.json, as get_form used to do) and a cached
+load_form() that only stats the file.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from form_schema import FormSchema
+from storage import RecordingStore
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'form.json')
+PATIENTS = ["გიორგი მაისურაძე", "ნათია კვირკველია", "ლევან გოგიჩაშვილი", "ნინო ბერიძე"]
+
+
+def populate(store, count, seed=0):
+    """Bulk-insert index rows directly; only their metadata matters here"""
+    rng = random.Random(seed)
+    now = time.time()
+    rows = [(f"{i:032x}", "default", rng.choice(["done", "done", "done", "failed", "recorded"]),
+             "ფორმა 100", rng.choice(PATIENTS), rng.uniform(30, 300), rng.uniform(5, 20),
+             now - i * 60, now - i * 60) for i in range(count)]
+    with store._lock:
+        store._db.executemany(
+            "INSERT INTO recordings (recording_id, session_id, status, document, patient, "
+            "audio_seconds, processing_seconds, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows)
+        store._db.commit()
+
+
+def ms(fn, iterations):
+    return round(1000 * timeit.timeit(fn, number=iterations) / iterations, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recordings', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    schema = FormSchema.load(SCHEMA_PATH)
+    form = schema.fill({name: f"{name} value " * 20 for name in schema.field_names})
+
+    with tempfile.TemporaryDirectory() as workdir:
+        store = RecordingStore(workdir)
+        populate(store, args.recordings)
+        recording_id = store.create("default")
+        store.save_form(recording_id, form, status="done", patient=PATIENTS[0])
+        form_path = store.path(recording_id, "form")
+
+        def parse_form():
+            with open(form_path, encoding="utf-8") as f:
+                return json.load(f)
+
+        result = {
+            "recordings": args.recordings + 1,
+            "form_bytes": os.path.getsize(form_path),
+            "history_page_ms": ms(lambda: store.list(page=1), args.iterations),
+            "history_deep_page_ms": ms(lambda: store.list(page=args.recordings // 40), args.iterations),
+            "history_filtered_page_ms": ms(lambda: store.list(page=1, status="failed", query="ნინო"),
+                                           args.iterations),
+            "form_parse_ms": ms(parse_form, args.iterations),
+            "form_cached_ms": ms(lambda: store.load_form(recording_id), args.iterations),
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Time to first form field: streamed extraction vs. waiting for the full response.
+
+    python benchmarks/bench_stream_extraction.py --first-token 0.5 --token-latency 0.01
+
+Uses a local stub LLM that streams the structured output token by token.
+The blocking parse() path returns only once the last token is out, so its
+time-to-first-field equals the streamed path's total time.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import recorder
+from stubs import SAMPLE_TRANSCRIPT, StubOpenAI
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--first-token', type=float, default=0.5)
+    parser.add_argument('--token-latency', type=float, default=0.01)
+    args = parser.parse_args()
+
+    recorder.openai_client = StubOpenAI(latency=args.first_token, token_latency=args.token_latency)
+
+    start = time.perf_counter()
+    arrivals = [time.perf_counter() - start
+                for _ in recorder.stream_medical_transcription(SAMPLE_TRANSCRIPT)]
+    total = time.perf_counter() - start
+
+    print(json.dumps({
+        "fields": len(arrivals),
+        "completion_tokens": recorder.openai_client.completion_tokens,
+        "streamed_time_to_first_field": round(arrivals[0], 3),
+        "streamed_median_field_arrival": round(arrivals[len(arrivals) // 2], 3),
+        "blocking_time_to_first_field": round(total, 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
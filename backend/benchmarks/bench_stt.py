@@ -0,0 +1,140 @@
+"""STT backends compared: latency and real-time factor, alone and under concurrency.
+
+    python benchmarks/bench_stt.py --lengths 30 120 600 --concurrency 1 4 \\
+        --backends elevenlabs local --model small --compute-type int8 --processes 1
+
+Each fixture goes through audio_preprocess in the format the backend
+asks for (silence trimmed, as in production), then:
+
+- latency: --repeats sequential requests per length; the real-time
+  factor (RTF) is wall time over the recording's duration
+- concurrency: N simultaneous requests per length; aggregate RTF is the
+  wall time over all the audio, which is where the local backend's
+  cross-request batching shows (the mean batch size is reported)
+
+The local backend needs faster-whisper; its model load is reported
+separately. ElevenLabs goes to stub_server.py with a fixed --stt-latency
+unless --real-elevenlabs is given, which uploads to the real API with
+ELEVENLABS_API_KEY from .env (and uses credits).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..'))
+sys.path.insert(0, BENCHMARKS)
+
+import audio_preprocess
+import stt
+from fixtures import fixture
+from stub_server import start_stub_server, stub_clients
+from upstream import UpstreamCaller, build_http_client
+
+
+def elevenlabs_backend(args):
+    http_client = build_http_client()
+    if args.real_elevenlabs:
+        from dotenv import load_dotenv
+        from elevenlabs.client import ElevenLabs
+        load_dotenv(os.path.join(BENCHMARKS, '..', '.env'))
+        client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"), httpx_client=http_client)
+        return stt.ElevenLabsSTT(lambda: client, UpstreamCaller()), None
+    server, url = start_stub_server(stt_latency=args.stt_latency)
+    client, _ = stub_clients(url, http_client)
+    return stt.ElevenLabsSTT(lambda: client, UpstreamCaller()), server
+
+
+def measure(backend, payload, audio_seconds, repeats, concurrency):
+    """Sequential latencies and, per concurrency level, wall time for simultaneous requests"""
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        backend.transcribe(payload())
+        latencies.append(time.perf_counter() - started)
+    median = statistics.median(latencies)
+    result = {"latency_seconds": round(median, 3), "rtf": round(median / audio_seconds, 4),
+              "concurrency": {}}
+
+    for n in concurrency:
+        def one(_):
+            started = time.perf_counter()
+            backend.transcribe(payload())
+            return time.perf_counter() - started
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            times = sorted(pool.map(one, range(n)))
+        wall = time.perf_counter() - started
+        result["concurrency"][n] = {"wall_seconds": round(wall, 3),
+                                    "max_latency_seconds": round(times[-1], 3),
+                                    "aggregate_rtf": round(wall / (n * audio_seconds), 4)}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lengths', type=int, nargs='+', default=[30, 120])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--backends', nargs='+', default=["elevenlabs", "local"],
+                        choices=["elevenlabs", "local"])
+    parser.add_argument('--stt-latency', type=float, default=1.5, help="stub ElevenLabs latency")
+    parser.add_argument('--real-elevenlabs', action='store_true')
+    parser.add_argument('--model', default=stt.LOCAL_MODEL)
+    parser.add_argument('--compute-type', default=stt.LOCAL_COMPUTE_TYPE)
+    parser.add_argument('--processes', type=int, default=stt.LOCAL_PROCESSES)
+    parser.add_argument('--threads', type=int, default=stt.LOCAL_THREADS)
+    parser.add_argument('--batch-size', type=int, default=stt.LOCAL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.backends:
+            server = None
+            try:
+                if name == "local":
+                    backend = stt.LocalWhisperSTT(args.model, args.compute_type, processes=args.processes,
+                                                  threads=args.threads, batch_size=args.batch_size)
+                    report = {"model": backend.model, "load_seconds": round(backend.start(), 2)}
+                else:
+                    backend, server = elevenlabs_backend(args)
+                    report = {"model": backend.model,
+                              "endpoint": "api" if args.real_elevenlabs else "stub",
+                              "stub_latency": None if args.real_elevenlabs else args.stt_latency}
+            except Exception as e:
+                results[name] = {"error": str(e)}
+                continue
+
+            try:
+                for seconds in args.lengths:
+                    prepared, _, _ = audio_preprocess.prepare_for_stt(fixture(workdir, seconds),
+                                                                      fmt=backend.audio_format)
+
+                    def payload():
+                        # Preprocessing stays out of the timings; only STT is measured
+                        upload = BytesIO(prepared.getvalue())
+                        upload.name = prepared.name
+                        return upload
+
+                    report[seconds] = dict(measure(backend, payload, seconds, args.repeats,
+                                                   args.concurrency),
+                                           payload_bytes=prepared.getbuffer().nbytes)
+                if hasattr(backend, "stats"):
+                    report["batching"] = backend.stats()
+            finally:
+                if server is not None:
+                    server.terminate()
+                    server.wait()
+            results[name] = report
+
+    print(json.dumps({"lengths": args.lengths, "cpus": os.cpu_count(), "backends": results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
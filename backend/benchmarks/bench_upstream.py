@@ -0,0 +1,110 @@
+"""Retries and hedging against a local mock HTTP server with injected faults.
+
+    python benchmarks/bench_upstream.py --requests 400 --error-rate 0.05 --slow-rate 0.03
+
+The server answers after a base delay, returns 503 for --error-rate of
+requests and stalls for --slow-delay seconds on --slow-rate of them. The
+same workload is run with no retries, with retries, and with retries plus
+hedging at the p90 latency.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from upstream import UpstreamCaller, build_http_client
+
+
+def make_handler(base_delay, error_rate, slow_rate, slow_delay, seed):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class MockUpstream(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                roll = rng.random()
+            if roll < error_rate:
+                self.send_response(503)
+                self.end_headers()
+                return
+            time.sleep(slow_delay if roll < error_rate + slow_rate else base_delay)
+            body = b'{"text": "ok"}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return MockUpstream
+
+
+def run(url, client, num_requests, concurrency, deadline, retries, hedge_percentile):
+    caller = UpstreamCaller(max_workers=2 * concurrency)
+
+    def attempt(timeout):
+        response = client.get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def one_call(_):
+        start = time.perf_counter()
+        try:
+            caller.call("mock", attempt, deadline=deadline, retries=retries, backoff=0.05,
+                        hedge_percentile=hedge_percentile, min_samples=20)
+            return True, time.perf_counter() - start
+        except Exception:
+            return False, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one_call, range(num_requests)))
+
+    latencies = sorted(latency for ok, latency in outcomes if ok)
+    counters = caller.stats()["mock"]
+    return {
+        "retries": retries,
+        "hedge_percentile": hedge_percentile,
+        "success_rate": round(len(latencies) / num_requests, 3),
+        "p50": round(latencies[len(latencies) // 2], 3) if latencies else None,
+        "p99": round(latencies[math.ceil(len(latencies) * 0.99) - 1], 3) if latencies else None,
+        "attempts": counters["attempts"],
+        "hedges": counters["hedges"],
+        "hedge_wins": counters["hedge_wins"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--base-delay', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--slow-rate', type=float, default=0.03)
+    parser.add_argument('--slow-delay', type=float, default=2.0)
+    parser.add_argument('--deadline', type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(
+        args.base_delay, args.error_rate, args.slow_rate, args.slow_delay, seed=1))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    client = build_http_client(max_connections=4 * args.concurrency)
+
+    results = [run(url, client, args.requests, args.concurrency, args.deadline, retries, hedge)
+               for retries, hedge in ((0, None), (3, None), (3, 90))]
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Audio-duration reduction and CPU cost of VAD silence trimming.
+
+    python benchmarks/bench_vad.py --seconds 300 --speech-ratios 0.3 0.5 0.8
+
+Runs on synthetic speech-plus-silence recordings after the same
+downmix/resample step process_recording uses.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import audio_preprocess
+import vad
+from fixtures import fixture
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=int, default=300)
+    parser.add_argument('--speech-ratios', type=float, nargs='+', default=[0.3, 0.5, 0.8])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for ratio in args.speech_ratios:
+            rate = audio_preprocess.TARGET_RATE
+            mono = audio_preprocess.load_mono(fixture(workdir, args.seconds, speech_ratio=ratio), rate)
+
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                trimmed, time_map = vad.trim_silence(mono, rate)
+                timings.append(time.perf_counter() - start)
+
+            minutes = len(mono) / rate / 60
+            results.append({
+                "speech_ratio": ratio,
+                "audio_seconds": round(len(mono) / rate, 2),
+                "trimmed_seconds": round(len(trimmed) / rate, 2),
+                "duration_reduction": round(1 - len(trimmed) / len(mono), 3),
+                "speech_segments": len(time_map.pieces),
+                "ms_per_audio_minute": round(1000 * min(timings) / minutes, 2),
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Requests/s and latency of the read endpoints under gunicorn with 1 vs N workers.
+
+    python benchmarks/bench_workers.py --workers 1 4 --concurrency 32 --seconds 10
+
+Starts `gunicorn -c gunicorn.conf.py wsgi:app` from backend/ with a fresh
+shared state file, seeds a finished job and a session mirrored by this
+process, then hammers /api/status, /api/jobs/<id>, /api/get-form and
+/api/sessions over keep-alive connections. Needs the app's dependencies
+(including PyAudio and the API keys in .env) to import.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+from state_store import SharedState
+
+JOB_ID = "bench-job"
+SESSION_ID = "bench-session"
+
+
+def seed(state_path):
+    """A finished job and a recording session owned by this (live) process"""
+    state = SharedState(state_path)
+    now = time.time()
+    state.put_job({"job_id": JOB_ID, "status": "done", "stage": "saving", "created_at": now,
+                   "started_at": now, "finished_at": now, "result": {"document": "100"},
+                   "stats": {}, "error": None})
+    state.claim_session(SESSION_ID)
+    state.publish_session(SESSION_ID, {"session_id": SESSION_ID, "is_recording": True,
+                                       "elapsed_time": 12.3,
+                                       "levels": {"rms_db": -30.0, "peak_db": -12.0}})
+    return state
+
+
+def start_server(port, workers, env):
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--bind', f'127.0.0.1:{port}', '--workers', str(workers), 'wsgi:app'],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(300):
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            conn.request('GET', '/api/test')
+            conn.getresponse().read()
+            conn.close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("gunicorn did not start")
+
+
+def load(port, concurrency, seconds, paths):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    end = time.monotonic() + seconds
+
+    def client(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        n = i
+        while time.monotonic() < end:
+            path = paths[n % len(paths)]
+            n += 1
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise RuntimeError(response.status)
+                local.append(time.perf_counter() - start)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "requests_per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": round(1000 * latencies[len(latencies) // 2], 2) if latencies else None,
+        "p99_ms": round(1000 * latencies[math.ceil(len(latencies) * 0.99) - 1], 2) if latencies else None,
+        "errors": errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=5098)
+    args = parser.parse_args()
+
+    paths = [f'/api/status?session_id={SESSION_ID}', f'/api/jobs/{JOB_ID}',
+             '/api/get-form', '/api/sessions']
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ,
+                   STATE_PATH=os.path.join(workdir, 'state.sqlite3'),
+                   CACHE_PATH=os.path.join(workdir, 'cache.sqlite3'),
+                   PYTHONPATH=os.pathsep.join(filter(None, [BACKEND, os.environ.get('PYTHONPATH')])))
+        state = seed(env['STATE_PATH'])
+        for workers in args.workers:
+            server = start_server(args.port, workers, env)
+            try:
+                load(args.port, args.concurrency, 1, paths)  # warm up every worker
+                result = load(args.port, args.concurrency, args.seconds, paths)
+            finally:
+                server.terminate()
+                server.wait()
+            results.append({"workers": workers, "concurrency": args.concurrency,
+                            "cpus": os.cpu_count(), **result})
+        state.release_session(SESSION_ID)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
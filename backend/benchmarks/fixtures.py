@@ -0,0 +1,68 @@
+"""Synthetic WAV fixtures for the benchmarks.
+
+The "speech" is a voiced tone with syllable-rate amplitude modulation and
+pauses between utterances, which is enough to look like a consult to the
+capture, VAD and encoding stages without shipping real patient audio.
+"""
+import math
+import os
+import random
+import wave
+from array import array
+
+
+def _voiced_block(rate, seconds, pitch, amplitude):
+    """One utterance: a few harmonics of pitch, modulated at ~4 syllables/s"""
+    samples = []
+    for i in range(int(rate * seconds)):
+        t = i / rate
+        envelope = 0.5 * (1 - math.cos(2 * math.pi * 4 * t))
+        value = sum(math.sin(2 * math.pi * pitch * k * t) / k for k in (1, 2, 3))
+        samples.append(int(amplitude * envelope * value / 1.8))
+    return samples
+
+
+def _noise_block(rate, seconds, amplitude, rng):
+    return [int(rng.gauss(0, amplitude)) for _ in range(int(rate * seconds))]
+
+
+def speech_pcm(seconds, rate=44100, speech_ratio=0.6, seed=0):
+    """Mono int16 samples alternating utterances and low-level room noise"""
+    rng = random.Random(seed)
+    # Precompute a handful of blocks and tile them; synthesising every
+    # sample of a long fixture in pure Python would dominate the benchmark.
+    utterances = [_voiced_block(rate, 1.0, pitch, 9000) for pitch in (110, 140, 190, 220)]
+    noise = _noise_block(rate, 1.0, 80, rng)
+
+    samples = []
+    total = int(rate * seconds)
+    while len(samples) < total:
+        if rng.random() < speech_ratio:
+            for _ in range(rng.randint(1, 3)):
+                samples.extend(rng.choice(utterances))
+        else:
+            samples.extend(noise * rng.randint(1, 4))
+    return samples[:total]
+
+
+def write_wav(path, seconds, rate=44100, channels=2, speech_ratio=0.6, seed=0):
+    """Write a synthetic consult recording and return its path"""
+    mono = array('h', speech_pcm(seconds, rate, speech_ratio, seed))
+    pcm = array('h', bytes(2 * len(mono) * channels))
+    for channel in range(channels):
+        pcm[channel::channels] = mono
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(pcm.tobytes())
+    return path
+
+
+def fixture(directory, seconds, rate=44100, channels=2, speech_ratio=0.6, seed=0):
+    """Cached fixture path for the given parameters"""
+    name = f"consult_{seconds}s_{rate}hz_{channels}ch_{int(speech_ratio * 100)}_{seed}.wav"
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        write_wav(path, seconds, rate, channels, speech_ratio, seed)
+    return path
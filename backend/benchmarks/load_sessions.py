@@ -0,0 +1,84 @@
+"""Load test: N concurrent recording sessions fed by a fake audio source.
+
+    python benchmarks/load_sessions.py --sessions 50 --seconds 20 --speed 4
+
+Each session gets its own FakePyAudio replaying a synthetic consult, so
+the run exercises the real callback -> ring buffer -> WAV writer path.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_audio import FakePyAudio
+from fixtures import fixture
+from sessions import SessionManager
+
+
+def run(num_sessions, seconds, speed, workdir):
+    source = fixture(workdir, seconds)
+    manager = SessionManager()
+
+    os.chdir(workdir)
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    for i in range(num_sessions):
+        pa = FakePyAudio(source, speed=speed)
+        manager.start(f"session-{i}", pa=pa, audio_format=8,
+                      channels=pa.channels, rate=pa.rate)
+
+    # Let every fake stream replay the whole fixture
+    time.sleep(seconds / speed + 0.5)
+
+    counters = {}
+    for session_id in manager.active_sessions():
+        for key, value in manager.status(session_id)["capture"].items():
+            if isinstance(value, int) and key.endswith(("overflows", "underflows", "bytes")):
+                counters[key] = counters.get(key, 0) + value
+
+    filenames = [manager.stop(session_id).filename for session_id in manager.active_sessions()]
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    with wave.open(source, 'rb') as wf:
+        expected_frames = wf.getnframes()
+    complete = 0
+    for filename in filenames:
+        with wave.open(filename, 'rb') as wf:
+            if wf.getnframes() == expected_frames:
+                complete += 1
+        os.remove(filename)
+
+    return {
+        "sessions": num_sessions,
+        "audio_seconds_per_session": seconds,
+        "speed": speed,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_percent_of_one_core": round(100 * cpu / wall, 1),
+        "complete_recordings": complete,
+        **counters,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="replay speed of the fake device (1.0 = real time)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        result = run(args.sessions, args.seconds, args.speed, workdir)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""Load test: server CPU with clients polling /api/status vs subscribed to /api/status-stream.
+
+    python benchmarks/load_status_push.py --clients 200 --recording 4 --seconds 15
+
+A server subprocess runs the status routes over a SessionManager with
+--recording sessions fed by fake audio; every client watches its own
+workstation, so most of them are idle. Polling clients issue one GET per
+--poll-interval like Recording.tsx did; push clients hold one SSE
+connection each, all multiplexed on a single selector thread. The server
+reports its own CPU time, so client work is not counted.
+
+By default the server is one gunicorn worker with the worker class,
+threads and stream limit of gunicorn.conf.py (WEB_THREADS, WEB_STREAMS);
+--server werkzeug uses the development server instead. While the push
+clients are connected, plain GET /api/status latency is sampled to show
+that open streams do not starve the other endpoints; subscribers over
+the stream limit are turned away and counted as rejected.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import runpy
+import selectors
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND)
+
+
+def build_app(recording, push_rate, stream_limit, workdir):
+    """The status routes of app.py over fake recording sessions"""
+    from flask import Flask, Response, jsonify, request
+
+    from fake_audio import FakePyAudio
+    from fixtures import fixture
+    from sessions import SessionManager
+    from status_push import StatusChannel, StreamLimit
+
+    source = fixture(workdir, 10, rate=16000, channels=1)
+    os.chdir(workdir)
+    manager = SessionManager()
+    for i in range(recording):
+        pa = FakePyAudio(source, loop=True)
+        manager.start(f"ws-{i}", pa=pa, audio_format=8, channels=pa.channels, rate=pa.rate)
+    channel = StatusChannel(manager.live_status, rate=push_rate)
+    streams = StreamLimit(stream_limit)
+
+    app = Flask(__name__)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    @app.route('/api/status')
+    def status():
+        return jsonify(manager.status(request.args.get('session_id')))
+
+    @app.route('/api/status-stream')
+    def status_stream():
+        return Response(streams.wrap(channel.subscribe(request.args.get('session_id')),
+                                     "retry: 10000\n\n"),
+                        mimetype='text/event-stream')
+
+    @app.route('/cpu')
+    def cpu():
+        return jsonify({"cpu": time.process_time(), **channel.stats(), **streams.stats()})
+
+    return app
+
+
+def serve(server, port, recording, push_rate, workdir):
+    """Server side: gunicorn with the production settings, or werkzeug"""
+    if server == "werkzeug":
+        from werkzeug.serving import make_server
+        app = build_app(recording, push_rate, int(os.getenv("WEB_STREAMS", "240")), workdir)
+        make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+        return
+
+    from gunicorn.app.base import BaseApplication
+    conf = runpy.run_path(os.path.join(BACKEND, "gunicorn.conf.py"))
+
+    class Server(BaseApplication):
+        def load_config(self):
+            # One worker so /cpu reports the whole server; no worker_exit hook
+            for key in ("worker_class", "threads", "timeout", "keepalive"):
+                self.cfg.set(key, conf[key])
+            self.cfg.set("bind", f"127.0.0.1:{port}")
+            self.cfg.set("workers", 1)
+            self.cfg.set("loglevel", "warning")
+
+        def load(self):
+            # Built in the worker, after the fork, like wsgi:app
+            return build_app(recording, push_rate, int(os.getenv("WEB_STREAMS", "240")), workdir)
+
+    Server().run()
+
+
+def get_json(port, path):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('GET', path)
+    body = conn.getresponse().read()
+    conn.close()
+    return json.loads(body)
+
+
+def poll_clients(port, clients, seconds, interval):
+    """One thread per client, one request per interval"""
+    counts = {"requests": 0, "errors": 0}
+    lock = threading.Lock()
+    end = time.monotonic() + seconds
+
+    def client(i):
+        next_poll = time.monotonic() + interval * i / clients
+        while True:
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+            if time.monotonic() >= end:
+                return
+            try:
+                get_json(port, f'/api/status?session_id=ws-{i}')
+                key = "requests"
+            except Exception:
+                key = "errors"
+            with lock:
+                counts[key] += 1
+            next_poll += interval
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def plain_latency(port, seconds, interval=0.25):
+    """Latencies of plain GET /api/status requests made while the streams are open"""
+    latencies, errors = [], 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        started = time.perf_counter()
+        try:
+            get_json(port, '/api/status?session_id=ws-0')
+            latencies.append(time.perf_counter() - started)
+        except Exception:
+            errors += 1
+        time.sleep(interval)
+    latencies.sort()
+    return {"requests": len(latencies), "errors": errors,
+            "max_ms": round(1000 * latencies[-1], 1) if latencies else None,
+            "median_ms": round(1000 * latencies[len(latencies) // 2], 1) if latencies else None}
+
+
+def push_clients(port, clients, seconds):
+    """All SSE connections read from one selector; counts status frames received"""
+    selector = selectors.DefaultSelector()
+    sockets = []
+    for i in range(clients):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall(f'GET /api/status-stream?session_id=ws-{i} HTTP/1.1\r\n'
+                     f'Host: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n'.encode())
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ)
+        sockets.append(sock)
+
+    frames = 0
+    received = 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        for key, _ in selector.select(timeout=0.5):
+            data = key.fileobj.recv(65536)
+            received += len(data)
+            frames += data.count(b'event: status')
+
+    for sock in sockets:
+        selector.unregister(sock)
+        sock.close()
+    return {"frames": frames, "bytes": received}
+
+
+def measure(port, mode, clients, seconds, interval):
+    if mode == "push":
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(push_clients(port, clients, seconds + 2)))
+        thread.start()
+        # Let every subscriber connect before sampling CPU
+        time.sleep(1)
+        before = get_json(port, '/cpu')
+        result["plain_requests"] = plain_latency(port, seconds)
+        after = get_json(port, '/cpu')
+        thread.join()
+        result["subscribers"] = after["subscribers"]
+        result["rejected_streams"] = after["rejected_streams"]
+    else:
+        before = get_json(port, '/cpu')
+        result = poll_clients(port, clients, seconds, interval)
+        after = get_json(port, '/cpu')
+
+    cpu = after["cpu"] - before["cpu"]
+    return {"mode": mode, "clients": clients, "seconds": seconds,
+            "server_cpu_seconds": round(cpu, 3),
+            "server_cpu_percent": round(100 * cpu / seconds, 1), **result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--recording', type=int, default=4,
+                        help="workstations actually recording; the rest are idle")
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--push-rate', type=float, default=10.0)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--server', choices=["gunicorn", "werkzeug"], default="gunicorn")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        with tempfile.TemporaryDirectory() as workdir:
+            serve(args.server, args.port, args.recording, args.push_rate, workdir)
+        return
+
+    results = []
+    for mode in ("poll", "push"):
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve',
+                                   '--server', args.server, '--port', str(args.port), '--recording', str(args.recording),
+                                   '--push-rate', str(args.push_rate)])
+        try:
+            for _ in range(100):
+                try:
+                    get_json(args.port, '/cpu')
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            results.append(measure(args.port, mode, args.clients, args.seconds,
+                                   args.poll_interval))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps({"server": args.server, "results": results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""Local HTTP stand-in for the ElevenLabs and OpenAI APIs.
+
+Unlike stubs.py, requests go through the real SDKs, the pooled httpx
+client and the upstream retry policy. Run it on its own so its CPU time
+stays out of the measurements:
+
+    python benchmarks/stub_server.py --port 5099 --stt-latency 1.5 --llm-latency 3
+
+or from a benchmark with start_stub_server(), then point the clients at
+it with stub_clients(). Implements POST /v1/speech-to-text, POST
+/v1/chat/completions (plain and stream=True) and GET /stats.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from stubs import SAMPLE_TRANSCRIPT
+
+# One transcript sentence per this many seconds of uploaded speech
+SECONDS_PER_SENTENCE = 8.0
+
+
+def audio_seconds(data):
+    """Duration of an uploaded audio file, or None if it can't be read"""
+    try:
+        import soundfile
+        return soundfile.info(BytesIO(data)).duration
+    except Exception:
+        return None
+
+
+def transcript_words(text, spacing=0.35):
+    """ElevenLabs-style word list with evenly spaced timestamps"""
+    words = []
+    for i, word in enumerate(text.split()):
+        start = round(i * spacing, 3)
+        words.append({"text": word, "start": start, "end": round(start + spacing * 0.8, 3),
+                      "type": "word", "speaker_id": f"speaker_{i // 20 % 2}", "logprob": -0.1})
+    return words
+
+
+class StubState:
+    def __init__(self, stt_latency=0.0, llm_latency=0.0, token_latency=0.0, error_rate=0.0, seed=0):
+        self.stt_latency = stt_latency
+        self.llm_latency = llm_latency
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {"stt_calls": 0, "stt_bytes": 0, "llm_calls": 0, "llm_stream_calls": 0,
+                         "prompt_tokens": 0, "completion_tokens": 0, "errors": 0}
+
+    def count(self, **deltas):
+        with self.lock:
+            for key, value in deltas.items():
+                self.counters[key] += value
+
+    def fail(self):
+        """Whether to answer this request with a 503, per error_rate"""
+        with self.lock:
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.counters["errors"] += 1
+        return failed
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.server.state.lock:
+                return self._json(dict(self.server.state.counters))
+        self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        state = self.server.state
+        body = self._body()
+        if self.path.startswith("/v1/speech-to-text"):
+            time.sleep(state.stt_latency)
+            if state.fail():
+                return self._json({"detail": "stub overloaded"}, 503)
+            return self._speech_to_text(body)
+        if self.path.startswith("/v1/chat/completions"):
+            request = json.loads(body)
+            time.sleep(state.llm_latency)
+            if state.fail():
+                return self._json({"error": {"message": "stub overloaded"}}, 503)
+            return self._chat(request)
+        self._json({"error": "not found"}, 404)
+
+    def _speech_to_text(self, body):
+        message = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body)
+        audio = b""
+        for part in message.iter_parts():
+            if part.get_param("name", header="content-disposition") == "file":
+                audio = part.get_payload(decode=True) or b""
+        self.server.state.count(stt_calls=1, stt_bytes=len(audio))
+
+        seconds = audio_seconds(audio)
+        sentences = 1 if seconds is None else max(1, round(seconds / SECONDS_PER_SENTENCE))
+        text = " ".join([SAMPLE_TRANSCRIPT] * sentences)
+        self._json({"language_code": "kat", "language_probability": 0.99, "text": text,
+                    "words": transcript_words(text)})
+
+    def _chat(self, request):
+        state = self.server.state
+        prompt_tokens = sum(len(m.get("content") or "") for m in request["messages"]) // 4
+        properties = request["response_format"]["json_schema"]["schema"]["properties"]
+        content = json.dumps({name: f"{name} value" for name in properties}, ensure_ascii=False)
+        completion_tokens = (len(content) + 3) // 4
+
+        if not request.get("stream"):
+            state.count(llm_calls=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            return self._json({
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+                "model": request["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+        state.count(llm_stream_calls=1, prompt_tokens=prompt_tokens)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for start in range(0, len(content), 4):
+            time.sleep(state.token_latency)
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk",
+                     "created": int(time.time()), "model": request["model"],
+                     "choices": [{"index": 0, "finish_reason": None,
+                                  "delta": {"content": content[start:start + 4]}}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            state.count(completion_tokens=1)
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+def make_server(port=0, **options):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(**options)
+    return server
+
+
+def start_stub_server(stt_latency=0.0, llm_latency=0.0, token_latency=0.0, error_rate=0.0):
+    """Run the stub server in a child process; returns (process, base URL)"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--port", "0",
+         "--stt-latency", str(stt_latency), "--llm-latency", str(llm_latency),
+         "--token-latency", str(token_latency), "--error-rate", str(error_rate)],
+        stdout=subprocess.PIPE, text=True)
+    # The child prints its URL once it is listening
+    return process, process.stdout.readline().strip()
+
+
+def stub_stats(url):
+    import httpx
+    return httpx.get(f"{url}/stats").json()
+
+
+def stub_clients(url, http_client):
+    """(ElevenLabs, OpenAI) clients talking to the stub server over http_client"""
+    from elevenlabs.client import ElevenLabs
+    from openai import OpenAI
+    return (ElevenLabs(api_key="stub", base_url=url, httpx_client=http_client),
+            OpenAI(api_key="stub", base_url=f"{url}/v1", http_client=http_client, max_retries=0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--stt-latency', type=float, default=0.0)
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="time to first token")
+    parser.add_argument('--token-latency', type=float, default=0.0, help="delay per streamed token")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of 503 responses")
+    args = parser.parse_args()
+
+    server = make_server(args.port, stt_latency=args.stt_latency, llm_latency=args.llm_latency,
+                         token_latency=args.token_latency, error_rate=args.error_rate)
+    print(f"http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""In-process stand-ins for the ElevenLabs and OpenAI clients used by recorder.
+
+They sleep for a configurable latency instead of calling the network, so
+benchmarks measure our own pipeline rather than upstream variance:
+
+    recorder.elevenlabs_client = StubElevenLabs(latency=2.0)
+    recorder.openai_client = StubOpenAI(latency=3.0)
+"""
+import json
+import time
+from types import SimpleNamespace
+
+SAMPLE_TRANSCRIPT = (
+    "გამარჯობა, ჩემი სახელია საბა. მე ვარ ოცდასამი წლის, ვცხოვრობ თბილისში. "
+    "ორი დღეა მაქვს თავის ტკივილი და სიცხე. ალერგია არ მაქვს."
+)
+
+
+def model_field_names(model):
+    """Field names of a Pydantic model class (v1 or v2)"""
+    fields = getattr(model, 'model_fields', None) or model.__fields__
+    return list(fields)
+
+
+def model_required_fields(model):
+    fields = getattr(model, 'model_fields', None) or model.__fields__
+    return [name for name, field in fields.items()
+            if (field.is_required() if hasattr(field, 'is_required') else field.required)]
+
+
+class _SpeechToText:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def convert(self, file=None, **kwargs):
+        self.owner.calls += 1
+        self.owner.bytes_received += len(file.read()) if file is not None else 0
+        time.sleep(self.owner.latency)
+        return SimpleNamespace(text=self.owner.transcript, words=[])
+
+
+class StubElevenLabs:
+    def __init__(self, latency=0.0, transcript=SAMPLE_TRANSCRIPT):
+        self.latency = latency
+        self.transcript = transcript
+        self.calls = 0
+        self.bytes_received = 0
+        self.speech_to_text = _SpeechToText(self)
+
+
+class _Completions:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def parse(self, model=None, messages=None, response_format=None, **kwargs):
+        self.owner.calls += 1
+        # Rough token count: one token per four characters of prompt
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        names = model_field_names(response_format)
+        if not model_required_fields(response_format):
+            # An update model (every field optional): answer for a few fields only
+            names = names[:self.owner.update_fields]
+        values = {name: f"{name} value" for name in names}
+        completion_tokens = len(json.dumps(values, ensure_ascii=False)) // 4
+        self.owner.prompt_tokens += prompt_tokens
+        self.owner.completion_tokens += completion_tokens
+        time.sleep(self.owner.latency + completion_tokens * self.owner.token_latency)
+        message = SimpleNamespace(parsed=response_format(**values), content=None)
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class _StreamingCompletions:
+    """chat.completions.create(stream=True) emitting the JSON a few characters at a time"""
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, model=None, messages=None, response_format=None, stream=False, **kwargs):
+        self.owner.calls += 1
+        self.owner.prompt_tokens += sum(len(m["content"]) for m in messages) // 4
+        fields = response_format["json_schema"]["schema"]["properties"]
+        text = json.dumps({name: f"{name} value" for name in fields}, ensure_ascii=False)
+        return self._chunks(text)
+
+    def _chunks(self, text, chars_per_token=4):
+        time.sleep(self.owner.latency)
+        for start in range(0, len(text), chars_per_token):
+            time.sleep(self.owner.token_latency)
+            self.owner.completion_tokens += 1
+            delta = SimpleNamespace(content=text[start:start + chars_per_token])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class StubOpenAI:
+    def __init__(self, latency=0.0, token_latency=0.0, update_fields=2):
+        # latency: time to first token; token_latency: delay per generated token
+        self.latency = latency
+        self.token_latency = token_latency
+        # Fields an incremental update (recorder.extract_updates) reports as changed
+        self.update_fields = update_fields
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        completions = _Completions(self)
+        self.beta = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        self.chat = SimpleNamespace(completions=_StreamingCompletions(self))
@@ -0,0 +1,127 @@
+"""Content-addressed on-disk cache for transcriptions and form extractions.
+
+Entries live in a single SQLite file, grouped by namespace ("transcription",
+"extraction"). Keys are content hashes, so reprocessing the same audio or
+transcript is a lookup instead of an upstream call. Expired entries are
+dropped after ttl_seconds and the least recently used ones once the store
+grows past max_bytes.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Hex SHA-256 of a file's content, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_key(*parts):
+    """Hex SHA-256 over several strings, unambiguously separated"""
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = part.encode('utf-8')
+        digest.update(len(encoded).to_bytes(8, 'little'))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl_seconds=30 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._db.commit()
+        self._metrics = {}
+
+    def _count(self, namespace, metric):
+        counters = self._metrics.setdefault(namespace, {"hits": 0, "misses": 0,
+                                                        "puts": 0, "evictions": 0})
+        counters[metric] += 1
+
+    def get(self, namespace, key):
+        """Cached value or None; expired entries count as misses"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self._count(namespace, "misses")
+                return None
+
+            self._db.execute(
+                "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key))
+            self._db.commit()
+            self._count(namespace, "hits")
+        return json.loads(row[0])
+
+    def put(self, namespace, key, value):
+        encoded = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, encoded, len(encoded.encode('utf-8')), now, now))
+            self._count(namespace, "puts")
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        """Drop expired entries, then LRU entries beyond max_bytes (lock held)"""
+        for (namespace,) in self._db.execute(
+                "SELECT namespace FROM entries WHERE created_at < ?",
+                (now - self.ttl_seconds,)).fetchall():
+            self._count(namespace, "evictions")
+        self._db.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl_seconds,))
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for namespace, key, size in self._db.execute(
+                "SELECT namespace, key, size FROM entries ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE namespace = ? AND key = ?",
+                             (namespace, key))
+            self._count(namespace, "evictions")
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY namespace"
+            ).fetchall()
+            namespaces = {name: dict(counters) for name, counters in self._metrics.items()}
+        for namespace, entries, size in rows:
+            namespaces.setdefault(namespace, {"hits": 0, "misses": 0, "puts": 0, "evictions": 0})
+            namespaces[namespace].update(entries=entries, bytes=size)
+        for counters in namespaces.values():
+            lookups = counters["hits"] + counters["misses"]
+            counters["hit_rate"] = round(counters["hits"] / lookups, 3) if lookups else None
+        return {
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "namespaces": namespaces,
+        }
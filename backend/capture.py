@@ -0,0 +1,194 @@
+import math
+import threading
+
+import numpy as np
+
+# PortAudio callback flags/return codes (mirrors pyaudio.paInputUnderflow etc.)
+# so the capture engine can be driven by a fake stream without PortAudio.
+PA_CONTINUE = 0
+PA_INPUT_UNDERFLOW = 0x1
+PA_INPUT_OVERFLOW = 0x2
+
+# Floor reported for digital silence
+SILENCE_DB = -90.0
+_SAMPLE_TYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def to_dbfs(amplitude):
+    """Linear amplitude (1.0 = full scale) to dBFS, floored at SILENCE_DB"""
+    if amplitude <= 0:
+        return SILENCE_DB
+    return max(SILENCE_DB, 20 * math.log10(amplitude))
+
+
+class LevelMeter:
+    """RMS and peak input level of the most recently consumed audio"""
+
+    def __init__(self, sample_width=2):
+        self.dtype = _SAMPLE_TYPES.get(sample_width)
+        self.full_scale = float(2 ** (8 * sample_width - 1))
+        self.rms_db = SILENCE_DB
+        self.peak_db = SILENCE_DB
+
+    def update(self, data):
+        if self.dtype is None or not len(data):
+            return
+        samples = np.frombuffer(data, dtype=self.dtype).astype(np.float32)
+        if not samples.size:
+            return
+        rms = float(np.sqrt(np.mean(samples * samples))) / self.full_scale
+        peak = float(np.max(np.abs(samples))) / self.full_scale
+        # Single attribute stores, so readers on other threads never block the consumer
+        self.rms_db = to_dbfs(rms)
+        self.peak_db = to_dbfs(peak)
+
+    def levels(self):
+        return {"rms_db": round(self.rms_db, 1), "peak_db": round(self.peak_db, 1)}
+
+
+class RingBuffer:
+    """Preallocated single-producer/single-consumer byte ring buffer"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        # Absolute byte counters; their difference is the fill level
+        self._write_pos = 0
+        self._read_pos = 0
+        self._lock = threading.Lock()
+        self._data_ready = threading.Condition(self._lock)
+        self.overflows = 0
+        self.dropped_bytes = 0
+
+    def available(self):
+        """Number of unread bytes in the buffer"""
+        with self._lock:
+            return self._write_pos - self._read_pos
+
+    def write(self, data):
+        """Copy data into the buffer; drops the whole chunk if it does not fit"""
+        size = len(data)
+        with self._lock:
+            free = self.capacity - (self._write_pos - self._read_pos)
+            if size > free:
+                # Dropping whole chunks keeps the stream frame-aligned
+                self.overflows += 1
+                self.dropped_bytes += size
+                return 0
+
+            src = memoryview(data)
+            start = self._write_pos % self.capacity
+            first = min(size, self.capacity - start)
+            self._view[start:start + first] = src[:first]
+            if first < size:
+                self._view[0:size - first] = src[first:]
+
+            self._write_pos += size
+            self._data_ready.notify()
+        return size
+
+    def read(self, sink, timeout=None):
+        """Pass unread data to sink as memoryview slices, without copying.
+
+        Blocks up to timeout seconds for data. The slices are only valid
+        while sink runs. Returns the number of bytes consumed.
+        """
+        with self._lock:
+            if self._write_pos == self._read_pos and timeout:
+                self._data_ready.wait(timeout)
+            read_pos = self._read_pos
+            size = self._write_pos - read_pos
+
+        if size == 0:
+            return 0
+
+        # The producer never writes past read_pos, so the unread region can
+        # be handed out without holding the lock.
+        start = read_pos % self.capacity
+        first = min(size, self.capacity - start)
+        sink(self._view[start:start + first])
+        if first < size:
+            sink(self._view[0:size - first])
+
+        with self._lock:
+            self._read_pos = read_pos + size
+        return size
+
+
+class CaptureEngine:
+    """Audio capture driven by the PyAudio stream callback.
+
+    PortAudio calls _callback on its own thread; the callback only copies
+    into a preallocated ring buffer, and a consumer drains it with read().
+    """
+
+    def __init__(self, pa, audio_format, channels, rate, chunk=1024,
+                 sample_width=2, buffer_seconds=10):
+        self.pa = pa
+        self.audio_format = audio_format
+        self.channels = channels
+        self.rate = rate
+        self.chunk = chunk
+        self.sample_width = sample_width
+        self.frame_size = channels * sample_width
+        self.ring = RingBuffer(int(rate * buffer_seconds) * self.frame_size)
+        self.stream = None
+        self.input_overflows = 0
+        self.input_underflows = 0
+        self.underruns = 0
+        self.frames_captured = 0
+
+    def _callback(self, in_data, frame_count, time_info, status_flags):
+        """Stream callback; runs on the PortAudio thread and must not block"""
+        if status_flags & PA_INPUT_OVERFLOW:
+            self.input_overflows += 1
+        if status_flags & PA_INPUT_UNDERFLOW:
+            self.input_underflows += 1
+        if in_data is not None and self.ring.write(in_data):
+            self.frames_captured += frame_count
+        return (None, PA_CONTINUE)
+
+    def start(self):
+        """Open the input stream in callback mode"""
+        self.stream = self.pa.open(format=self.audio_format,
+                                   channels=self.channels,
+                                   rate=self.rate,
+                                   input=True,
+                                   frames_per_buffer=self.chunk,
+                                   stream_callback=self._callback,
+                                   start=False)
+        self.stream.start_stream()
+
+    def read(self, sink, timeout=0.1):
+        """Drain captured audio into sink; returns the number of bytes read"""
+        size = self.ring.read(sink, timeout)
+        if size == 0 and self.is_active():
+            self.underruns += 1
+        return size
+
+    def is_active(self):
+        return self.stream is not None and self.stream.is_active()
+
+    def stop(self):
+        """Stop and close the stream; buffered audio can still be read"""
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+    def duration(self):
+        """Seconds of audio captured so far"""
+        return self.frames_captured / self.rate
+
+    def stats(self):
+        return {
+            "frames_captured": self.frames_captured,
+            "buffer_fill": self.ring.available(),
+            "buffer_capacity": self.ring.capacity,
+            "buffer_overflows": self.ring.overflows,
+            "dropped_bytes": self.ring.dropped_bytes,
+            "input_overflows": self.input_overflows,
+            "input_underflows": self.input_underflows,
+            "underruns": self.underruns,
+        }
@@ -0,0 +1,103 @@
+"""Stand-ins for PyAudio that replay a WAV file through the stream callback.
+
+Used to exercise the capture path without an audio device:
+
+    pa = FakePyAudio("consult.wav", speed=10.0)
+    recorder.initialize_audio(pa)
+"""
+import threading
+import time
+import wave
+
+from capture import PA_CONTINUE
+
+
+class FakeInputStream:
+    """Mimics a callback-mode pyaudio.Stream fed from a WAV file"""
+
+    def __init__(self, wav_path, frames_per_buffer, stream_callback,
+                 speed=1.0, loop=False, status_flags=0):
+        self.wav_path = wav_path
+        self.frames_per_buffer = frames_per_buffer
+        self.stream_callback = stream_callback
+        self.speed = speed
+        self.loop = loop
+        # Flags passed to every callback, e.g. to simulate input overflows
+        self.status_flags = status_flags
+        self._active = False
+        self._thread = None
+
+    def _run(self):
+        with wave.open(self.wav_path, 'rb') as wf:
+            interval = self.frames_per_buffer / wf.getframerate() / self.speed
+            next_time = time.monotonic()
+
+            while self._active:
+                data = wf.readframes(self.frames_per_buffer)
+                if not data:
+                    if not self.loop:
+                        break
+                    wf.rewind()
+                    continue
+
+                frame_count = len(data) // (wf.getnchannels() * wf.getsampwidth())
+                _, flag = self.stream_callback(data, frame_count, {}, self.status_flags)
+                if flag != PA_CONTINUE:
+                    break
+
+                # Pace delivery like a real device would
+                next_time += interval
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+        self._active = False
+
+    def start_stream(self):
+        self._active = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop_stream(self):
+        self._active = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def close(self):
+        self.stop_stream()
+
+    def is_active(self):
+        return self._active
+
+
+class FakePyAudio:
+    """Mimics the parts of pyaudio.PyAudio used by the recorder"""
+
+    def __init__(self, wav_path, speed=1.0, loop=False, status_flags=0):
+        self.wav_path = wav_path
+        self.speed = speed
+        self.loop = loop
+        self.status_flags = status_flags
+        with wave.open(wav_path, 'rb') as wf:
+            self.channels = wf.getnchannels()
+            self.sample_width = wf.getsampwidth()
+            self.rate = wf.getframerate()
+
+    def get_default_input_device_info(self):
+        return {"maxInputChannels": self.channels,
+                "defaultSampleRate": float(self.rate)}
+
+    def get_sample_size(self, audio_format):
+        return self.sample_width
+
+    def open(self, format=None, channels=None, rate=None, input=True,
+             frames_per_buffer=1024, stream_callback=None, start=True):
+        stream = FakeInputStream(self.wav_path, frames_per_buffer, stream_callback,
+                                 speed=self.speed, loop=self.loop,
+                                 status_flags=self.status_flags)
+        if start:
+            stream.start_stream()
+        return stream
+
+    def terminate(self):
+        pass
@@ -0,0 +1,148 @@
+"""Declarative form schemas: one JSON file drives the model, prompt and mapping.
+
+A schema file (see form.json) lists the form's sections and subsections;
+every leaf names the Pydantic field the LLM fills and describes it. Loading
+compiles everything extraction needs once:
+
+- model: Pydantic model used as the structured-output response format
+- system_prompt / user_prompt: the extraction prompt built from the titles
+- update_model / update_system_prompt / update_user_prompt: the same fields
+  as optional updates, for re-extracting only what a transcript change
+  affects (if the schema's prompt has "update_task" and "update_user")
+- paths: field -> (section index, subsection index or None), so a parsed
+  response maps onto a fresh form in O(fields)
+
+The Pydantic models (and response_format) are compiled on first use, which
+keeps Pydantic out of the process's startup.
+
+Adding a form type is a matter of writing another schema file.
+"""
+import hashlib
+import json
+from functools import cached_property
+from typing import Optional
+
+
+class FormSchema:
+    def __init__(self, spec):
+        self.form_type = spec.get("form_type", "form")
+        self.document = spec["document"]
+        # Hash of the spec: changes whenever fields or prompt change
+        self.version = hashlib.sha256(
+            json.dumps(spec, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+        self.fields = []
+        self.paths = {}
+        self._template = []
+        for section_index, section in enumerate(spec["sections"]):
+            if "subsections" in section:
+                subsections = []
+                for sub_index, subsection in enumerate(section["subsections"]):
+                    self._add_field(subsection, (section_index, sub_index))
+                    subsections.append(subsection["title"])
+                self._template.append((section["title"], subsections))
+            else:
+                self._add_field(section, (section_index, None))
+                self._template.append((section["title"], None))
+
+        prompt = spec["prompt"]
+        self.system_prompt = self._build_system_prompt(prompt, spec["sections"])
+        self.user_prompt = prompt["user"]
+        self.update_system_prompt = None
+        self.update_user_prompt = prompt.get("update_user")
+        if "update_task" in prompt:
+            self.update_system_prompt = self._build_system_prompt(
+                dict(prompt, task=prompt["update_task"]), spec["sections"])
+
+    def _add_field(self, leaf, path):
+        name = leaf["field"]
+        if name in self.paths:
+            raise ValueError(f"Duplicate field in form schema: {name}")
+        self.fields.append((name, f"{leaf['title']} - {leaf['description']}", leaf["title"]))
+        self.paths[name] = path
+
+    @cached_property
+    def model(self):
+        """Pydantic model used as the structured-output response format"""
+        from pydantic import Field, create_model
+        return create_model(
+            f"{self.form_type.title()}Content",
+            **{name: (str, Field(description=description)) for name, description, _ in self.fields})
+
+    @cached_property
+    def response_format(self):
+        """Same model as a strict JSON-schema response format, for streamed output"""
+        json_schema = (getattr(self.model, 'model_json_schema', None) or self.model.schema)()
+        json_schema["additionalProperties"] = False
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": self.model.__name__, "schema": json_schema, "strict": True},
+        }
+
+    @cached_property
+    def update_model(self):
+        """Every field optional: an update answers only for the fields that changed"""
+        from pydantic import Field, create_model
+        return create_model(
+            f"{self.form_type.title()}Update",
+            **{name: (Optional[str], Field(default=None, description=description))
+               for name, description, _ in self.fields})
+
+    @staticmethod
+    def _build_system_prompt(prompt, sections):
+        lines = [prompt["role"], prompt["task"], prompt["fields_heading"]]
+        for section in sections:
+            if "subsections" in section:
+                lines.append(f"- {section['title']}{prompt['subsections_suffix']}")
+                lines.extend(f"  * {sub['title']}" for sub in section["subsections"])
+            else:
+                lines.append(f"- {section['title']}")
+        lines.extend(prompt["rules"])
+        return "\n".join(lines)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def field_names(self):
+        return [name for name, _, _ in self.fields]
+
+    def new_form(self):
+        """Empty form in the document/sections/content layout the frontend uses"""
+        sections = []
+        for title, subsections in self._template:
+            if subsections is None:
+                sections.append({"title": title, "content": ""})
+            else:
+                sections.append({"title": title,
+                                 "subsections": [{"title": sub, "content": ""} for sub in subsections]})
+        return {"document": self.document, "sections": sections}
+
+    def fill(self, values, form=None):
+        """Write field values into form (a new empty form by default)"""
+        if form is None:
+            form = self.new_form()
+        sections = form["sections"]
+        for name, value in values.items():
+            path = self.paths.get(name)
+            if path is None:
+                continue
+            section_index, sub_index = path
+            target = sections[section_index]
+            if sub_index is not None:
+                target = target["subsections"][sub_index]
+            target["content"] = value
+        return form
+
+    def values(self, form):
+        """Inverse of fill: field -> content of a filled form"""
+        values = {}
+        sections = form["sections"]
+        for name, (section_index, sub_index) in self.paths.items():
+            target = sections[section_index]
+            if sub_index is not None:
+                target = target["subsections"][sub_index]
+            values[name] = target.get("content", "")
+        return values
@@ -0,0 +1,82 @@
+"""Incremental parsing of a streamed JSON object into completed fields.
+
+The LLM streams its structured output as JSON text in arbitrary token
+boundaries. FieldStreamParser consumes those fragments and returns each
+top-level "key": value pair as soon as the value is complete, so the
+frontend can show fields while the rest of the form is still generating.
+"""
+import json
+
+_WHITESPACE = " \t\r\n"
+
+
+class FieldStreamParser:
+    """Parses one flat JSON object; feed() returns newly completed (key, value) pairs"""
+
+    def __init__(self):
+        self._state = "start"
+        self._token = []
+        self._escape = False
+        self._key = None
+
+    def feed(self, text):
+        completed = []
+        for char in text:
+            state = self._state
+
+            if state in ("in_key", "in_string"):
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    value = json.loads('"' + "".join(self._token) + '"')
+                    self._token = []
+                    if state == "in_key":
+                        self._key = value
+                        self._state = "colon"
+                    else:
+                        completed.append((self._key, value))
+                        self._state = "next"
+                    continue
+                self._token.append(char)
+
+            elif state == "in_scalar":
+                if char in ",}" or char in _WHITESPACE:
+                    completed.append((self._key, json.loads("".join(self._token))))
+                    self._token = []
+                    self._state = "done" if char == "}" else "next" if char in _WHITESPACE else "key"
+                else:
+                    self._token.append(char)
+
+            elif char in _WHITESPACE:
+                continue
+
+            elif state == "start":
+                if char == "{":
+                    self._state = "key"
+            elif state == "key":
+                if char == '"':
+                    self._state = "in_key"
+                elif char == "}":
+                    self._state = "done"
+            elif state == "colon":
+                if char == ":":
+                    self._state = "value"
+            elif state == "value":
+                if char == '"':
+                    self._state = "in_string"
+                else:
+                    self._token = [char]
+                    self._state = "in_scalar"
+            elif state == "next":
+                if char == ",":
+                    self._state = "key"
+                elif char == "}":
+                    self._state = "done"
+
+        return completed
+
+    @property
+    def done(self):
+        return self._state == "done"
@@ -0,0 +1,33 @@
+"""gunicorn settings for wsgi:app; each value can be overridden from the environment"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5001")
+workers = int(os.getenv("WEB_WORKERS", "4"))
+# SSE endpoints (/api/status-stream, /api/process-stream) hold a connection
+# and a thread open for minutes, so each worker serves requests from a large
+# thread pool; idle threads cost a little memory and no CPU. app.py admits at
+# most WEB_STREAMS open streams per worker and turns the rest away (EventSource
+# reconnects), so WEB_THREADS - WEB_STREAMS threads always remain for the other
+# endpoints. Capacity: WEB_WORKERS * WEB_STREAMS subscribers, 960 by default.
+# gevent/eventlet workers are not used: capture threads, SQLite and the STT
+# process pool all block, and would stall every connection on a worker.
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "256"))
+# Audio devices, thread pools and SQLite handles must be created per worker
+preload_app = False
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = os.getenv("ACCESS_LOG") or None
+
+
+def on_starting(server):
+    """Drop sessions left in the shared state by a previous server (no worker records yet)"""
+    from state_store import SharedState
+    SharedState(os.getenv("STATE_PATH", "state.sqlite3")).clear_sessions()
+
+
+def worker_exit(server, worker):
+    """Finalize recordings still open in a worker that is shutting down"""
+    import recorder
+    recorder.cleanup()
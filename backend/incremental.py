@@ -0,0 +1,55 @@
+"""Transcript diffs and three-way form merges for incremental re-extraction.
+
+After a full extraction the recorder keeps its base in extraction.json:
+the transcript the LLM read, how many audio frames it covered and the
+field values it returned. When the transcript later changes (the doctor
+corrects it, or a follow-up recording extends it) only the changed
+sentences go to the LLM, and its answer is merged field by field with
+the saved form, so fields the doctor edited by hand keep their text.
+"""
+import difflib
+import re
+
+# Sentence boundaries: end punctuation followed by whitespace, or line breaks
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+
+def sentences(text):
+    return [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text or "") if sentence.strip()]
+
+
+def diff_transcripts(old, new):
+    """(removed, added, changed_ratio): sentences only in old, only in new, and their share of the text"""
+    old_sentences, new_sentences = sentences(old), sentences(new)
+    matcher = difflib.SequenceMatcher(a=old_sentences, b=new_sentences, autojunk=False)
+    removed, added = [], []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            removed.extend(old_sentences[i1:i2])
+            added.extend(new_sentences[j1:j2])
+    changed = sum(map(len, removed)) + sum(map(len, added))
+    total = sum(map(len, old_sentences)) + sum(map(len, new_sentences))
+    return removed, added, changed / total if total else 0.0
+
+
+def merge_fields(base, ours, theirs):
+    """Three-way merge of field values; returns (merged, conflicts).
+
+    base is what the previous extraction returned, ours the saved form
+    (including the doctor's edits) and theirs the new extraction. A field
+    the doctor did not touch takes the new value; an edited field keeps
+    the doctor's text, and is reported as a conflict if the extraction
+    changed it as well.
+    """
+    merged, conflicts = {}, []
+    for name in sorted(ours.keys() | theirs.keys()):
+        original = base.get(name, "")
+        edited = ours.get(name, original)
+        extracted = theirs.get(name, original)
+        if edited == original:
+            merged[name] = extracted
+        else:
+            merged[name] = edited
+            if extracted not in (original, edited):
+                conflicts.append({"field": name, "saved": edited, "extracted": extracted})
+    return merged, conflicts
@@ -0,0 +1,195 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    """Raised when too many jobs are queued or running"""
+
+
+class JobQueue:
+    """Runs processing jobs on a bounded thread pool and tracks their status.
+
+    Jobs are plain callables that accept a progress(stage) keyword and a
+    stats dict they may fill in (reported alongside the result); a job
+    whose result is a dict with an "error" key is reported as failed.
+
+    With a store (state_store.SharedState), every status change is written
+    through so other worker processes can answer /api/jobs/<job_id>.
+
+    Jobs submitted with a key (the recording ID) are single-flight: while
+    one is queued or running, submitting the same key returns its job ID
+    instead of starting the work again.
+
+    Jobs submitted with stream=True also get an emit(event, data) keyword;
+    follow(job_id) relays those events (from the first) until the job ends,
+    so a Server-Sent Events response can watch a job without running it.
+    """
+
+    def __init__(self, max_workers=4, max_pending=32, retention_seconds=3600, store=None):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="process")
+        self._jobs = {}
+        # key -> ID of the queued or running job for it
+        self._active = {}
+        # job_id -> [(event, data), ...] of stream jobs
+        self._events = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def submit(self, fn, *args, key=None, stream=False, **kwargs):
+        """Queue fn(*args, progress=..., stats=..., **kwargs); returns the job ID"""
+        with self._lock:
+            if key is not None and key in self._active:
+                return self._active[key]
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} jobs already pending")
+            self._evict_finished()
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "stage": None,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "stats": {},
+                "error": None,
+            }
+            self._pending += 1
+            if key is not None:
+                self._active[key] = job_id
+            if stream:
+                self._events[job_id] = []
+                kwargs = dict(kwargs, emit=lambda event, data: self._emit(job_id, event, data))
+
+        self._save(job_id)
+        self._executor.submit(self._run, job_id, fn, args, kwargs, key)
+        return job_id
+
+    def _emit(self, job_id, event, data):
+        with self._changed:
+            self._events[job_id].append((event, data))
+            self._changed.notify_all()
+
+    def follow(self, job_id, heartbeat=15):
+        """Yield a local job's (event, data) pairs until it finishes.
+
+        Yields None when nothing happened for heartbeat seconds, so the
+        caller can keep its connection alive. Jobs without events (or of
+        another worker process) yield nothing but still wait for the end.
+        """
+        seen = 0
+        while True:
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                events = self._events.get(job_id, [])
+                if seen == len(events) and job["finished_at"] is None:
+                    self._changed.wait(heartbeat)
+                batch = events[seen:]
+                seen += len(batch)
+                finished = job["finished_at"] is not None
+            for item in batch:
+                yield item
+            if not batch:
+                if finished:
+                    return
+                yield None
+
+    def active(self, key):
+        """ID of the queued or running job for key, or None"""
+        with self._lock:
+            return self._active.get(key)
+
+    def _run(self, job_id, fn, args, kwargs, key=None):
+        job = self._jobs[job_id]
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        self._save(job_id)
+
+        def progress(stage):
+            job["stage"] = stage
+            self._save(job_id)
+
+        try:
+            result = fn(*args, progress=progress, stats=job["stats"], **kwargs)
+            if isinstance(result, dict) and "error" in result:
+                job["status"] = "failed"
+                job["error"] = result["error"]
+            else:
+                job["status"] = "done"
+                job["result"] = result
+        except Exception as e:
+            print(f"Error in job {job_id}: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            # Free the key before followers see the end, so a request made
+            # after a stream ended starts a new job rather than joining this one
+            with self._lock:
+                job["finished_at"] = time.time()
+                self._pending -= 1
+                if key is not None and self._active.get(key) == job_id:
+                    del self._active[key]
+                self._changed.notify_all()
+            self._save(job_id)
+
+    def _save(self, job_id):
+        """Write a job snapshot through to the shared store"""
+        if self.store is None:
+            return
+        snapshot = self.get(job_id)
+        if snapshot is None:
+            return
+        try:
+            self.store.put_job(snapshot)
+        except Exception as e:
+            print(f"Error saving job {job_id}: {e}")
+
+    def _evict_finished(self):
+        """Forget finished jobs older than the retention window (lock held)"""
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._events.pop(job_id, None)
+        if self.store is not None:
+            self.store.evict_jobs(cutoff)
+
+    def get(self, job_id):
+        """Snapshot of a job's status, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job, stats=dict(job["stats"]))
+        # Submitted to another worker process
+        if self.store is not None:
+            return self.store.get_job(job_id)
+        return None
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "jobs": counts,
+                "shared_jobs": self.store.job_counts() if self.store is not None else None,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,135 @@
+"""Transcribe a recording in overlapping segments while it is still running.
+
+Segments are cut every segment_seconds with overlap_seconds of audio
+repeated at the start of the next one, so a word split by the cut is
+heard whole at least once. The per-segment transcripts are stitched by
+aligning the repeated words, so after stop only the last segment is
+still waiting on STT.
+"""
+import re
+import threading
+
+_WORD_NORMALIZE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def _normalize(word):
+    return _WORD_NORMALIZE.sub("", word).lower()
+
+
+def stitch(previous, following, max_overlap_words=40, min_match_words=2):
+    """Join two transcripts, dropping the words following repeats from previous"""
+    prev_words = previous.split()
+    next_words = following.split()
+    if not prev_words:
+        return following
+    if not next_words:
+        return previous
+
+    tail = [_normalize(w) for w in prev_words[-max_overlap_words:]]
+    head = [_normalize(w) for w in next_words[:max_overlap_words]]
+
+    # The overlap is a run of words that ends at (or within two words of) the
+    # end of previous; try the run ending closest to the end first, so an
+    # earlier repeat of the same words isn't taken for it. previous is kept
+    # whole; only following's copy of the overlap is dropped.
+    for end in range(len(tail), max(len(tail) - 3, 0), -1):
+        size, stop = _longest_run_ending(tail, end, head)
+        if size >= min_match_words:
+            next_words = next_words[stop:]
+            break
+
+    return " ".join(prev_words + next_words)
+
+
+def _longest_run_ending(tail, end, head):
+    """(size, end in head) of the longest run of words ending at tail[end - 1] found in head"""
+    best = (0, 0)
+    for stop in range(1, len(head) + 1):
+        size = 0
+        while size < min(end, stop) and tail[end - 1 - size] == head[stop - 1 - size]:
+            size += 1
+        if size > best[0]:
+            best = (size, stop)
+    return best
+
+
+class SegmentedTranscriber:
+    """Feeds live PCM to an STT function in overlapping background segments.
+
+    transcribe(pcm, start_seconds) must return the segment's (text, words),
+    words being dicts with start/end already on the recording's timeline;
+    it is called on executor threads.
+    """
+
+    def __init__(self, transcribe, executor, channels, sample_width, rate,
+                 segment_seconds=30, overlap_seconds=3):
+        self.transcribe = transcribe
+        self.executor = executor
+        self.frame_size = channels * sample_width
+        self.rate = rate
+        self.overlap_seconds = overlap_seconds
+        self.segment_bytes = int(segment_seconds * rate) * self.frame_size
+        self.overlap_bytes = int(overlap_seconds * rate) * self.frame_size
+        self._buffer = bytearray()
+        # Absolute byte offset of _buffer[0] in the recording
+        self._buffer_offset = 0
+        self._futures = []
+        # Start of each submitted segment in seconds
+        self._starts = []
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def feed(self, data):
+        """Append captured PCM (bytes or memoryview); submits full segments"""
+        with self._lock:
+            self._buffer.extend(data)
+            if len(self._buffer) >= self.segment_bytes:
+                self._submit()
+                # Carry the overlap into the next segment
+                keep = self._buffer[-self.overlap_bytes:] if self.overlap_bytes else bytearray()
+                self._buffer_offset += len(self._buffer) - len(keep)
+                self._buffer = bytearray(keep)
+
+    def _submit(self):
+        start_seconds = self._buffer_offset / self.frame_size / self.rate
+        self._starts.append(start_seconds)
+        self._futures.append(self.executor.submit(self.transcribe, bytes(self._buffer),
+                                                  start_seconds))
+
+    def finish(self):
+        """Submit the final segment; call once the recording has stopped"""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+            # The tail is only the overlap we already sent, unless nothing was sent
+            if len(self._buffer) > self.overlap_bytes or not self._futures:
+                self._submit()
+            self._buffer = bytearray()
+
+    @property
+    def segments(self):
+        return len(self._futures)
+
+    def result(self, timeout=None):
+        """Stitched transcript; waits for outstanding segments"""
+        self.finish()
+        text = ""
+        for future in self._futures:
+            text = stitch(text, future.result(timeout=timeout)[0])
+        return text
+
+    def words(self, timeout=None):
+        """Timestamped words of all segments; waits for outstanding segments.
+
+        Each overlap is heard by two segments: words starting before its
+        midpoint are taken from the earlier one, the rest from the later.
+        """
+        self.finish()
+        cuts = [start + self.overlap_seconds / 2 for start in self._starts[1:]]
+        bounds = zip([float('-inf')] + cuts, cuts + [float('inf')])
+        words = []
+        for future, (low, high) in zip(self._futures, bounds):
+            words.extend(word for word in future.result(timeout=timeout)[1]
+                         if word["start"] is None or low <= word["start"] < high)
+        return words
@@ -0,0 +1,207 @@
+"""Timing spans for the recording/processing pipeline and a Prometheus exposition.
+
+Wrap a pipeline step in span("stt_upload", bytes=n) or, for work timed
+elsewhere (the capture loop), report it with record(). Every span feeds
+the process-wide histograms rendered by render() for /metrics; inside
+tracing() the spans are also collected into a per-request trace.
+
+Metrics are kept per process: under gunicorn each worker exposes its own.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1 KiB .. 256 MiB
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+# Span attributes reported as token histograms, by token kind
+TOKEN_ATTRIBUTES = {"prompt_tokens": "prompt", "completion_tokens": "completion"}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with arbitrary label sets"""
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count)
+                      for key, (counts, total, count) in self._series.items()}
+        for key in sorted(series):
+            counts, total, count = series[key]
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key in sorted(values):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_number(values[key])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, name, help, buckets=DURATION_BUCKETS):
+        metric = Histogram(name, help, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help):
+        metric = Counter(name, help)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+stage_seconds = registry.histogram("pipeline_stage_seconds", "Wall time of pipeline stages",
+                                   DURATION_BUCKETS)
+stage_bytes = registry.histogram("pipeline_stage_bytes", "Bytes handled by pipeline stages",
+                                 BYTES_BUCKETS)
+stage_tokens = registry.histogram("pipeline_stage_tokens", "LLM tokens per pipeline stage",
+                                  TOKEN_BUCKETS)
+stage_errors = registry.counter("pipeline_stage_errors_total", "Pipeline stages that raised")
+
+render = registry.render
+
+
+class Trace:
+    """Spans recorded during one request, with start offsets relative to the request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, started, seconds, attributes):
+        entry = {"name": name, "start_ms": round(1000 * (started - self.started), 2),
+                 "duration_ms": round(1000 * seconds, 2), **attributes}
+        with self._lock:
+            self._spans.append(entry)
+
+    def spans(self):
+        with self._lock:
+            return sorted(self._spans, key=lambda entry: entry["start_ms"])
+
+
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+@contextmanager
+def tracing():
+    """Collect the spans recorded in this context into a Trace"""
+    trace = Trace()
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+def traced(fn):
+    """Wrap a job function so its spans are reported in stats["trace"]"""
+    def run(*args, stats=None, **kwargs):
+        with tracing() as trace:
+            try:
+                return fn(*args, stats=stats, **kwargs)
+            finally:
+                if stats is not None:
+                    stats["trace"] = trace.spans()
+    return run
+
+
+def record(name, seconds, started=None, **attributes):
+    """Report a finished stage: histograms, plus the current trace if any"""
+    stage_seconds.observe(seconds, stage=name)
+    if attributes.get("bytes") is not None:
+        stage_bytes.observe(attributes["bytes"], stage=name)
+    for attribute, kind in TOKEN_ATTRIBUTES.items():
+        if attributes.get(attribute) is not None:
+            stage_tokens.observe(attributes[attribute], stage=name, kind=kind)
+    if attributes.get("error"):
+        stage_errors.inc(stage=name)
+
+    trace = _trace.get()
+    if trace is not None:
+        if started is None:
+            started = time.perf_counter() - seconds
+        trace.add(name, started, seconds, attributes)
+
+
+class Span:
+    def __init__(self, attributes):
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        """Attach attributes (bytes, tokens, ...) known only once the work is done"""
+        self.attributes.update(attributes)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block of the pipeline as stage `name`"""
+    current = Span(attributes)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        record(name, time.perf_counter() - started, started, **current.attributes)
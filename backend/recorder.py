@@ -1,380 +1,992 @@
-import pyaudio
 import wave
-import uuid
 import time
 import json
 import os
-from io import BytesIO
-import requests
+import importlib.util
 from dotenv import load_dotenv
-from elevenlabs.client import ElevenLabs
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
-from openai import OpenAI
+from sessions import SessionManager, DEFAULT_SESSION
+from state_store import SharedState
+from storage import RecordingStore, write_atomic
+import threading
+from wav_writer import recover_wav
+import audio_preprocess
+import metrics
+import incremental
+import vad
+from live_transcription import SegmentedTranscriber
+from concurrent.futures import ThreadPoolExecutor
+from cache import ResultCache, file_sha256, text_key
+from form_schema import FormSchema
+from upstream import UpstreamCaller, build_http_client
+import stt
+from form_stream import FieldStreamParser
 
 # Load environment variables
 load_dotenv()
 
-# OpenAI Client Setup
-openai_client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+# Upstream call policy: per-call deadline, retries and optional hedging
+STT_DEADLINE = float(os.getenv("STT_DEADLINE_SECONDS", "120"))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE_SECONDS", "90"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "3"))
+# e.g. 95 to send a duplicate request once an attempt exceeds the p95 latency
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0")) or None
 
-# ElevenLabs Client Setup
-elevenlabs_client = ElevenLabs(
-    api_key=os.getenv("ELEVENLABS_API_KEY"),
-)
+upstream_caller = UpstreamCaller()
+
+# The SDKs take about a second to import, so the clients (and the pooled
+# HTTP client both share) are built on first use; see get_openai_client().
+# Benchmarks may assign stand-ins to these names directly.
+http_client = None
+openai_client = None
+elevenlabs_client = None
+_clients_lock = threading.Lock()
+# None until warm_up() runs, then "running", "ok" or "error: ..."
+_warm_up = None
+
+def get_http_client():
+    """One pooled HTTP client shared by both SDKs; retries are handled by upstream_caller"""
+    global http_client
+    with _clients_lock:
+        if http_client is None:
+            http_client = build_http_client(
+                max_connections=int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "32")))
+        return http_client
+
+def get_openai_client():
+    global openai_client
+    if openai_client is None:
+        from openai import OpenAI
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=get_http_client(),
+                        max_retries=0)
+        with _clients_lock:
+            if openai_client is None:
+                openai_client = client
+    return openai_client
+
+def get_elevenlabs_client():
+    global elevenlabs_client
+    if elevenlabs_client is None:
+        from elevenlabs.client import ElevenLabs
+        client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"), httpx_client=get_http_client())
+        with _clients_lock:
+            if elevenlabs_client is None:
+                elevenlabs_client = client
+    return elevenlabs_client
 
 # Recording parameters
 CHUNK = 1024
-FORMAT = pyaudio.paInt16
+FORMAT = 8  # pyaudio.paInt16; PyAudio itself is loaded by initialize_audio()
 RATE = 44100
 CHANNELS = 2
 RECORD_SECONDS = 160
 
+# Upstream models; part of the cache keys, so changing them invalidates results
+STT_MODEL = "scribe_v1"
+STT_LANGUAGE = "kat"
+# "elevenlabs" or "local" (faster-whisper on this machine, see stt.py)
+STT_BACKEND = os.getenv("STT_BACKEND", "elevenlabs")
+OPENAI_MODEL = "gpt-4o-mini"
+
+if STT_BACKEND == "local":
+    stt_backend = stt.LocalWhisperSTT()
+elif STT_BACKEND == "elevenlabs":
+    # Looks the client up per call: built lazily, and benchmarks may swap in a stub
+    stt_backend = stt.ElevenLabsSTT(get_elevenlabs_client, upstream_caller, STT_MODEL, STT_LANGUAGE,
+                                    deadline=STT_DEADLINE, retries=UPSTREAM_RETRIES,
+                                    hedge_percentile=HEDGE_PERCENTILE)
+else:
+    raise ValueError(f"Unknown STT_BACKEND {STT_BACKEND!r}")
+
+# Form 100 model, prompt and field->path index, compiled once from form.json
+FORM_SCHEMA = FormSchema.load(os.getenv("FORM_SCHEMA_PATH",
+                                        os.path.join(os.path.dirname(os.path.abspath(__file__)), "form.json")))
+
+# Live transcription: send overlapping segments to STT while still recording
+LIVE_TRANSCRIPTION = os.getenv("LIVE_TRANSCRIPTION", "1") == "1"
+LIVE_SEGMENT_SECONDS = float(os.getenv("LIVE_SEGMENT_SECONDS", "30"))
+LIVE_OVERLAP_SECONDS = float(os.getenv("LIVE_OVERLAP_SECONDS", "3"))
+
 # Initialize global variables
-stream = None
-frames = []
 p = None
-is_recording = False
-current_filename = None
+_audio_lock = threading.Lock()
 
-def initialize_audio():
-    """Initialize PyAudio"""
+# Active recordings captured by this process, one per doctor/workstation
+sessions = SessionManager()
+
+# Sessions and jobs shared by all worker processes
+shared_state = SharedState(os.getenv("STATE_PATH", "state.sqlite3"))
+# How often this worker mirrors its sessions and checks for stop requests
+STATE_SYNC_INTERVAL = float(os.getenv("STATE_SYNC_INTERVAL", "0.2"))
+_sync_thread = None
+
+# Segment uploads for live transcription, shared by all sessions
+stt_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LIVE_STT_WORKERS", "4")),
+                                  thread_name_prefix="live-stt")
+
+# Live transcribers of stopped recordings, keyed by recording ID, until processed:
+# (transcriber, stopped_at)
+live_transcripts = {}
+# Same for follow-up recordings; these cover only the appended audio
+appended_transcripts = {}
+# Processing may run in another worker, or never be requested: entries are dropped
+# once their recording is done or failed, or after this many seconds
+LIVE_TRANSCRIPT_TTL = float(os.getenv("LIVE_TRANSCRIPT_TTL", "3600"))
+# How often the sync thread looks for such entries
+LIVE_TRANSCRIPT_SWEEP_INTERVAL = 30.0
+# How long processing in another worker waits for the capturing worker to cache
+# the live transcript before transcribing the whole file itself
+LIVE_TRANSCRIPT_WAIT = float(os.getenv("LIVE_TRANSCRIPT_WAIT", "60"))
+# Above this share of changed transcript text, re-extract the whole form
+FULL_REEXTRACT_RATIO = float(os.getenv("FULL_REEXTRACT_RATIO", "0.5"))
+
+# Audio, transcripts and forms per recording, with a SQLite index for history
+recordings = RecordingStore(os.getenv("RECORDINGS_DIR", "recordings"))
+# Opus playback copies, encoded in the background once a recording stops
+PLAYBACK_OPUS = os.getenv("PLAYBACK_OPUS", "1") == "1"
+rendition_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rendition")
+_renditions_pending = set()
+_renditions_lock = threading.Lock()
+
+# Transcriptions keyed by audio hash, extractions keyed by transcript hash
+result_cache = ResultCache(os.getenv("CACHE_PATH", "cache.sqlite3"),
+                           max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+                           ttl_seconds=int(os.getenv("CACHE_TTL_SECONDS", str(30 * 24 * 3600))))
+
+def initialize_audio(pa=None):
+    """Initialize PyAudio (or a stand-in such as fake_audio.FakePyAudio).
+    
+    Called on the first recording rather than at startup, so hosts without
+    an audio device (or without PortAudio) can still serve processing.
+    """
     global p, CHANNELS
-    p = pyaudio.PyAudio()
-    device_info = p.get_default_input_device_info()
+    if pa is None:
+        import pyaudio
+        pa = pyaudio.PyAudio()
+    try:
+        device_info = pa.get_default_input_device_info()
+    except Exception:
+        pa.terminate()
+        raise
     max_input_channels = device_info.get('maxInputChannels', 1)
     CHANNELS = 2 if max_input_channels >= 2 else 1
+    p = pa
     return p
 
-def start_recording():
-    """Start recording audio"""
-    global stream, frames, p, is_recording
+def start_recording(session_id=DEFAULT_SESSION, append_to=None):
+    """Start recording audio for a session.
+    
+    append_to, a processed recording's ID, records a follow-up that extends
+    that recording's audio instead of starting a new one.
+    """
+    try:
+        with _audio_lock:
+            if p is None:
+                initialize_audio()
+    except Exception as e:
+        return {"status": "audio_unavailable", "error": f"No audio input device: {e}"}
     
-    if p is None:
-        p = initialize_audio()
+    local = sessions.get(session_id)
+    if local is not None:
+        return {"status": "already_recording", "time": local.elapsed(),
+                "recording_id": local.recording_id}
     
-    # Reset frames
-    frames = []
+    if append_to is not None:
+        record = recordings.get(append_to)
+        if record is None or record["status"] != "done" or load_extraction(append_to) is None:
+            return {"error": "Only processed recordings can be continued"}
     
-    # Open audio stream
-    stream = p.open(format=FORMAT,
-                    channels=CHANNELS,
-                    rate=RATE,
-                    input=True,
-                    frames_per_buffer=CHUNK)
+    # Another worker process may already be capturing this session
+    if not shared_state.claim_session(session_id):
+        remote = shared_state.session(session_id) or {}
+        elapsed = remote["status"]["elapsed_time"] if remote.get("status") else 0
+        return {"status": "already_recording", "time": elapsed,
+                "recording_id": remote.get("recording_id")}
     
-    is_recording = True
+    # Each session streams its audio straight into its recording's storage
+    if append_to is not None:
+        recording_id = append_to
+        # Atomic: a concurrent follow-up (in any worker) may have passed the check above too
+        if not recordings.transition(recording_id, "done", "recording"):
+            shared_state.release_session(session_id)
+            return {"error": "Only processed recordings can be continued"}
+    else:
+        recording_id = recordings.create(session_id)
+    try:
+        session, created = sessions.start(session_id, pa=p, audio_format=FORMAT,
+                                          channels=CHANNELS, rate=RATE, chunk=CHUNK,
+                                          transcriber_factory=make_transcriber if LIVE_TRANSCRIPTION else None,
+                                          recording_id=recording_id,
+                                          filename=recordings.path(recording_id, "audio"),
+                                          append=append_to is not None)
+    except Exception as e:
+        shared_state.release_session(session_id)
+        if append_to is not None:
+            # The earlier recording and its form are still intact
+            recordings.update(recording_id, status="done")
+        else:
+            recordings.update(recording_id, status="failed", error=str(e))
+        raise
     
     # Return a status message
-    return {"status": "recording_started"}
+    shared_state.publish_session(session_id, sessions.live_status(session_id), recording_id)
+    start_state_sync()
+    return {"status": "recording_started", "time": 0, "recording_id": recording_id}
+
+def get_status(session_id=DEFAULT_SESSION):
+    """Recording state, elapsed time and capture counters of a session"""
+    if sessions.get(session_id) is None:
+        # Captured by another worker: its last mirrored status
+        remote = shared_state.session(session_id)
+        if remote and remote["status"]:
+            return remote["status"]
+    return sessions.status(session_id)
+
+def get_live_status(session_id=DEFAULT_SESSION):
+    """Compact status for the push channel, from this worker or the shared store"""
+    if sessions.get(session_id) is None:
+        remote = shared_state.session_statuses().get(session_id)
+        if remote is not None:
+            return remote
+    return sessions.live_status(session_id)
+
+def active_sessions():
+    """Sessions recording in any worker process"""
+    return sorted(set(sessions.active_sessions()) | set(shared_state.active_sessions()))
+
+def _stop_local(session_id):
+    """Stop a session captured by this worker; returns its recording ID or None"""
+    session = sessions.stop(session_id)
+    if session is None:
+        return None
+    
+    recording_id = session.recording_id
+    # The writer's duration includes any audio recorded before a follow-up
+    recordings.update(recording_id, status="recorded",
+                      audio_seconds=round(session.writer.duration(), 2))
+    # The capture loop only accumulates counters; report them once per recording
+    capture_stats = session.engine.stats()
+    captured_bytes = capture_stats["frames_captured"] * session.engine.frame_size
+    metrics.record("capture", session.elapsed_time, bytes=captured_bytes,
+                   dropped_bytes=capture_stats["dropped_bytes"],
+                   input_overflows=capture_stats["input_overflows"])
+    metrics.record("wav_write", session.write_seconds, bytes=captured_bytes)
+    if session.transcriber and session.append:
+        appended_transcripts[recording_id] = (session.transcriber, time.time())
+    elif session.transcriber:
+        live_transcripts[recording_id] = (session.transcriber, time.time())
+        # The processing request may land on another worker; share the result via the cache
+        shared_state.mark_live_transcript(recording_id)
+        threading.Thread(target=_cache_live_transcript, args=(recording_id, session.transcriber),
+                         daemon=True).start()
+    schedule_rendition(recording_id)
+    
+    return recording_id
+
+def _cache_live_transcript(recording_id, transcriber):
+    """Store a finished live transcript under the recording's audio hash"""
+    try:
+        aggregated_transcriptions = transcriber.result()
+        audio_key = text_key(file_sha256(recordings.path(recording_id, "audio")),
+                             stt_backend.model, stt_backend.language)
+        # Words first: a worker that finds the transcript also finds its words
+        result_cache.put("words", audio_key, transcriber.words())
+        result_cache.put("transcription", audio_key, aggregated_transcriptions)
+    except Exception as e:
+        print(f"Live transcript of {recording_id} not cached: {e}")
+    finally:
+        shared_state.clear_live_transcript(recording_id)
 
-def record_chunk():
-    """Record a single chunk of audio"""
-    global stream, frames, is_recording
+def _wait_for_live_transcript(recording_id, audio_key, progress):
+    """Cached transcript of a recording whose live segments another worker is finishing, or None"""
+    deadline = time.monotonic() + LIVE_TRANSCRIPT_WAIT
+    waited = False
+    while shared_state.live_transcript_pending(recording_id) and time.monotonic() < deadline:
+        if not waited:
+            progress("transcribing")
+            waited = True
+        time.sleep(0.2)
+    return result_cache.get("transcription", audio_key) if waited else None
+
+def stop_recording(session_id=DEFAULT_SESSION):
+    """Stop recording a session and finalize its WAV file"""
+    if sessions.get(session_id) is not None:
+        recording_id = _stop_local(session_id)
+        shared_state.release_session(session_id)
+    elif shared_state.session(session_id) is not None:
+        # The owning worker stops it on its next sync and hands back the recording ID
+        shared_state.request_stop(session_id)
+        recording_id = shared_state.wait_for_stop(session_id)
+    else:
+        recording_id = None
     
-    if stream and is_recording:
+    if recording_id is None:
+        return {"status": "not_recording"}
+    return {"status": "recording_stopped", "recording_id": recording_id}
+
+def evict_live_transcripts(now=None):
+    """Drop live transcribers nobody in this worker will use; returns how many"""
+    now = time.time() if now is None else now
+    evicted = 0
+    for transcripts in (live_transcripts, appended_transcripts):
+        for recording_id, (_, stopped_at) in list(transcripts.items()):
+            record = recordings.get(recording_id)
+            # Processed (or failed) in another worker, deleted, or never processed at all
+            if (record is None or record["status"] in ("done", "failed")
+                    or now - stopped_at > LIVE_TRANSCRIPT_TTL):
+                if transcripts.pop(recording_id, None) is not None:
+                    evicted += 1
+    return evicted
+
+def _sync_state():
+    """Mirror local sessions into the shared store and serve stop requests from other workers"""
+    next_sweep = time.monotonic() + LIVE_TRANSCRIPT_SWEEP_INTERVAL
+    while True:
         try:
-            data = stream.read(CHUNK, exception_on_overflow=False)
-            frames.append(data)
-            return True
+            for session_id in shared_state.stop_requests():
+                shared_state.complete_stop(session_id, _stop_local(session_id))
+            for session_id in sessions.active_sessions():
+                shared_state.publish_session(session_id, sessions.live_status(session_id))
+            if time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + LIVE_TRANSCRIPT_SWEEP_INTERVAL
+                evict_live_transcripts()
         except Exception as e:
-            print(f"Error recording chunk: {e}")
-            return False
-    return False
+            print(f"Error syncing shared state: {e}")
+        time.sleep(STATE_SYNC_INTERVAL)
+
+def start_state_sync():
+    """Start the background sync thread once per worker process"""
+    global _sync_thread
+    if _sync_thread is None or not _sync_thread.is_alive():
+        _sync_thread = threading.Thread(target=_sync_state, daemon=True, name="state-sync")
+        _sync_thread.start()
+
+def transcribe_audio(audio_data):
+    """Transcribe an encoded audio file-like object with the configured STT backend"""
+    return stt_backend.transcribe(audio_data)
+
+def shift_words(words, offset):
+    """Move aligned words by offset seconds, e.g. from a segment onto its recording's timeline"""
+    for word in words:
+        for key in ("start", "end"):
+            if word[key] is not None:
+                word[key] += offset
+    return words
+
+def transcribe_segment(pcm, channels, rate, start_seconds=0.0):
+    """Transcribe one live segment of raw PCM starting start_seconds into the recording.
+    
+    Returns (text, words) with the words on the recording's timeline.
+    """
+    audio_data, upload_stats, time_map = audio_preprocess.prepare_pcm(pcm, channels, rate,
+                                                                      fmt=stt_backend.audio_format)
+    if upload_stats["upload_seconds"] == 0:
+        # VAD found no speech in this segment
+        return "", []
+    transcription = transcribe_audio(audio_data)
+    words = vad.align_words(getattr(transcription, 'words', None), time_map)
+    return transcription.text, shift_words(words, start_seconds)
+
+def make_transcriber(channels, sample_width, rate):
+    """Live transcriber for a new recording session"""
+    return SegmentedTranscriber(lambda pcm, start_seconds: transcribe_segment(pcm, channels, rate,
+                                                                              start_seconds),
+                                stt_executor, channels, sample_width, rate,
+                                segment_seconds=LIVE_SEGMENT_SECONDS,
+                                overlap_seconds=LIVE_OVERLAP_SECONDS)
 
-def stop_recording():
-    """Stop recording and save audio to file"""
-    global stream, frames, p, is_recording, current_filename
+def transcribe_recording(recording_id, progress, stats):
+    """Transcript of a recording: from the cache, the live segments or whole-file STT"""
+    filename = recordings.path(recording_id, "audio")
     
-    is_recording = False
+    # Repair the header if the recording was interrupted by a crash
+    if recover_wav(filename):
+        print(f"Recovered interrupted recording {filename}")
     
-    if stream:
-        stream.stop_stream()
-        stream.close()
-        stream = None
+    saved = _saved_transcript(recording_id, stats)
+    if saved is not None:
+        return saved
     
-    # Save the recorded audio as a WAV file
-    filename = f"recording_{uuid.uuid4().hex}.wav"
-    current_filename = filename
+    # Reprocessing the same audio (retry, double click) is a cache lookup
+    audio_key = text_key(file_sha256(filename), stt_backend.model, stt_backend.language)
+    aggregated_transcriptions = result_cache.get("transcription", audio_key)
+    stats["transcription_cache"] = "miss" if aggregated_transcriptions is None else "hit"
+    # Diarized words with timestamps on the original (untrimmed) timeline
+    words = None
     
-    with wave.open(filename, 'wb') as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(p.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b''.join(frames))
+    # Segments transcribed during recording; only the last may still be pending
+    transcriber, _ = live_transcripts.pop(recording_id, (None, None))
+    # A follow-up's live transcript covers only its own audio; this path needs all of it
+    appended_transcripts.pop(recording_id, None)
+    if transcriber is None and aggregated_transcriptions is None:
+        aggregated_transcriptions = _wait_for_live_transcript(recording_id, audio_key, progress)
+        if aggregated_transcriptions is not None:
+            stats["transcription_cache"] = "hit"
+            stats["live_transcript"] = "other_worker"
+    if transcriber and aggregated_transcriptions is None:
+        progress("transcribing")
+        try:
+            aggregated_transcriptions = transcriber.result()
+            words = transcriber.words()
+            stats["live_segments"] = transcriber.segments
+        except Exception as e:
+            aggregated_transcriptions = None
+            print(f"Live transcription failed, transcribing whole file: {e}")
     
-    return {"status": "recording_stopped", "filename": filename}
-
-def process_recording(filename=None):
-    """Process the recording and generate form data"""
-    if filename is None:
-        filename = current_filename
+    if aggregated_transcriptions is None:
+        # Downmix/resample to 16 kHz mono before upload; STT doesn't need more
+        progress("preprocessing")
+        with metrics.span("preprocess") as span:
+            audio_data, upload_stats, time_map = audio_preprocess.prepare_for_stt(
+                filename, fmt=stt_backend.audio_format)
+            span.set(bytes=upload_stats["upload_bytes"])
+        stats.update(upload_stats)
+        print(f"Uploading {upload_stats['upload_bytes']} bytes "
+              f"({upload_stats['bytes_saved']} saved)")
         
-    if not filename or not os.path.exists(filename):
+        # Perform transcription with ElevenLabs
+        print(f"Transcribing with {STT_BACKEND}...")
+        progress("transcribing")
+        transcription = None
+        aggregated_transcriptions = ""
+        if upload_stats["upload_seconds"] > 0:
+            transcription = transcribe_audio(audio_data)
+            aggregated_transcriptions = transcription.text
+        words = vad.align_words(getattr(transcription, 'words', None), time_map)
+    
+    if stats["transcription_cache"] == "miss":
+        result_cache.put("words", audio_key, words)
+        result_cache.put("transcription", audio_key, aggregated_transcriptions)
+    else:
+        # None for entries cached before words were; keep the saved words then
+        words = result_cache.get("words", audio_key)
+    if words is not None:
+        recordings.write_blob(recording_id, "words", json.dumps(words, ensure_ascii=False))
+    
+    # Save the transcription with the recording
+    recordings.write_blob(recording_id, "transcript", aggregated_transcriptions)
+    
+    return aggregated_transcriptions
+
+def save_filled_form(recording_id, filled_form, **metadata):
+    """Save a recording's form; the patient name is indexed for the history view"""
+    patient = FORM_SCHEMA.values(filled_form).get("patient_name") or None
+    with metrics.span("form_save") as span:
+        recordings.save_form(recording_id, filled_form, patient=patient, **metadata)
+        span.set(bytes=os.path.getsize(recordings.path(recording_id, "form")))
+
+def find_recording(recording_id=None):
+    """A stored recording with audio (the latest if no ID is given), or None"""
+    if recording_id is None:
+        recording_id = recordings.latest()
+    if recordings.get(recording_id) is None or not os.path.exists(recordings.path(recording_id, "audio")):
+        return None
+    return recording_id
+
+# Statuses in which a recording must not be processed: its WAV is still open for
+# writing, or another job (in any worker) is already working on it
+BUSY_STATUSES = {
+    "recording": "Recording is still being recorded",
+    "processing": "Recording is already being processed",
+}
+# A recording left "processing" this long was abandoned by a worker that died mid-job
+PROCESSING_TIMEOUT = float(os.getenv("PROCESSING_TIMEOUT", "1800"))
+
+def processing_conflict(recording_id):
+    """Why a recording cannot be processed right now, or None"""
+    record = recordings.get(recording_id)
+    if record is None:
+        return None
+    if record["status"] == "processing" and record["updated_at"] < time.time() - PROCESSING_TIMEOUT:
+        return None
+    return BUSY_STATUSES.get(record["status"])
+
+def claim_recording(recording_id):
+    """Mark a recording as processing; returns an error message if it is busy, else None.
+    
+    The status change is one conditional UPDATE, so of concurrent claims
+    (double clicks, several workers) exactly one succeeds.
+    """
+    record = recordings.get(recording_id)
+    if record is None:
+        return "Recording file not found"
+    conflict = processing_conflict(recording_id)
+    if conflict:
+        return conflict
+    stale_before = time.time() - PROCESSING_TIMEOUT if record["status"] == "processing" else None
+    if not recordings.transition(recording_id, record["status"], "processing", updated_before=stale_before):
+        return processing_conflict(recording_id) or "Recording changed, try again"
+    recordings.update(recording_id, error=None)
+    return None
+
+def get_form(recording_id=None):
+    """Form of a recording (the latest if no ID is given), or None"""
+    return recordings.load_form(recording_id or recordings.latest())
+
+def get_transcription(recording_id=None):
+    """Transcript of a recording (the latest if no ID is given), or None"""
+    return recordings.read_blob(recording_id or recordings.latest(), "transcript")
+
+def _rendition_fresh(recording_id):
+    """Path of the Opus playback copy if it is at least as new as the WAV, else None"""
+    target = recordings.path(recording_id, "audio_opus")
+    try:
+        if os.stat(target).st_mtime_ns >= os.stat(recordings.path(recording_id, "audio")).st_mtime_ns:
+            return target
+    except FileNotFoundError:
+        pass
+    return None
+
+def _render_playback(recording_id):
+    """Encode the recording as 16 kHz mono Opus for playback"""
+    try:
+        if _rendition_fresh(recording_id) is None:
+            mono = audio_preprocess.load_mono(recordings.path(recording_id, "audio"))
+            buffer, fmt = audio_preprocess.encode(mono, audio_preprocess.TARGET_RATE, "opus")
+            if fmt == "opus":
+                write_atomic(recordings.path(recording_id, "audio_opus"), buffer.getvalue())
+    except Exception as e:
+        print(f"Playback copy of {recording_id} not encoded: {e}")
+    finally:
+        with _renditions_lock:
+            _renditions_pending.discard(recording_id)
+
+def schedule_rendition(recording_id):
+    """Queue the Opus playback copy of a finished recording unless it is queued or current"""
+    if not PLAYBACK_OPUS or _rendition_fresh(recording_id) is not None:
+        return
+    with _renditions_lock:
+        if recording_id in _renditions_pending:
+            return
+        _renditions_pending.add(recording_id)
+    rendition_executor.submit(_render_playback, recording_id)
+
+def playback_rendition(recording_id):
+    """Path of a recording's Opus playback copy, or None if it is not ready yet.
+
+    Speech at 16 kHz mono Opus is about 1/60 of the captured WAV. Encoding
+    runs well behind real time, so it is never done in the request: a miss
+    queues it and the caller serves the WAV meanwhile.
+    """
+    record = recordings.get(recording_id)
+    if record is None or record["status"] == "recording":
+        return None
+    path = _rendition_fresh(recording_id)
+    if path is None:
+        schedule_rendition(recording_id)
+    return path
+
+def audio_frames(recording_id):
+    with wave.open(recordings.path(recording_id, "audio"), 'rb') as wf:
+        return wf.getnframes()
+
+def save_extraction(recording_id, transcript, values, frames):
+    """Remember what an extraction read and returned, as the base for incremental updates"""
+    recordings.write_blob(recording_id, "extraction", json.dumps(
+        {"schema_version": FORM_SCHEMA.version, "audio_frames": frames,
+         "transcript": transcript, "values": values}, ensure_ascii=False))
+
+def load_extraction(recording_id):
+    """Base of the last extraction, or None if there is none for the current schema"""
+    data = recordings.read_blob(recording_id, "extraction")
+    if data is None:
+        return None
+    base = json.loads(data)
+    return base if base.get("schema_version") == FORM_SCHEMA.version else None
+
+def _saved_transcript(recording_id, stats):
+    """Transcript of an already extracted recording, brought up to date; None if there is none.
+    
+    The saved transcript may carry manual corrections (/api/save-transcription),
+    so reprocessing keeps it and only transcribes audio recorded after the last
+    extraction (a follow-up), appending that.
+    """
+    data = recordings.read_blob(recording_id, "extraction")
+    transcript = recordings.read_blob(recording_id, "transcript")
+    if data is None or transcript is None:
+        return None
+    base = json.loads(data)
+    
+    stats["transcript"] = "saved"
+    live_transcripts.pop(recording_id, None)
+    if audio_frames(recording_id) > base["audio_frames"]:
+        appended = transcribe_appended(recording_id, base["audio_frames"], stats)
+        if appended:
+            transcript = f"{transcript}\n{appended}" if transcript else appended
+            recordings.write_blob(recording_id, "transcript", transcript)
+    return transcript
+
+def transcribe_appended(recording_id, from_frame, stats):
+    """Transcript of the audio after from_frame only, e.g. a follow-up recording"""
+    filename = recordings.path(recording_id, "audio")
+    with wave.open(filename, 'rb') as wf:
+        rate = wf.getframerate()
+    # Words of the appended audio go onto the whole recording's timeline
+    offset = from_frame / rate
+    words = json.loads(recordings.read_blob(recording_id, "words") or "[]")
+    
+    transcriber, _ = appended_transcripts.pop(recording_id, (None, None))
+    if transcriber is not None:
+        try:
+            text = transcriber.result()
+            words.extend(shift_words(transcriber.words(), offset))
+            recordings.write_blob(recording_id, "words", json.dumps(words, ensure_ascii=False))
+            stats["live_segments"] = transcriber.segments
+            return text
+        except Exception as e:
+            print(f"Live transcription failed, transcribing appended audio: {e}")
+    
+    with metrics.span("preprocess") as span:
+        audio_data, upload_stats, time_map = audio_preprocess.prepare_for_stt(
+            filename, fmt=stt_backend.audio_format, start_frame=from_frame)
+        span.set(bytes=upload_stats["upload_bytes"])
+    stats.update(upload_stats)
+    if upload_stats["upload_seconds"] == 0:
+        return ""
+    transcription = transcribe_audio(audio_data)
+    
+    words.extend(shift_words(vad.align_words(getattr(transcription, 'words', None), time_map), offset))
+    recordings.write_blob(recording_id, "words", json.dumps(words, ensure_ascii=False))
+    return transcription.text
+
+def process_recording(recording_id=None, progress=None, stats=None):
+    """Process the recording and generate form data.
+    
+    progress, if given, is called with the name of each stage as it starts;
+    stats, if given, is a dict that receives upload size and cache statistics.
+    """
+    if progress is None:
+        progress = lambda stage: None
+    if stats is None:
+        stats = {}
+    
+    recording_id = find_recording(recording_id)
+    if recording_id is None:
         return {"error": "Recording file not found"}
     
+    started = time.time()
+    conflict = claim_recording(recording_id)
+    if conflict:
+        return {"error": conflict}
     try:
-        # Perform transcription with ElevenLabs
-        print("Transcribing with ElevenLabs...")
-        with open(filename, "rb") as audio_file:
-            audio_data = BytesIO(audio_file.read())
+        with metrics.span("transcription"):
+            aggregated_transcriptions = transcribe_recording(recording_id, progress, stats)
+        frames = audio_frames(recording_id)
         
-        transcription = elevenlabs_client.speech_to_text.convert(
-            file=audio_data,
-            model_id="scribe_v1",  # Use appropriate model
-            tag_audio_events=True,  # Tag audio events
-            language_code="kat",    # Georgian language code
-            diarize=True,           # Annotate speakers
-        )
+        # Analyze the transcription with OpenAI, unless this transcript was already extracted
+        progress("extracting")
+        form_key = text_key(aggregated_transcriptions, FORM_SCHEMA.version, OPENAI_MODEL)
+        filled_form = result_cache.get("extraction", form_key)
+        stats["extraction_cache"] = "miss" if filled_form is None else "hit"
+        if filled_form is None:
+            filled_form = analyze_medical_transcription(aggregated_transcriptions)
+            result_cache.put("extraction", form_key, filled_form)
         
-        # Save the transcription to a file
-        with open("transcription.txt", "w", encoding="utf-8") as f:
-            f.write(transcription.text)
+        progress("saving")
+        save_filled_form(recording_id, filled_form, status="done",
+                         processing_seconds=round(time.time() - started, 2))
+        save_extraction(recording_id, aggregated_transcriptions, FORM_SCHEMA.values(filled_form), frames)
         
-        aggregated_transcriptions = transcription.text
+        return filled_form
+    
+    except Exception as e:
+        print(f"Error processing recording: {e}")
+        recordings.update(recording_id, status="failed", error=str(e))
+        return {"error": str(e)}
+
+def stream_recording(recording_id, stats=None):
+    """Process a recording, yielding (event, data) pairs as the form fills in.
+    
+    Events: "stage", "transcription", "template" (the empty form), one
+    "field" per completed field, then "form" with the saved result, or
+    "failed" with an error.
+    """
+    if stats is None:
+        stats = {}
+    
+    recording_id = find_recording(recording_id)
+    if recording_id is None:
+        yield "failed", {"error": "Recording file not found"}
+        return
+    
+    started = time.time()
+    conflict = claim_recording(recording_id)
+    if conflict:
+        yield "failed", {"error": conflict}
+        return
+    try:
+        yield "stage", {"stage": "transcribing"}
+        with metrics.span("transcription"):
+            aggregated_transcriptions = transcribe_recording(recording_id, lambda stage: None, stats)
+        frames = audio_frames(recording_id)
+        yield "transcription", {"transcription": aggregated_transcriptions}
         
-        # Updated JSON structure
-        original_json = {
-            "document": "ფორმა 100 - განახლებული",
-            "sections": [
-                {"title": "გაცემის მიზანი", "content": ""},
-                {"title": "პაციენტის სრული სახელი", "content": ""},
-                {"title": "დაბადების თარიღი", "content": ""},
-                {"title": "სქესი (მამრობითი / მდედრობითი)", "content": ""},
-                {"title": "პირადი საიდენტიფიკაციო ნომერი", "content": ""},
-                {"title": "მისამართი", "content": ""},
-                {"title": "სამკურნალო დაწესებულების სახელი", "content": ""},
-                {"title": "სამედიცინო ვიზიტის თარიღი", "content": ""},
-                {
-                    "title": "დიაგნოზი",
-                    "subsections": [
-                        {"title": "ა) საწყისი დიაგნოზი", "content": ""},
-                        {"title": "ბ) დამატებითი ინფორმაცია", "content": ""},
-                        {"title": "გ) საბოლოო დიაგნოზი", "content": ""},
-                        {"title": "დ) ჩატარებული მკურნალობა", "content": ""}
-                    ]
-                },
-                {"title": "პაციენტის სიმპტომები", "content": ""},
-                {
-                    "title": "მკურნალობის რეკომენდაციები",
-                    "subsections": [
-                        {"title": "ა) მედიკამენტები", "content": ""},
-                        {"title": "ბ) თერაპიული პროცედურები", "content": ""},
-                        {"title": "გ) დიეტური რეკომენდაციები", "content": ""},
-                        {"title": "დ) ფიზიკური აქტივობის რეკომენდაციები", "content": ""},
-                        {"title": "ე) დამატებითი საჭირო გამოკვლევები", "content": ""}
-                    ]
-                },
-                {
-                    "title": "სამედიცინო ისტორია",
-                    "subsections": [
-                        {"title": "ა) წარსულში გადატანილი დაავადებები", "content": ""},
-                        {"title": "ბ) ალერგიები", "content": ""},
-                        {"title": "გ) ოჯახის სამედიცინო ისტორია", "content": ""}
-                    ]
-                },
-                {"title": "რისკის შეფასება და პროფილაქტიკური ზომები", "content": ""},
-                {"title": "ექიმის სრული სახელი", "content": ""},
-                {"title": "ექიმის ხელმოწერა", "content": ""},
-                {"title": "დამატებითი შენიშვნები", "content": ""}
-            ]
-        }
+        yield "stage", {"stage": "extracting"}
+        schema = FORM_SCHEMA
+        filled_form = schema.new_form()
+        yield "template", filled_form
         
-        # Analyze the transcription with OpenAI
-        filled_form = analyze_medical_transcription(aggregated_transcriptions, original_json)
+        form_key = text_key(aggregated_transcriptions, schema.version, OPENAI_MODEL)
+        cached_form = result_cache.get("extraction", form_key)
+        stats["extraction_cache"] = "miss" if cached_form is None else "hit"
+        if cached_form is not None:
+            fields = schema.values(cached_form).items()
+        else:
+            fields = stream_medical_transcription(aggregated_transcriptions, schema)
         
-        # Save the filled form to a JSON file
-        with open("filled_form100.json", "w", encoding="utf-8") as outfile:
-            json.dump(filled_form, outfile, ensure_ascii=False, indent=4)
+        for field, value in fields:
+            schema.fill({field: value}, filled_form)
+            yield "field", {"field": field, "path": list(schema.paths[field]), "value": value}
         
-        return filled_form
+        if cached_form is None:
+            result_cache.put("extraction", form_key, filled_form)
+        save_filled_form(recording_id, filled_form, status="done",
+                         processing_seconds=round(time.time() - started, 2))
+        save_extraction(recording_id, aggregated_transcriptions, schema.values(filled_form), frames)
+        yield "form", filled_form
     
+    except GeneratorExit:
+        # Closed before the form was saved: don't leave the claim behind
+        recordings.update(recording_id, status="failed", error="Processing was interrupted")
+        raise
     except Exception as e:
         print(f"Error processing recording: {e}")
-        return {"error": str(e)}
+        recordings.update(recording_id, status="failed", error=str(e))
+        yield "failed", {"error": str(e)}
 
-def background_recording():
-    """Background thread for continuous recording"""
-    global recording_status
+def stream_job(recording_id, progress=None, stats=None, emit=None):
+    """Run stream_recording as a queue job: events go to emit, the result is the form"""
+    result = {"error": "Processing ended without a result"}
+    for event, data in stream_recording(recording_id, stats):
+        if event == "stage" and progress is not None:
+            progress(data["stage"])
+        if emit is not None:
+            emit(event, data)
+        if event in ("form", "failed"):
+            result = data
+    return result
+
+def update_recording(recording_id=None, progress=None, stats=None):
+    """Bring a processed recording's form up to date after a follow-up or a transcript edit.
+    
+    Only audio appended since the last extraction is transcribed and only
+    the changed transcript sentences go to the LLM; the answer is merged
+    with the saved form so the doctor's manual edits are kept (conflicts
+    are listed in stats). Without an earlier extraction this is a full
+    process_recording, and when most of the transcript changed the whole
+    form is re-extracted.
+    """
+    if progress is None:
+        progress = lambda stage: None
+    if stats is None:
+        stats = {}
     
-    start_time = time.time()
-    max_duration = 180  # 3 minutes in seconds
+    recording_id = find_recording(recording_id)
+    if recording_id is None:
+        return {"error": "Recording file not found"}
+    base = load_extraction(recording_id)
+    if base is None or FORM_SCHEMA.update_system_prompt is None:
+        stats["mode"] = "full"
+        return process_recording(recording_id, progress, stats)
     
-    while recording_status["is_recording"]:
-        recorder.record_chunk()
-        time.sleep(0.01)  # Small delay to prevent CPU overload
+    started = time.time()
+    conflict = claim_recording(recording_id)
+    if conflict:
+        return {"error": conflict}
+    try:
+        if recover_wav(recordings.path(recording_id, "audio")):
+            print(f"Recovered interrupted follow-up of {recording_id}")
+        frames = audio_frames(recording_id)
+        transcript = recordings.read_blob(recording_id, "transcript") or ""
+        if frames > base["audio_frames"]:
+            progress("transcribing")
+            with metrics.span("transcription"):
+                appended = transcribe_appended(recording_id, base["audio_frames"], stats)
+            if appended:
+                transcript = f"{transcript}\n{appended}" if transcript else appended
+                recordings.write_blob(recording_id, "transcript", transcript)
+        
+        progress("extracting")
+        removed, added, changed_ratio = incremental.diff_transcripts(base["transcript"], transcript)
+        stats.update(removed_sentences=len(removed), added_sentences=len(added),
+                     changed_ratio=round(changed_ratio, 3))
+        extracted = dict(base["values"])
+        if changed_ratio > FULL_REEXTRACT_RATIO:
+            stats["mode"] = "full_extraction"
+            extracted = FORM_SCHEMA.values(analyze_medical_transcription(transcript))
+        elif removed or added:
+            stats["mode"] = "incremental"
+            updates = extract_updates(base["values"], removed, added)
+            stats["updated_fields"] = sorted(updates)
+            extracted.update(updates)
+        else:
+            stats["mode"] = "unchanged"
         
-        # Update elapsed time
-        current_time = time.time()
-        elapsed = current_time - start_time
-        recording_status["elapsed_time"] = elapsed
+        progress("saving")
+        saved_form = recordings.load_form(recording_id)
+        saved = FORM_SCHEMA.values(saved_form) if saved_form else base["values"]
+        merged, conflicts = incremental.merge_fields(base["values"], saved, extracted)
+        stats["conflicts"] = conflicts
+        filled_form = FORM_SCHEMA.fill(merged)
+        save_filled_form(recording_id, filled_form, status="done",
+                         processing_seconds=round(time.time() - started, 2))
+        save_extraction(recording_id, transcript, extracted, frames)
         
-        # Stop if reached maximum duration
-        if elapsed >= max_duration:
-            recording_status["is_recording"] = False
-            print("Maximum recording duration reached. Stopping...")
-            break
+        return filled_form
+    
+    except Exception as e:
+        print(f"Error updating recording: {e}")
+        recordings.update(recording_id, status="failed", error=str(e))
+        return {"error": str(e)}
 
-def analyze_medical_transcription(aggregated_transcriptions, original_json):
+def build_messages(aggregated_transcriptions, schema=FORM_SCHEMA):
+    """Chat messages for extracting a form from a transcript"""
+    return [
+        {"role": "system", "content": schema.system_prompt},
+        {"role": "user", "content": schema.user_prompt.format(transcript=aggregated_transcriptions)}
+    ]
+
+def analyze_medical_transcription(aggregated_transcriptions, schema=FORM_SCHEMA):
     """Analyze the transcription using OpenAI and fill the form"""
-    # Create a model specifically for the parsing output with updated fields
-    class Form100Content(BaseModel):
-        document_purpose: str = Field(description="გაცემის მიზანი - Purpose of the document")
-        patient_name: str = Field(description="პაციენტის სრული სახელი - Patient's full name")
-        birth_date: str = Field(description="დაბადების თარიღი - Date of birth (in format: DD.MM.YYYY)")
-        gender: str = Field(description="სქესი (მამრობითი / მდედრობითი) - Gender (male/female)")
-        personal_id: str = Field(description="პირადი საიდენტიფიკაციო ნომერი - Personal ID number")
-        address: str = Field(description="მისამართი - Address")
-        medical_institution: str = Field(description="სამკურნალო დაწესებულების სახელი - Name of medical institution")
-        visit_date: str = Field(description="სამედიცინო ვიზიტის თარიღი - Date of medical visit (in format: DD.MM.YYYY)")
-        primary_diagnosis: str = Field(description="ა) საწყისი დიაგნოზი - Initial diagnosis")
-        additional_info: str = Field(description="ბ) დამატებითი ინფორმაცია - Additional information")
-        final_diagnosis: str = Field(description="გ) საბოლოო დიაგნოზი - Final diagnosis")
-        treatment_used: str = Field(description="დ) ჩატარებული მკურნალობა - Treatment provided")
-        patient_symptoms: str = Field(description="პაციენტის სიმპტომები - Patient's symptoms")
-        medications: str = Field(description="ა) მედიკამენტები - Medications")
-        therapy_procedures: str = Field(description="ბ) თერაპიული პროცედურები - Therapeutic procedures")
-        dietary_recommendations: str = Field(description="გ) დიეტური რეკომენდაციები - Dietary recommendations")
-        physical_activity: str = Field(description="დ) ფიზიკური აქტივობის რეკომენდაციები - Physical activity recommendations")
-        additional_tests: str = Field(description="ე) დამატებითი საჭირო გამოკვლევები - Additional required examinations")
-        past_diseases: str = Field(description="ა) წარსულში გადატანილი დაავადებები - Past diseases")
-        allergies: str = Field(description="ბ) ალერგიები - Allergies")
-        family_history: str = Field(description="გ) ოჯახის სამედიცინო ისტორია - Family medical history")
-        risk_assessment: str = Field(description="რისკის შეფასება და პროფილაქტიკური ზომები - Risk assessment and preventive measures")
-        doctor_name: str = Field(description="ექიმის სრული სახელი - Doctor's full name")
-        doctor_signature: str = Field(description="ექიმის ხელმოწერა - Doctor's signature (indicate if mentioned)")
-        additional_notes: str = Field(description="დამატებითი შენიშვნები - Additional notes")
-    
-    # Prepare the updated system prompt in Georgian
-    system_prompt = """
-    თქვენ ხართ სამედიცინო დოკუმენტაციის ასისტენტი, სპეციალიზებული ქართული სამედიცინო ფორმების შევსებაში.
-    თქვენი დავალებაა ყურადღებით გააანალიზოთ მოწოდებული ექიმსა და პაციენტს შორის საუბრის ჩანაწერი და ამოიღოთ ყველა შესაბამისი ინფორმაცია, რათა შეავსოთ სამედიცინო დოკუმენტი „ფორმა 100".
-    ფორმა შეიცავს შემდეგ ველებს:
-    - საბუთის გაცემის მიზანი
-    - პაციენტის სრული სახელი
-    - დაბადების თარიღი
-    - სქესი (მამრობითი / მდედრობითი)
-    - პირადი საიდენტიფიკაციო ნომერი
-    - მისამართი
-    - სამკურნალო დაწესებულების სახელი
-    - სამედიცინო ვიზიტის თარიღი
-    - დიაგნოზი, ქვეპუნქტებით:
-      * ა) საწყისი დიაგნოზი
-      * ბ) დამატებითი ინფორმაცია
-      * გ) საბოლოო დიაგნოზი
-      * დ) ჩატარებული მკურნალობა
-    - პაციენტის სიმპტომები
-    - მკურნალობის რეკომენდაციები, ქვეპუნქტებით:
-      * ა) მედიკამენტები
-      * ბ) თერაპიული პროცედურები
-      * გ) დიეტური რეკომენდაციები
-      * დ) ფიზიკური აქტივობის რეკომენდაციები
-      * ე) დამატებითი საჭირო გამოკვლევები
-    - სამედიცინო ისტორია, ქვეპუნქტებით:
-      * ა) წარსულში გადატანილი დაავადებები
-      * ბ) ალერგიები
-      * გ) ოჯახის სამედიცინო ისტორია
-    - რისკის შეფასება და პროფილაქტიკური ზომები
-    - ექიმის სრული სახელი
-    - ექიმის ხელმოწერა
-    - დამატებითი შენიშვნები
-    ქართული ენის შემთხვევაში, შეინარჩუნეთ სახელები და საკუთარი სახელები ისე, როგორც მოცემულია საუბარში.
-    თარიღები ჩაწერეთ ფორმატით DD.MM.YYYY.
-    თუ ინფორმაცია ტრანსკრიპტში არ არის მოცემული, შესაბამისი ველი დატოვეთ ცარიელი.
-    იყავით ზუსტი და გამოიტანეთ მხოლოდ ის ინფორმაცია, რაც მკაფიოდ არის მითითებული ტრანსკრიპტში.
-    """
-    
-    # Make the API call
-    completion = openai_client.beta.chat.completions.parse(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"საუბრის ამ ჩანაწერის საფუძველზე, ამოიღეთ ინფორმაცია ფორმა 100-ისთვის:\n\n{aggregated_transcriptions}"}
-        ],
-        response_format=Form100Content,
-    )
+    # Make the API call; model and prompts are precompiled from the schema
+    messages = build_messages(aggregated_transcriptions, schema)
+    with metrics.span("llm_extraction") as span:
+        completion = upstream_caller.call(
+            "llm",
+            lambda timeout: get_openai_client().beta.chat.completions.parse(
+                model=OPENAI_MODEL,
+                messages=messages,
+                response_format=schema.model,
+                timeout=timeout,
+            ),
+            deadline=LLM_DEADLINE, retries=UPSTREAM_RETRIES, hedge_percentile=HEDGE_PERCENTILE)
+        usage = getattr(completion, 'usage', None)
+        if usage is not None:
+            span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
     
     # Get the parsed content
     parsed_content = completion.choices[0].message.parsed
     
-    # Convert to dictionary for easier manipulation
-    content_dict = parsed_content.dict()
-    
-    # Load the original JSON structure
-    form_data = original_json.copy()
-    
-    # Map the parsed content back to the original structure
-    for section in form_data["sections"]:
-        if section["title"] == "გაცემის მიზანი":
-            section["content"] = content_dict["document_purpose"]
-        elif section["title"] == "პაციენტის სრული სახელი":
-            section["content"] = content_dict["patient_name"]
-        elif section["title"] == "დაბადების თარიღი":
-            section["content"] = content_dict["birth_date"]
-        elif section["title"] == "სქესი (მამრობითი / მდედრობითი)":
-            section["content"] = content_dict["gender"]
-        elif section["title"] == "პირადი საიდენტიფიკაციო ნომერი":
-            section["content"] = content_dict["personal_id"]
-        elif section["title"] == "მისამართი":
-            section["content"] = content_dict["address"]
-        elif section["title"] == "სამკურნალო დაწესებულების სახელი":
-            section["content"] = content_dict["medical_institution"]
-        elif section["title"] == "სამედიცინო ვიზიტის თარიღი":
-            section["content"] = content_dict["visit_date"]
-        elif section["title"] == "დიაგნოზი" and "subsections" in section:
-            for subsection in section["subsections"]:
-                if subsection["title"] == "ა) საწყისი დიაგნოზი":
-                    subsection["content"] = content_dict["primary_diagnosis"]
-                elif subsection["title"] == "ბ) დამატებითი ინფორმაცია":
-                    subsection["content"] = content_dict["additional_info"]
-                elif subsection["title"] == "გ) საბოლოო დიაგნოზი":
-                    subsection["content"] = content_dict["final_diagnosis"]
-                elif subsection["title"] == "დ) ჩატარებული მკურნალობა":
-                    subsection["content"] = content_dict["treatment_used"]
-        elif section["title"] == "პაციენტის სიმპტომები":
-            section["content"] = content_dict["patient_symptoms"]
-        elif section["title"] == "მკურნალობის რეკომენდაციები" and "subsections" in section:
-            for subsection in section["subsections"]:
-                if subsection["title"] == "ა) მედიკამენტები":
-                    subsection["content"] = content_dict["medications"]
-                elif subsection["title"] == "ბ) თერაპიული პროცედურები":
-                    subsection["content"] = content_dict["therapy_procedures"]
-                elif subsection["title"] == "გ) დიეტური რეკომენდაციები":
-                    subsection["content"] = content_dict["dietary_recommendations"]
-                elif subsection["title"] == "დ) ფიზიკური აქტივობის რეკომენდაციები":
-                    subsection["content"] = content_dict["physical_activity"]
-                elif subsection["title"] == "ე) დამატებითი საჭირო გამოკვლევები":
-                    subsection["content"] = content_dict["additional_tests"]
-        elif section["title"] == "სამედიცინო ისტორია" and "subsections" in section:
-            for subsection in section["subsections"]:
-                if subsection["title"] == "ა) წარსულში გადატანილი დაავადებები":
-                    subsection["content"] = content_dict["past_diseases"]
-                elif subsection["title"] == "ბ) ალერგიები":
-                    subsection["content"] = content_dict["allergies"]
-                elif subsection["title"] == "გ) ოჯახის სამედიცინო ისტორია":
-                    subsection["content"] = content_dict["family_history"]
-        elif section["title"] == "რისკის შეფასება და პროფილაქტიკური ზომები":
-            section["content"] = content_dict["risk_assessment"]
-        elif section["title"] == "ექიმის სრული სახელი":
-            section["content"] = content_dict["doctor_name"]
-        elif section["title"] == "ექიმის ხელმოწერა":
-            section["content"] = content_dict["doctor_signature"]
-        elif section["title"] == "დამატებითი შენიშვნები":
-            section["content"] = content_dict["additional_notes"]
-    
-    return form_data
+    # Map the parsed content onto a fresh copy of the form via the field index
+    with metrics.span("form_mapping"):
+        return schema.fill(parsed_content.dict())
+
+def build_update_messages(values, removed, added, schema=FORM_SCHEMA):
+    """Chat messages asking only for the fields a transcript change affects"""
+    current = json.dumps({name: value for name, value in values.items() if value},
+                         ensure_ascii=False, indent=1)
+    return [
+        {"role": "system", "content": schema.update_system_prompt},
+        {"role": "user", "content": schema.update_user_prompt.format(
+            values=current, removed="\n".join(removed) or "-", added="\n".join(added) or "-")}
+    ]
+
+def extract_updates(values, removed, added, schema=FORM_SCHEMA):
+    """field -> new value for the fields affected by the removed and added sentences"""
+    messages = build_update_messages(values, removed, added, schema)
+    with metrics.span("llm_update") as span:
+        completion = upstream_caller.call(
+            "llm",
+            lambda timeout: get_openai_client().beta.chat.completions.parse(
+                model=OPENAI_MODEL,
+                messages=messages,
+                response_format=schema.update_model,
+                timeout=timeout,
+            ),
+            deadline=LLM_DEADLINE, retries=UPSTREAM_RETRIES, hedge_percentile=HEDGE_PERCENTILE)
+        usage = getattr(completion, 'usage', None)
+        if usage is not None:
+            span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+    
+    parsed_content = completion.choices[0].message.parsed
+    return {name: value for name, value in parsed_content.dict().items() if value is not None}
+
+def stream_medical_transcription(aggregated_transcriptions, schema=FORM_SCHEMA):
+    """Like analyze_medical_transcription, but yields (field, value) as each completes"""
+    messages = build_messages(aggregated_transcriptions, schema)
+    # Retries cover opening the stream; hedging a stream would double the tokens
+    stream = upstream_caller.call(
+        "llm_stream",
+        lambda timeout: get_openai_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=messages,
+            response_format=schema.response_format,
+            stream=True,
+            timeout=timeout,
+        ),
+        deadline=LLM_DEADLINE, retries=UPSTREAM_RETRIES)
+    
+    parser = FieldStreamParser()
+    # Timed by hand: a span can't be held open across yields to the client
+    started = time.perf_counter()
+    chunks = 0
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            chunks += 1
+            for field, value in parser.feed(delta):
+                if field in schema.paths:
+                    yield field, value
+    finally:
+        # One streamed chunk per token
+        metrics.record("llm_extraction", time.perf_counter() - started, started,
+                       completion_tokens=chunks)
+
+def warm_up():
+    """Import the SDKs and build the clients (or load the local STT model) ahead of the first request"""
+    global _warm_up
+    _warm_up = "running"
+    try:
+        get_openai_client()
+        FORM_SCHEMA.response_format  # compiles the Pydantic models
+        if STT_BACKEND == "local":
+            stt_backend.start()
+        else:
+            get_elevenlabs_client()
+        _warm_up = "ok"
+    except Exception as e:
+        _warm_up = f"error: {e}"
+
+def readiness():
+    """(ready, checks): whether this worker can take processing requests.
+    
+    Recording needs an audio device but processing doesn't, so "audio" is
+    reported without affecting readiness.
+    """
+    checks = {}
+    for name, check in (("state_store", shared_state.active_sessions), ("recordings", recordings.latest)):
+        try:
+            check()
+            checks[name] = "ok"
+        except Exception as e:
+            checks[name] = f"error: {e}"
+    if checks["recordings"] == "ok" and not os.access(recordings.root, os.W_OK):
+        checks["recordings"] = f"error: {recordings.root} is not writable"
+    
+    checks["llm"] = "ok" if os.getenv("OPENAI_API_KEY") else "error: OPENAI_API_KEY is not set"
+    if STT_BACKEND == "local":
+        checks["stt"] = ("ok" if importlib.util.find_spec("faster_whisper")
+                         else "error: faster-whisper is not installed")
+    else:
+        checks["stt"] = "ok" if os.getenv("ELEVENLABS_API_KEY") else "error: ELEVENLABS_API_KEY is not set"
+    # "lazy" when warm_up() never ran: clients are built by the first request
+    checks["clients"] = _warm_up or "lazy"
+    
+    ready = all(status in ("ok", "lazy") for status in checks.values())
+    checks["audio"] = "not initialized" if p is None else f"ok ({CHANNELS} channels)"
+    return ready, checks
 
 def cleanup():
     """Clean up resources"""
-    global p, stream
+    global p
     
-    if stream:
-        stream.stop_stream()
-        stream.close()
-        stream = None
+    for session_id in sessions.active_sessions():
+        _stop_local(session_id)
+        shared_state.release_session(session_id)
     
     if p:
         p.terminate()
-        p = None
\ No newline at end of file
+        p = None
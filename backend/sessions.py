@@ -0,0 +1,181 @@
+import threading
+import time
+import uuid
+
+from capture import CaptureEngine, LevelMeter
+from wav_writer import StreamingWavWriter
+
+DEFAULT_SESSION = "default"
+
+
+class RecordingSession:
+    """One consult being recorded: owns its capture buffer, WAV writer and worker"""
+
+    def __init__(self, session_id, pa, audio_format, channels, rate, chunk=1024,
+                 transcriber_factory=None, recording_id=None, filename=None, append=False):
+        self.session_id = session_id
+        # Stored recording this session writes to (see storage.RecordingStore)
+        self.recording_id = recording_id
+        # Follow-up recording: extend the existing WAV instead of replacing it
+        self.append = append
+        self.pa = pa
+        self.audio_format = audio_format
+        self.channels = channels
+        self.rate = rate
+        self.chunk = chunk
+        self.transcriber_factory = transcriber_factory
+        self.filename = filename
+        self.engine = None
+        self.writer = None
+        self.transcriber = None
+        self.meter = LevelMeter()
+        self.is_recording = False
+        self.start_time = None
+        self.elapsed_time = 0
+        # Time spent in WAV writes, reported as a span when the session stops
+        self.write_seconds = 0.0
+        self._worker = None
+
+    def start(self):
+        """Open the input stream and start draining it to disk"""
+        sample_width = self.pa.get_sample_size(self.audio_format)
+        if self.filename is None:
+            self.filename = f"recording_{uuid.uuid4().hex}.wav"
+        self.writer = StreamingWavWriter(self.filename, self.channels, sample_width, self.rate,
+                                         append=self.append)
+        try:
+            self.engine = CaptureEngine(self.pa, self.audio_format, self.channels, self.rate,
+                                        chunk=self.chunk, sample_width=sample_width)
+            self.meter = LevelMeter(sample_width)
+            if self.transcriber_factory:
+                self.transcriber = self.transcriber_factory(self.channels, sample_width, self.rate)
+            self.engine.start()
+        except Exception:
+            # The device failed to open: release the WAV file and any half-open stream
+            self.writer.close()
+            try:
+                if self.engine:
+                    self.engine.stop()
+            except Exception as e:
+                print(f"Error closing input stream ({self.session_id}): {e}")
+            raise
+
+        self.is_recording = True
+        self.start_time = time.time()
+        self.elapsed_time = 0
+        self._worker = threading.Thread(target=self._run, daemon=True,
+                                        name=f"recording-{self.session_id}")
+        self._worker.start()
+
+    def _consume(self, data):
+        """Sink for the ring buffer: append to the WAV, the level meter and the live transcriber"""
+        started = time.perf_counter()
+        self.writer.write(data)
+        self.write_seconds += time.perf_counter() - started
+        self.meter.update(data)
+        if self.transcriber:
+            self.transcriber.feed(data)
+
+    def _run(self):
+        """Worker loop: blocks on the ring buffer until the callback delivers audio"""
+        while self.is_recording:
+            try:
+                self.engine.read(self._consume, timeout=0.1)
+            except Exception as e:
+                print(f"Error recording chunk ({self.session_id}): {e}")
+
+    def stop(self):
+        """Stop capture, flush buffered audio and finalize the WAV file"""
+        self.elapsed_time = self.elapsed()
+        self.is_recording = False
+        if self._worker:
+            # The ring buffer has a single consumer: drain it only once the worker is gone.
+            # Its reads time out after 0.1 s, so this returns promptly.
+            self._worker.join()
+
+        if self.engine:
+            self.engine.stop()
+            # Drain whatever the callback buffered before the stream closed
+            while self.engine.read(self._consume, timeout=0):
+                pass
+
+        if self.writer:
+            self.writer.close()
+
+        if self.transcriber:
+            # Only the final segment is left to transcribe
+            self.transcriber.finish()
+
+        return self.filename
+
+    def elapsed(self):
+        """Seconds since recording started, independent of the capture loop"""
+        if self.is_recording and self.start_time:
+            return time.time() - self.start_time
+        return self.elapsed_time
+
+    def status(self):
+        return {
+            "session_id": self.session_id,
+            "is_recording": self.is_recording,
+            "elapsed_time": self.elapsed(),
+            "levels": self.meter.levels(),
+            "capture": self.engine.stats() if self.engine else {},
+            "live_segments": self.transcriber.segments if self.transcriber else 0,
+        }
+
+
+class SessionManager:
+    """Thread-safe registry of active recording sessions keyed by session ID"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def start(self, session_id, **session_kwargs):
+        """Start a session; returns (session, created)"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                return session, False
+
+            session = RecordingSession(session_id, **session_kwargs)
+            session.start()
+            self._sessions[session_id] = session
+            return session, True
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def stop(self, session_id):
+        """Stop and forget a session; returns the stopped session or None if unknown"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return None
+        session.stop()
+        return session
+
+    def status(self, session_id):
+        session = self.get(session_id)
+        if session is None:
+            return {"session_id": session_id, "is_recording": False, "elapsed_time": 0}
+        return session.status()
+
+    def live_status(self, session_id):
+        """Compact status for the push channel: state, elapsed time and input levels"""
+        session = self.get(session_id)
+        if session is None:
+            return {"session_id": session_id, "is_recording": False, "elapsed_time": 0}
+        return {
+            "session_id": session_id,
+            "is_recording": session.is_recording,
+            # Rounded so snapshots only change as often as the display would
+            "elapsed_time": round(session.elapsed(), 1),
+            "levels": session.meter.levels(),
+        }
+
+    def active_sessions(self):
+        with self._lock:
+            return list(self._sessions)
@@ -0,0 +1,226 @@
+"""Process-shared state for serving app.py from several WSGI workers.
+
+Recording sessions and processing jobs live in one SQLite file in WAL
+mode instead of worker memory, so any worker can answer status and job
+requests (recordings themselves are indexed by storage.py). Audio
+capture still runs in the worker that started a recording: that worker
+mirrors the session's live status into the store, and a stop request that
+lands on another worker is handed over through the stop_requested flag.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# stop_requested values
+STOP_NONE = 0
+STOP_REQUESTED = 1
+STOP_DONE = 2
+
+
+def pid_alive(pid):
+    """Whether a process with this PID exists on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def process_token(pid=None):
+    """Owner token of a process: its PID and start time, which a reused PID won't share"""
+    pid = pid or os.getpid()
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Field 22; the command name before it may contain spaces
+            started = f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return str(pid)
+    return f"{pid}:{started}"
+
+
+def owner_alive(owner):
+    """Whether the process an owner token was taken from is still running"""
+    try:
+        pid = int(str(owner).split(":")[0])
+    except ValueError:
+        return False
+    return pid_alive(pid) and process_token(pid) == str(owner)
+
+
+class SharedState:
+    def __init__(self, path, owner=None):
+        self.path = path
+        self.owner = owner or process_token()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                recording_id TEXT,
+                status TEXT,
+                stop_requested INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS live_transcripts (
+                recording_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                started_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                data TEXT NOT NULL,
+                finished_at REAL
+            );""")
+        # Cached copy of the sessions table for high-rate status readers
+        self._snapshot = {}
+        self._snapshot_at = 0.0
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # Sessions
+
+    def claim_session(self, session_id):
+        """Register this worker as the session's owner; False if a live worker holds it"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT owner FROM sessions WHERE session_id = ?",
+                                       (session_id,)).fetchone()
+                if row is not None and owner_alive(row[0]):
+                    self._db.execute("COMMIT")
+                    return False
+                # Free, or left behind by a worker that has since exited
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, owner, updated_at) VALUES (?, ?, ?)",
+                    (session_id, self.owner, time.time()))
+                self._db.execute("COMMIT")
+                return True
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def publish_session(self, session_id, status, recording_id=None):
+        """Mirror the live status of a session this worker owns"""
+        self._execute(
+            "UPDATE sessions SET status = ?, recording_id = COALESCE(?, recording_id), updated_at = ? "
+            "WHERE session_id = ? AND owner = ?",
+            (json.dumps(status), recording_id, time.time(), session_id, self.owner))
+
+    def session(self, session_id):
+        """Shared record of a session with a live owner, or None"""
+        rows = self._execute(
+            "SELECT owner, recording_id, status, stop_requested FROM sessions WHERE session_id = ?",
+            (session_id,))
+        if not rows:
+            return None
+        owner, recording_id, status, stop_requested = rows[0]
+        if not owner_alive(owner):
+            return None
+        return {"owner": owner, "recording_id": recording_id,
+                "status": json.loads(status) if status else None,
+                "stop_requested": stop_requested}
+
+    def session_statuses(self, max_age=0.1):
+        """session_id -> last published status, re-read at most every max_age seconds"""
+        now = time.monotonic()
+        if now - self._snapshot_at >= max_age:
+            rows = self._execute("SELECT session_id, owner, status FROM sessions "
+                                 "WHERE status IS NOT NULL AND stop_requested != ?", (STOP_DONE,))
+            self._snapshot = {session_id: json.loads(status)
+                              for session_id, owner, status in rows if owner_alive(owner)}
+            self._snapshot_at = now
+        return self._snapshot
+
+    def active_sessions(self):
+        return [session_id for session_id, owner in
+                self._execute("SELECT session_id, owner FROM sessions WHERE stop_requested != ?",
+                              (STOP_DONE,))
+                if owner_alive(owner)]
+
+    def request_stop(self, session_id):
+        self._execute("UPDATE sessions SET stop_requested = ? WHERE session_id = ? AND stop_requested = ?",
+                      (STOP_REQUESTED, session_id, STOP_NONE))
+
+    def stop_requests(self):
+        """Sessions owned by this worker that another worker asked to stop"""
+        return [row[0] for row in self._execute(
+            "SELECT session_id FROM sessions WHERE owner = ? AND stop_requested = ?",
+            (self.owner, STOP_REQUESTED))]
+
+    def complete_stop(self, session_id, recording_id):
+        """Hand the finalized recording back to the worker that requested the stop"""
+        self._execute("UPDATE sessions SET stop_requested = ?, recording_id = ? "
+                      "WHERE session_id = ? AND owner = ?",
+                      (STOP_DONE, recording_id, session_id, self.owner))
+
+    def wait_for_stop(self, session_id, timeout=10.0, interval=0.05):
+        """Wait for the owner to finish a requested stop; returns the recording ID or None"""
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            rows = self._execute("SELECT owner, recording_id, stop_requested FROM sessions "
+                                 "WHERE session_id = ?", (session_id,))
+            if not rows:
+                return None
+            owner, recording_id, stop_requested = rows[0]
+            if stop_requested == STOP_DONE:
+                self.release_session(session_id, owner)
+                return recording_id
+            if not owner_alive(owner):
+                self.release_session(session_id, owner)
+                return None
+            time.sleep(interval)
+        return None
+
+    def release_session(self, session_id, owner=None):
+        self._execute("DELETE FROM sessions WHERE session_id = ? AND owner = ?",
+                      (session_id, owner or self.owner))
+
+    def clear_sessions(self):
+        """Forget every session, e.g. those of workers that died with the last server"""
+        self._execute("DELETE FROM sessions")
+
+    # Live transcripts being finished (and cached) by the worker that captured them
+
+    def mark_live_transcript(self, recording_id):
+        self._execute("INSERT OR REPLACE INTO live_transcripts VALUES (?, ?, ?)",
+                      (recording_id, self.owner, time.time()))
+
+    def clear_live_transcript(self, recording_id):
+        self._execute("DELETE FROM live_transcripts WHERE recording_id = ? AND owner = ?",
+                      (recording_id, self.owner))
+
+    def live_transcript_pending(self, recording_id):
+        """Whether a live worker is still finishing this recording's transcript"""
+        rows = self._execute("SELECT owner FROM live_transcripts WHERE recording_id = ?",
+                             (recording_id,))
+        return bool(rows) and owner_alive(rows[0][0])
+
+    # Jobs
+
+    def put_job(self, job):
+        self._execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?)",
+                      (job["job_id"], job["status"], json.dumps(job, ensure_ascii=False),
+                       job["finished_at"]))
+
+    def get_job(self, job_id):
+        rows = self._execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def job_counts(self):
+        return dict(self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    def evict_jobs(self, before):
+        """Forget jobs that finished before the given time"""
+        self._execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                      (before,))
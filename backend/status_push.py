@@ -0,0 +1,151 @@
+"""Server-Sent Events push channel for recording state and input levels.
+
+One publisher thread samples the live status of every session that has
+subscribers at a fixed rate, serializes it once and wakes that session's
+subscribers only when the snapshot changed. Subscribers always send the
+latest snapshot, so a slow client skips frames instead of queueing them,
+and an idle subscriber costs one blocked thread plus a periodic heartbeat.
+
+Each open stream holds one server thread, so StreamLimit caps them below
+the worker's thread count and the plain endpoints always have threads left.
+"""
+import json
+import threading
+import time
+
+
+class StatusChannel:
+    """Fan-out of snapshot(session_id) to SSE subscribers at up to rate updates/s"""
+
+    def __init__(self, snapshot, rate=10.0, heartbeat=15.0):
+        self.snapshot = snapshot
+        self.interval = 1.0 / rate
+        self.heartbeat = heartbeat
+        # session_id -> {"subscribers", "version", "frame", "changed"}
+        self._topics = {}
+        self._lock = threading.Lock()
+        self._has_topics = threading.Condition(self._lock)
+        self._publisher = None
+        self.published = 0
+        self.delivered = 0
+
+    def _start_publisher(self):
+        """Start the publisher thread on first subscription; caller holds the lock"""
+        if self._publisher is None or not self._publisher.is_alive():
+            self._publisher = threading.Thread(target=self._run, daemon=True,
+                                               name="status-push")
+            self._publisher.start()
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while True:
+            with self._lock:
+                while not self._topics:
+                    # Nobody is listening: sleep until someone subscribes
+                    self._has_topics.wait()
+                    next_tick = time.monotonic()
+                session_ids = list(self._topics)
+
+            for session_id in session_ids:
+                try:
+                    payload = json.dumps(self.snapshot(session_id))
+                except Exception as e:
+                    print(f"Error building status for {session_id}: {e}")
+                    continue
+                frame = f"event: status\ndata: {payload}\n\n"
+                with self._lock:
+                    topic = self._topics.get(session_id)
+                    if topic is None or topic["frame"] == frame:
+                        continue
+                    topic["frame"] = frame
+                    topic["version"] += 1
+                    self.published += 1
+                    topic["changed"].notify_all()
+
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind; skip the missed ticks rather than bursting
+                next_tick = time.monotonic()
+
+    def subscribe(self, session_id):
+        """Yield SSE frames for a session: its current status, then every change"""
+        with self._lock:
+            topic = self._topics.get(session_id)
+            if topic is None:
+                topic = {"subscribers": 0, "version": 0, "frame": None,
+                         "changed": threading.Condition(self._lock)}
+                self._topics[session_id] = topic
+                self._has_topics.notify()
+            topic["subscribers"] += 1
+            self._start_publisher()
+
+        seen = 0
+        try:
+            # Tell EventSource how soon to reconnect if the connection drops
+            yield "retry: 2000\n\n"
+            while True:
+                with self._lock:
+                    if topic["version"] == seen:
+                        topic["changed"].wait(self.heartbeat)
+                    version, frame = topic["version"], topic["frame"]
+                    if version != seen:
+                        self.delivered += 1
+                if version == seen:
+                    # Comment line keeps proxies from timing out and detects closed clients
+                    yield ": keepalive\n\n"
+                    continue
+                seen = version
+                yield frame
+        finally:
+            with self._lock:
+                topic["subscribers"] -= 1
+                if topic["subscribers"] == 0 and self._topics.get(session_id) is topic:
+                    del self._topics[session_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "topics": len(self._topics),
+                "subscribers": sum(topic["subscribers"] for topic in self._topics.values()),
+                "rate": round(1.0 / self.interval, 2),
+                "published": self.published,
+                "delivered": self.delivered,
+            }
+
+
+class StreamLimit:
+    """Cap on long-lived streams per process; over the cap a stream gets one busy frame and ends"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.open = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def wrap(self, events, busy_frame):
+        """Yield from the events generator if a slot is free, else just busy_frame.
+
+        The slot is taken on the first iteration, not when the response is
+        built, so a response that is never started cannot leak it.
+        """
+        with self._lock:
+            admitted = self.open < self.limit
+            if admitted:
+                self.open += 1
+            else:
+                self.rejected += 1
+        if not admitted:
+            yield busy_frame
+            return
+        try:
+            yield from events
+        finally:
+            with self._lock:
+                self.open -= 1
+
+    def stats(self):
+        with self._lock:
+            return {"open_streams": self.open, "stream_limit": self.limit, "rejected_streams": self.rejected}
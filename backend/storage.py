@@ -0,0 +1,227 @@
+"""Per-recording storage keyed by recording ID.
+
+Each recording gets its own directory under the storage root holding its
+blobs (audio.wav and its audio.ogg playback copy, transcript.txt,
+words.json, form.json, and extraction.json with what the last extraction
+read and returned). A SQLite index keeps the metadata the history view
+queries: session, patient, document, status, timestamps and durations.
+Blobs are written to a temporary file and renamed into place, and forms
+are cached in memory, revalidated against the file's mtime so edits
+saved by another worker are picked up.
+"""
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+RECORDING_ID = re.compile(r"^[0-9a-f]{32}$")
+BLOBS = {
+    "audio": "audio.wav",
+    "audio_opus": "audio.ogg",
+    "transcript": "transcript.txt",
+    "words": "words.json",
+    "form": "form.json",
+    "extraction": "extraction.json",
+}
+STATUSES = ("recording", "recorded", "processing", "done", "failed")
+# Index columns that update() may set
+METADATA = ("session_id", "status", "document", "patient", "audio_seconds",
+            "processing_seconds", "error")
+
+
+def write_atomic(path, data):
+    """Replace a file in one step, so readers never see a partial write"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class RecordingStore:
+    def __init__(self, root, form_cache_size=256):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.form_cache_size = form_cache_size
+        self._forms = OrderedDict()
+        self._forms_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=10,
+                                   check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS recordings (
+                recording_id TEXT PRIMARY KEY,
+                session_id TEXT,
+                status TEXT NOT NULL,
+                document TEXT,
+                patient TEXT,
+                audio_seconds REAL,
+                processing_seconds REAL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS recordings_created ON recordings (created_at);
+            CREATE INDEX IF NOT EXISTS recordings_status ON recordings (status, created_at);
+            CREATE INDEX IF NOT EXISTS recordings_patient ON recordings (patient);""")
+        self._db.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+            self._db.commit()
+            return rows
+
+    # Paths
+
+    @staticmethod
+    def valid_id(recording_id):
+        return isinstance(recording_id, str) and bool(RECORDING_ID.match(recording_id))
+
+    def path(self, recording_id, blob):
+        """Path of a recording's blob; only well-formed IDs and known blobs resolve"""
+        if not self.valid_id(recording_id) or blob not in BLOBS:
+            raise KeyError(f"Invalid recording blob {recording_id!r}/{blob!r}")
+        return os.path.join(self.root, recording_id, BLOBS[blob])
+
+    # Index
+
+    def create(self, session_id=None, status="recording"):
+        """New recording directory and index row; returns the recording ID"""
+        recording_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.root, recording_id))
+        now = time.time()
+        self._execute("INSERT INTO recordings (recording_id, session_id, status, created_at, updated_at) "
+                      "VALUES (?, ?, ?, ?, ?)", (recording_id, session_id, status, now, now))
+        return recording_id
+
+    def import_audio(self, path, session_id=None):
+        """Copy an existing WAV file into a new recording; returns its ID"""
+        recording_id = self.create(session_id, status="recorded")
+        tmp_path = self.path(recording_id, "audio") + ".tmp"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, self.path(recording_id, "audio"))
+        return recording_id
+
+    def update(self, recording_id, **fields):
+        unknown = set(fields) - set(METADATA)
+        if unknown:
+            raise ValueError(f"Unknown recording fields: {sorted(unknown)}")
+        if fields.get("status") not in (None,) + STATUSES:
+            raise ValueError(f"Unknown recording status {fields['status']!r}")
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE recordings SET {columns}, updated_at = ? WHERE recording_id = ?",
+                      (*fields.values(), time.time(), recording_id))
+
+    def transition(self, recording_id, expected, status, updated_before=None):
+        """Set the status only if it is currently `expected`; returns whether it changed.
+
+        One conditional UPDATE, so of several threads or worker processes
+        racing for the same recording exactly one wins. With updated_before,
+        only a row last updated before that time changes.
+        """
+        if status not in STATUSES:
+            raise ValueError(f"Unknown recording status {status!r}")
+        with self._lock:
+            cursor = self._db.execute("UPDATE recordings SET status = ?, updated_at = ? "
+                                      "WHERE recording_id = ? AND status = ? AND updated_at < ?",
+                                      (status, time.time(), recording_id, expected,
+                                       float('inf') if updated_before is None else updated_before))
+            self._db.commit()
+            return cursor.rowcount == 1
+
+    def get(self, recording_id):
+        """Index metadata of a recording, or None"""
+        if not self.valid_id(recording_id):
+            return None
+        with self._lock:
+            cursor = self._db.execute("SELECT * FROM recordings WHERE recording_id = ?",
+                                      (recording_id,))
+            row = cursor.fetchone()
+            columns = [d[0] for d in cursor.description]
+        return dict(zip(columns, row)) if row else None
+
+    def latest(self):
+        """ID of the most recently created recording, or None"""
+        rows = self._execute("SELECT recording_id FROM recordings ORDER BY created_at DESC LIMIT 1")
+        return rows[0][0] if rows else None
+
+    def list(self, page=1, per_page=20, status=None, query=None):
+        """One page of recordings, newest first, optionally filtered by status or patient"""
+        page = max(1, int(page))
+        per_page = min(100, max(1, int(per_page)))
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if query:
+            clauses.append("patient LIKE ? ESCAPE '\\'")
+            params.append("%" + re.sub(r"([%_\\])", r"\\\1", query) + "%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM recordings {where}", params).fetchone()[0]
+            cursor = self._db.execute(
+                f"SELECT * FROM recordings {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (*params, per_page, (page - 1) * per_page))
+            columns = [d[0] for d in cursor.description]
+            items = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return {"items": items, "total": total, "page": page, "per_page": per_page}
+
+    # Blobs
+
+    def write_blob(self, recording_id, blob, data):
+        write_atomic(self.path(recording_id, blob), data)
+
+    def read_blob(self, recording_id, blob):
+        """Text content of a blob, or None if it was never written"""
+        try:
+            with open(self.path(recording_id, blob), encoding="utf-8") as f:
+                return f.read()
+        except (FileNotFoundError, KeyError):
+            return None
+
+    def save_form(self, recording_id, form, **metadata):
+        """Write a recording's form and cache it; metadata goes to the index"""
+        path = self.path(recording_id, "form")
+        write_atomic(path, json.dumps(form, ensure_ascii=False, indent=4))
+        self._cache_form(recording_id, os.stat(path).st_mtime_ns, form)
+        self.update(recording_id, document=form.get("document"), **metadata)
+
+    def load_form(self, recording_id):
+        """A recording's form, from memory unless the file changed; None if missing.
+
+        The returned dict is shared with the cache and must not be mutated.
+        """
+        try:
+            path = self.path(recording_id, "form")
+            mtime = os.stat(path).st_mtime_ns
+        except (KeyError, FileNotFoundError):
+            return None
+
+        with self._forms_lock:
+            cached = self._forms.get(recording_id)
+            if cached is not None and cached[0] == mtime:
+                self._forms.move_to_end(recording_id)
+                return cached[1]
+
+        with open(path, encoding="utf-8") as f:
+            form = json.load(f)
+        self._cache_form(recording_id, mtime, form)
+        return form
+
+    def _cache_form(self, recording_id, mtime, form):
+        with self._forms_lock:
+            self._forms[recording_id] = (mtime, form)
+            self._forms.move_to_end(recording_id)
+            while len(self._forms) > self.form_cache_size:
+                self._forms.popitem(last=False)
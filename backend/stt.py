@@ -0,0 +1,289 @@
+"""Speech-to-text backends behind one interface.
+
+recorder.stt_backend turns the 16 kHz mono payload built by
+audio_preprocess into a transcript. STT_BACKEND picks the implementation:
+
+- "elevenlabs" (default): Scribe over the network, through the shared
+  UpstreamCaller (deadlines, retries, hedging, rate limits)
+- "local": Whisper on this machine with faster-whisper, a CTranslate2
+  runtime running int8-quantized models on the CPU; an optional
+  dependency (pip install faster-whisper), needed only for this backend
+
+A backend has `model` and `language` (part of the transcript cache key,
+so transcripts from different backends never mix), `audio_format` (the
+payload encoding it wants from audio_preprocess) and transcribe(audio_data),
+which returns an object with .text and .words (each with text, start, end
+and speaker_id, as ElevenLabs returns them).
+
+The local backend runs the model in a process pool shared by every job
+and live transcriber of this process, started on first use with one
+model copy per process. Requests that arrive while all processes are
+busy are batched: one batch decodes the 30-second windows of several
+recordings together, which is how CTranslate2 gets its throughput.
+"""
+import bisect
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import wave
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from types import SimpleNamespace
+
+import numpy as np
+
+import audio_preprocess
+import metrics
+
+LOCAL_MODEL = os.getenv("LOCAL_STT_MODEL", "small")
+LOCAL_COMPUTE_TYPE = os.getenv("LOCAL_STT_COMPUTE_TYPE", "int8")
+LOCAL_LANGUAGE = os.getenv("LOCAL_STT_LANGUAGE", "ka")
+LOCAL_PROCESSES = int(os.getenv("LOCAL_STT_PROCESSES", "1"))
+# CTranslate2 threads per process; 0 lets it use every core
+LOCAL_THREADS = int(os.getenv("LOCAL_STT_THREADS", "0"))
+# 30-second windows decoded together, and how long to wait for a batch to fill
+LOCAL_BATCH_SIZE = int(os.getenv("LOCAL_STT_BATCH_SIZE", "8"))
+LOCAL_BATCH_WINDOW = float(os.getenv("LOCAL_STT_BATCH_WINDOW", "0.02"))
+LOCAL_BEAM_SIZE = int(os.getenv("LOCAL_STT_BEAM_SIZE", "1"))
+
+SAMPLE_RATE = 16000
+# Whisper's context window
+CLIP_SECONDS = 30
+
+
+class ElevenLabsSTT:
+    audio_format = audio_preprocess.DEFAULT_FORMAT
+
+    def __init__(self, client, caller, model="scribe_v1", language="kat", deadline=120.0,
+                 retries=3, hedge_percentile=None):
+        # client() returns the SDK client, looked up per call so it can be swapped
+        self.client = client
+        self.caller = caller
+        self.model = model
+        self.language = language
+        self.deadline = deadline
+        self.retries = retries
+        self.hedge_percentile = hedge_percentile
+
+    def transcribe(self, audio_data):
+        """Transcribe an encoded audio file-like object with ElevenLabs"""
+        payload = audio_data.getvalue()
+        name = getattr(audio_data, 'name', 'audio.wav')
+
+        def attempt(timeout):
+            # Fresh file object per attempt: retries and hedges may overlap
+            upload = BytesIO(payload)
+            upload.name = name
+            return self.client().speech_to_text.convert(
+                file=upload,
+                model_id=self.model,
+                tag_audio_events=True,  # Tag audio events
+                language_code=self.language,
+                diarize=True,           # Annotate speakers
+                request_options={"timeout_in_seconds": max(1, int(timeout)), "max_retries": 0},
+            )
+
+        with metrics.span("stt_upload", bytes=len(payload)):
+            return self.caller.call("stt", attempt, deadline=self.deadline, retries=self.retries,
+                                    hedge_percentile=self.hedge_percentile)
+
+
+# Local backend: model and decoding in worker processes
+
+_pipeline = None
+
+
+def _load_model(model, compute_type, threads):
+    """Process pool initializer: one model per worker process"""
+    global _pipeline
+    from faster_whisper import BatchedInferencePipeline, WhisperModel
+    _pipeline = BatchedInferencePipeline(
+        WhisperModel(model, device="cpu", compute_type=compute_type, cpu_threads=threads))
+
+
+def _ready():
+    return os.getpid()
+
+
+def decode(payload):
+    """16 kHz mono float32 samples of a WAV (or, with soundfile, FLAC/Ogg) payload"""
+    if payload[:4] == b"RIFF":
+        with wave.open(BytesIO(payload), 'rb') as wf:
+            data = np.frombuffer(wf.readframes(wf.getnframes()), dtype='<i2')
+            return data.reshape(-1, wf.getnchannels()).mean(axis=1).astype(np.float32) / 32768.0
+    import soundfile
+    data, _ = soundfile.read(BytesIO(payload), dtype='float32', always_2d=True)
+    return data.mean(axis=1)
+
+
+def _transcribe_batch(payloads, language, beam_size, batch_size):
+    """[(text, words)] for several recordings decoded as one batch.
+
+    The recordings are laid end to end and cut into clips of at most
+    CLIP_SECONDS that never cross a recording boundary; the pipeline
+    decodes up to batch_size clips at a time and each segment is handed
+    back to the recording its clip came from.
+    """
+    audios = [decode(payload) for payload in payloads]
+    offsets, clips = [], []
+    position = 0
+    for audio in audios:
+        offsets.append(position / SAMPLE_RATE)
+        for start in range(0, len(audio), CLIP_SECONDS * SAMPLE_RATE):
+            end = min(start + CLIP_SECONDS * SAMPLE_RATE, len(audio))
+            clips.append({"start": (position + start) / SAMPLE_RATE,
+                          "end": (position + end) / SAMPLE_RATE})
+        position += len(audio)
+
+    texts = [[] for _ in audios]
+    words = [[] for _ in audios]
+    if clips:
+        segments, _ = _pipeline.transcribe(
+            np.concatenate(audios), language=language, beam_size=beam_size,
+            batch_size=batch_size, clip_timestamps=clips, vad_filter=False, word_timestamps=True)
+        for segment in segments:
+            # 10 ms of slack: a recording's first segment starts right at its offset
+            index = bisect.bisect_right(offsets, segment.start + 0.01) - 1
+            texts[index].append(segment.text.strip())
+            for word in segment.words or []:
+                words[index].append({
+                    "text": word.word.strip(), "type": "word", "speaker_id": None,
+                    "start": round(word.start - offsets[index], 3),
+                    "end": round(word.end - offsets[index], 3),
+                    "logprob": round(math.log(max(word.probability, 1e-9)), 4),
+                })
+    return [(" ".join(text), word_list) for text, word_list in zip(texts, words)]
+
+
+class _Request:
+    def __init__(self, payload, seconds):
+        self.payload = payload
+        self.seconds = seconds
+        self.clips = max(1, math.ceil(seconds / CLIP_SECONDS))
+        self.future = Future()
+
+
+class LocalWhisperSTT:
+    audio_format = "wav"  # the workers decode it directly, no FLAC round trip
+
+    def __init__(self, model=LOCAL_MODEL, compute_type=LOCAL_COMPUTE_TYPE, language=LOCAL_LANGUAGE,
+                 processes=LOCAL_PROCESSES, threads=LOCAL_THREADS, batch_size=LOCAL_BATCH_SIZE,
+                 batch_window=LOCAL_BATCH_WINDOW, beam_size=LOCAL_BEAM_SIZE, deadline=600.0):
+        self.model_name = model
+        self.model = f"faster-whisper:{model}:{compute_type}"
+        self.compute_type = compute_type
+        self.language = language
+        self.processes = processes
+        self.threads = threads
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.beam_size = beam_size
+        self.deadline = deadline
+        self._pool = None
+        self._dispatcher = None
+        self._queue = queue.Queue()
+        # One batch in flight per process; requests queue up (and batch) behind them
+        self._slots = threading.Semaphore(processes)
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "batches": 0, "clips": 0, "audio_seconds": 0.0}
+
+    def start(self):
+        """Start the worker processes and load the model; returns the seconds it took"""
+        with self._lock:
+            if self._pool is not None:
+                return 0.0
+            try:
+                import faster_whisper  # noqa: F401 -- fail here, not in every worker
+            except ImportError:
+                raise RuntimeError("STT_BACKEND=local needs faster-whisper (pip install faster-whisper)")
+            started = time.perf_counter()
+            # spawn, not fork: the parent has threads (HTTP pools, executors) mid-flight
+            pool = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_load_model, initargs=(self.model_name, self.compute_type, self.threads))
+            try:
+                for future in [pool.submit(_ready) for _ in range(self.processes)]:
+                    future.result()
+            except Exception:
+                # e.g. the model could not be downloaded; the next call tries again
+                pool.shutdown(cancel_futures=True)
+                raise
+            self._pool = pool
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="stt-batcher", daemon=True)
+                self._dispatcher.start()
+            return time.perf_counter() - started
+
+    def transcribe(self, audio_data):
+        """Transcribe an encoded audio file-like object on the local model"""
+        payload = audio_data.getvalue()
+        self.start()
+        # 16-bit mono WAV: two bytes per sample
+        request = _Request(payload, len(payload) / (2 * SAMPLE_RATE))
+        with metrics.span("stt_local", bytes=len(payload)):
+            self._queue.put(request)
+            text, words = request.future.result(timeout=self.deadline)
+        return SimpleNamespace(text=text, words=[SimpleNamespace(**word) for word in words])
+
+    def _dispatch(self):
+        while True:
+            batch = [self._queue.get()]
+            self._slots.acquire()
+            clips = batch[0].clips
+            window_end = time.monotonic() + self.batch_window
+            while clips < self.batch_size:
+                try:
+                    request = self._queue.get(timeout=max(0.0, window_end - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(request)
+                clips += request.clips
+            with self._lock:
+                self._counters["requests"] += len(batch)
+                self._counters["batches"] += 1
+                self._counters["clips"] += clips
+                self._counters["audio_seconds"] += sum(request.seconds for request in batch)
+            pool = None
+            try:
+                # Starts a new pool if the last one broke
+                self.start()
+                pool = self._pool
+                future = pool.submit(_transcribe_batch, [request.payload for request in batch],
+                                     self.language, self.beam_size, self.batch_size)
+            except Exception as e:
+                # Fail this batch rather than the dispatcher
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda done, batch=batch, pool=pool: self._finish(batch, pool, done))
+
+    def _finish(self, batch, pool, done):
+        self._slots.release()
+        error = done.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._discard(pool)
+        for i, request in enumerate(batch):
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(done.result()[i])
+
+    def _discard(self, pool):
+        """Drop a pool whose worker died (e.g. killed for memory); the next batch starts a new one"""
+        with self._lock:
+            if pool is None or self._pool is not pool:
+                return
+            self._pool = None
+        print("Local STT worker died, restarting the pool")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters["audio_seconds"] = round(counters["audio_seconds"], 2)
+        counters["mean_batch"] = (round(counters["requests"] / counters["batches"], 2)
+                                  if counters["batches"] else None)
+        return counters
@@ -0,0 +1,269 @@
+"""Shared HTTP client and resilient call wrapper for the STT and LLM APIs.
+
+Both SDKs are built on httpx, so they share one pooled httpx.Client with
+explicit timeouts and connection limits. Their own retry logic is turned
+off; UpstreamCaller.call adds a per-call deadline, retries with jittered
+exponential backoff, an optional hedged duplicate request once an attempt
+outlives a latency percentile, per-upstream latency histograms and an
+optional per-upstream rate limit.
+"""
+import bisect
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def build_http_client(connect_timeout=5.0, read_timeout=120.0, max_connections=32,
+                      max_keepalive=16, keepalive_expiry=60.0):
+    """Pooled httpx client shared by the upstream SDK clients"""
+    import httpx
+    return httpx.Client(
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout),
+        limits=httpx.Limits(max_connections=max_connections,
+                            max_keepalive_connections=max_keepalive,
+                            keepalive_expiry=keepalive_expiry),
+    )
+
+
+def is_retryable(error):
+    """Transport failures, timeouts and 429/5xx responses are worth retrying"""
+    if isinstance(error, TimeoutError):
+        return True
+    # httpx is imported with the first client; before that no error can be one of its
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    # SDK errors (openai.APIStatusError, elevenlabs ApiError, httpx.HTTPStatusError)
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # openai.APIConnectionError / APITimeoutError carry no status
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class DeadlineExceeded(Exception):
+    """No attempt succeeded before the call's deadline"""
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS, window=500):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        # Recent samples for percentile estimates (hedging threshold)
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.recent.append(seconds)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self.recent)
+        if not samples:
+            return None
+        return samples[min(int(len(samples) * q / 100), len(samples) - 1)]
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = []
+            running = 0
+            for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+                running += count
+                cumulative.append(("+Inf" if bound == float('inf') else bound, running))
+            count, total = self.count, self.total
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "buckets": cumulative,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class RateLimiter:
+    """Token bucket: on average `rate` attempts per second, bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self):
+        """Take a token if one is available; otherwise seconds until one is (lock held)"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def try_acquire(self):
+        with self._lock:
+            return self._take() == 0.0
+
+    def acquire(self):
+        """Block until a token is available; returns the seconds waited"""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                wait_for = self._take()
+            if wait_for == 0.0:
+                return time.monotonic() - start
+            time.sleep(wait_for)
+
+
+class UpstreamCaller:
+    """Deadline/retry/hedging wrapper; fn(timeout) performs one attempt"""
+
+    def __init__(self, max_workers=16):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="upstream")
+        self._histograms = {}
+        self._counters = {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limit(self, name, rate, burst=1):
+        """Rate-limit attempts (retries and hedges included) on one upstream; None removes it"""
+        with self._lock:
+            if rate:
+                self._limiters[name] = RateLimiter(rate, burst)
+            else:
+                self._limiters.pop(name, None)
+
+    def _histogram(self, name):
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = LatencyHistogram()
+                self._counters[name] = {"calls": 0, "attempts": 0, "retries": 0,
+                                        "hedges": 0, "hedge_wins": 0, "errors": 0,
+                                        "throttled": 0, "throttle_seconds": 0.0}
+            return self._histograms[name]
+
+    def _count(self, name, counter, amount=1):
+        with self._lock:
+            self._counters[name][counter] += amount
+
+    def _throttle(self, name):
+        """Wait for the upstream's rate limit, if any; returns the seconds waited"""
+        limiter = self._limiters.get(name)
+        if limiter is None:
+            return 0.0
+        waited = limiter.acquire()
+        if waited > 0:
+            self._count(name, "throttled")
+            self._count(name, "throttle_seconds", waited)
+        return waited
+
+    def _attempt(self, name, fn, timeout):
+        self._count(name, "attempts")
+        start = time.monotonic()
+        result = fn(timeout)
+        self._histogram(name).observe(time.monotonic() - start)
+        return result
+
+    def call(self, name, fn, deadline=120.0, retries=3, backoff=0.5, max_backoff=8.0,
+             hedge_percentile=None, min_samples=20):
+        """Run fn(timeout) until it succeeds, retries run out or deadline passes.
+
+        With hedge_percentile set (e.g. 95) and enough latency history, a
+        duplicate attempt is started once the first has been running longer
+        than that percentile; the first successful result wins. Time spent
+        waiting for a rate limit does not count against the deadline.
+        """
+        histogram = self._histogram(name)
+        self._count(name, "calls")
+        end = time.monotonic() + deadline
+        last_error = None
+
+        for attempt in range(retries + 1):
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            if attempt:
+                self._count(name, "retries")
+            # Queueing for the rate limit is not upstream latency
+            end += self._throttle(name)
+            remaining = end - time.monotonic()
+
+            hedge_after = None
+            if hedge_percentile and histogram.count >= min_samples:
+                hedge_after = histogram.percentile(hedge_percentile)
+
+            try:
+                if hedge_after is None or hedge_after >= remaining:
+                    return self._attempt(name, fn, remaining)
+                return self._hedged(name, fn, hedge_after, end)
+            except Exception as e:
+                last_error = e
+                if not is_retryable(e):
+                    self._count(name, "errors")
+                    raise
+
+            # Full jitter, never sleeping past the deadline
+            delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+            time.sleep(max(0.0, min(delay, end - time.monotonic())))
+
+        self._count(name, "errors")
+        if last_error is not None:
+            raise last_error
+        raise DeadlineExceeded(f"{name}: no attempt finished within {deadline}s")
+
+    def _hedged(self, name, fn, hedge_after, end):
+        primary = self._executor.submit(self._attempt, name, fn, end - time.monotonic())
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        limiter = self._limiters.get(name)
+        if limiter is not None and not limiter.try_acquire():
+            # Hedges are opportunistic: never wait for the rate limit to send one
+            done, _ = wait([primary], timeout=max(0.0, end - time.monotonic()))
+            if done:
+                return primary.result()
+            raise DeadlineExceeded(f"{name}: attempt outlived the deadline")
+        self._count(name, "hedges")
+        hedge = self._executor.submit(self._attempt, name, fn, end - time.monotonic())
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, end - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count(name, "hedge_wins")
+                    return future.result()
+                error = future.exception()
+        if error is not None:
+            raise error
+        raise DeadlineExceeded(f"{name}: hedged attempts outlived the deadline")
+
+    def stats(self):
+        with self._lock:
+            names = list(self._histograms)
+            counters = {name: dict(self._counters[name]) for name in names}
+        return {name: dict(counters[name], latency=self._histograms[name].snapshot())
+                for name in names}
@@ -0,0 +1,125 @@
+"""Energy/zero-crossing voice activity detection to trim silence before STT.
+
+Works on the 16 kHz float mono signal produced by audio_preprocess. Frames
+are classified in one vectorized pass; speech spans are padded so word
+onsets and trailing consonants survive, and the gaps between them are
+shortened to a brief pause. A TimeMap records where each kept span came
+from so STT word timestamps can be mapped back to the original recording.
+"""
+import bisect
+
+import numpy as np
+
+
+class TimeMap:
+    """Piecewise map from trimmed-audio time to original-audio time (seconds)"""
+
+    def __init__(self, pieces):
+        # (trimmed_start, original_start, duration), sorted by trimmed_start
+        self.pieces = pieces
+        self._starts = [piece[0] for piece in pieces]
+
+    def to_original(self, t):
+        if not self.pieces:
+            return t
+        index = max(bisect.bisect_right(self._starts, t) - 1, 0)
+        trimmed_start, original_start, duration = self.pieces[index]
+        # Times inside an inserted pause snap to the end of the preceding span
+        return original_start + min(max(t - trimmed_start, 0.0), duration)
+
+    def to_list(self):
+        return [list(piece) for piece in self.pieces]
+
+
+def frame_features(mono, rate, frame_ms=30):
+    """Per-frame energy (dBFS) and zero-crossing rate, vectorized"""
+    frame = int(rate * frame_ms / 1000)
+    count = len(mono) // frame
+    frames = mono[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    energy_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame
+    return energy_db, zcr
+
+
+def detect_speech(mono, rate, frame_ms=30, margin_db=12.0, zcr_threshold=0.25,
+                  pad_ms=250, min_speech_ms=120, floor_db=-60.0):
+    """Speech spans as a list of (start_sample, end_sample)
+
+    Frames at or below floor_db (digital silence, a muted input) are never
+    speech. Audio that is not silent but has no quiet frames to estimate
+    the noise floor from (continuous speech, steady loud noise) is kept
+    whole rather than trimmed to nothing.
+    """
+    if len(mono) == 0:
+        return []
+    energy_db, zcr = frame_features(mono, rate, frame_ms)
+    if len(energy_db) == 0:
+        return [(0, len(mono))]
+
+    # Adapt to the room: the quietest frames estimate the noise floor
+    noise_floor = np.percentile(energy_db, 10)
+    audible = energy_db > floor_db
+    voiced = energy_db > noise_floor + margin_db
+    # Fricatives are quieter but cross zero often; accept them with less energy
+    unvoiced = (energy_db > noise_floor + margin_db / 2) & (zcr > zcr_threshold)
+    speech = (voiced | unvoiced) & audible
+    if not speech.any():
+        # Nothing stands out from the floor estimate: silence, or nothing quiet to compare with
+        return [(0, len(mono))] if audible.any() else []
+
+    # Drop blips shorter than min_speech_ms, then pad what remains
+    min_frames = max(int(min_speech_ms / frame_ms), 1)
+    if min_frames > 1:
+        run = np.convolve(speech.astype(np.int32), np.ones(min_frames, dtype=np.int32), mode='same')
+        core = run >= min_frames
+        speech = np.convolve(core.astype(np.int32), np.ones(min_frames, dtype=np.int32), mode='same') > 0
+    pad = int(pad_ms / frame_ms)
+    if pad:
+        speech = np.convolve(speech.astype(np.int32), np.ones(2 * pad + 1, dtype=np.int32), mode='same') > 0
+
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    frame = int(rate * frame_ms / 1000)
+    spans = [(int(s) * frame, min(int(e) * frame, len(mono))) for s, e in zip(starts, ends)]
+    # The partial frame at the end was never classified; keep it with the last span
+    if spans and ends[-1] == len(speech):
+        spans[-1] = (spans[-1][0], len(mono))
+    return spans
+
+
+def trim_silence(mono, rate, gap_ms=300, **detect_kwargs):
+    """Concatenate speech spans with gap_ms pauses; returns (trimmed, TimeMap)"""
+    spans = detect_speech(mono, rate, **detect_kwargs)
+    if not spans:
+        return mono[:0], TimeMap([])
+
+    gap = np.zeros(int(rate * gap_ms / 1000), dtype=mono.dtype)
+    parts = []
+    pieces = []
+    position = 0
+    for index, (start, end) in enumerate(spans):
+        if index:
+            parts.append(gap)
+            position += len(gap)
+        parts.append(mono[start:end])
+        pieces.append((position / rate, start / rate, (end - start) / rate))
+        position += end - start
+    return np.concatenate(parts), TimeMap(pieces)
+
+
+def align_words(words, time_map):
+    """Map STT word timestamps (trimmed timeline) back to the original recording"""
+    aligned = []
+    for word in words or []:
+        start = getattr(word, 'start', None)
+        end = getattr(word, 'end', None)
+        aligned.append({
+            "text": getattr(word, 'text', ''),
+            "speaker_id": getattr(word, 'speaker_id', None),
+            "start": time_map.to_original(start) if start is not None else None,
+            "end": time_map.to_original(end) if end is not None else None,
+        })
+    return aligned
@@ -0,0 +1,106 @@
+import os
+import struct
+import time
+
+HEADER_SIZE = 44
+
+
+def _wav_header(channels, sample_width, rate, data_size):
+    """Canonical 44-byte PCM WAV header"""
+    byte_rate = rate * channels * sample_width
+    block_align = channels * sample_width
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+                       b'RIFF', 36 + data_size, b'WAVE',
+                       b'fmt ', 16, 1, channels, rate, byte_rate, block_align,
+                       sample_width * 8,
+                       b'data', data_size)
+
+
+class StreamingWavWriter:
+    """Appends PCM to a WAV file as it arrives.
+
+    The header is written up front and its size fields are patched every
+    header_interval seconds and on close, so memory use stays flat and a
+    crash leaves at most the last interval unaccounted for (see recover_wav).
+    With append=True an existing WAV of the same format is extended instead,
+    e.g. for a follow-up recording of the same consult.
+    """
+
+    def __init__(self, path, channels, sample_width, rate, header_interval=5.0, append=False):
+        self.path = path
+        self.channels = channels
+        self.sample_width = sample_width
+        self.rate = rate
+        self.header_interval = header_interval
+        self.data_size = 0
+        if append:
+            recover_wav(path)
+            self._file = open(path, 'r+b')
+            header = self._file.read(HEADER_SIZE)
+            # Everything but the two size fields must match what we would write
+            expected = _wav_header(channels, sample_width, rate, 0)
+            if len(header) < HEADER_SIZE or header[:4] != b'RIFF' or header[8:40] != expected[8:40]:
+                self._file.close()
+                raise ValueError(f"Cannot append to {path}: different audio format")
+            self.data_size = struct.unpack('<I', header[40:44])[0]
+            self._file.seek(HEADER_SIZE + self.data_size)
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(_wav_header(channels, sample_width, rate, 0))
+        self._last_patch = time.monotonic()
+
+    def write(self, data):
+        """Append raw PCM bytes (bytes or memoryview)"""
+        self._file.write(data)
+        self.data_size += len(data)
+        if time.monotonic() - self._last_patch >= self.header_interval:
+            self._patch_header()
+
+    def _patch_header(self):
+        self._file.flush()
+        end = self._file.tell()
+        self._file.seek(0)
+        self._file.write(_wav_header(self.channels, self.sample_width,
+                                     self.rate, self.data_size))
+        self._file.seek(end)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_patch = time.monotonic()
+
+    def duration(self):
+        return self.data_size / (self.rate * self.channels * self.sample_width)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._patch_header()
+        self._file.close()
+
+
+def recover_wav(path):
+    """Fix the size fields of a WAV left behind by an interrupted recording.
+
+    Only touches files written by StreamingWavWriter (canonical 44-byte
+    header). Returns True if the header was rewritten.
+    """
+    with open(path, 'r+b') as f:
+        header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or header[0:4] != b'RIFF' or header[36:40] != b'data':
+            return False
+
+        channels, rate = struct.unpack('<HI', header[22:28])
+        bits = struct.unpack('<H', header[34:36])[0]
+        block_align = channels * (bits // 8)
+        recorded_size = struct.unpack('<I', header[40:44])[0]
+
+        f.seek(0, os.SEEK_END)
+        data_size = f.tell() - HEADER_SIZE
+        # Drop a trailing partial frame
+        data_size -= data_size % block_align
+        if data_size == recorded_size:
+            return False
+
+        f.truncate(HEADER_SIZE + data_size)
+        f.seek(0)
+        f.write(_wav_header(channels, bits // 8, rate, data_size))
+    return True
@@ -0,0 +1,12 @@
+"""WSGI entry point for production serving.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each worker process imports app.py on its own (no preloading), so PyAudio,
+thread pools and SQLite connections are never shared across a fork.
+Sessions and jobs are shared through state_store, recordings through
+storage.
+"""
+from app import app
+
+__all__ = ["app"]
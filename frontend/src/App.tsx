@@ -1,13 +1,16 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import './App.css';
+import { getSessionId } from './session';
 
 const API_URL = 'http://127.0.0.1:5001/api';
 const MAX_RECORDING_TIME = 180; // 3 minutes in seconds
+const SILENCE_DB = -60; // Bottom of the input level meter in dBFS
 
 function App() {
   const [isRecording, setIsRecording] = useState(false);
   const [recordingTime, setRecordingTime] = useState(0);
+  const [level, setLevel] = useState(SILENCE_DB);
   const [processingTranscription, setProcessingTranscription] = useState(false);
   const [formData, setFormData] = useState(null);
   const [transcription, setTranscription] = useState('');
@@ -15,26 +18,29 @@ function App() {
   const [status, setStatus] = useState('');
   const [error, setError] = useState('');
   
-  // Timer for recording
+  // Recording state, elapsed time and input level pushed by the server
   useEffect(() => {
-    let interval;
+    if (!isRecording) return;
     
-    if (isRecording) {
-      interval = setInterval(() => {
-        setRecordingTime(prev => {
-          if (prev >= MAX_RECORDING_TIME - 1) {
-            // Auto stop recording when reaching the time limit
-            handleStopRecording();
-            return MAX_RECORDING_TIME;
-          }
-          return prev + 1;
-        });
-      }, 1000);
-    }
+    const source = new EventSource(`${API_URL}/status-stream?session_id=${encodeURIComponent(getSessionId())}`);
+    source.addEventListener('status', (event) => {
+      const status = JSON.parse(event.data);
+      if (!status.is_recording) return;
+      
+      const elapsed = Math.floor(status.elapsed_time);
+      setLevel(status.levels ? status.levels.rms_db : SILENCE_DB);
+      if (elapsed >= MAX_RECORDING_TIME) {
+        // Auto stop recording when reaching the time limit
+        source.close();
+        setRecordingTime(MAX_RECORDING_TIME);
+        handleStopRecording();
+        return;
+      }
+      setRecordingTime(elapsed);
+    });
+    source.onerror = () => console.error('Status stream interrupted; the browser will reconnect');
     
-    return () => {
-      if (interval) clearInterval(interval);
-    };
+    return () => source.close();
   }, [isRecording]);
   
   // Format time as MM:SS
@@ -65,7 +71,7 @@ function App() {
       setError('');
       setRecordingTime(0);
       
-      const response = await axios.post(`${API_URL}/start-recording`);
+      const response = await axios.post(`${API_URL}/start-recording`, { session_id: getSessionId() });
       console.log('Start recording response:', response.data);
       
       if (response.data.status === 'recording_started' || response.data.status === 'already_recording') {
@@ -79,6 +85,53 @@ function App() {
     }
   };
   
+  // Process a recording over Server-Sent Events; fields appear as the model fills them in
+  const streamForm = (recordingId) => new Promise<void>((resolve, reject) => {
+    const source = new EventSource(`${API_URL}/process-stream?recording_id=${recordingId}`);
+    
+    source.addEventListener('transcription', (event) => {
+      setTranscription(JSON.parse(event.data).transcription || '');
+    });
+    
+    source.addEventListener('template', (event) => {
+      setFormData(JSON.parse(event.data));
+      setProcessingTranscription(false);
+      setShowDocument(true);
+    });
+    
+    source.addEventListener('field', (event) => {
+      const { path, value } = JSON.parse(event.data);
+      const [sectionIndex, subsectionIndex] = path;
+      setFormData(prev => {
+        const sections = [...prev.sections];
+        if (subsectionIndex === null) {
+          sections[sectionIndex] = { ...sections[sectionIndex], content: value };
+        } else {
+          const subsections = [...sections[sectionIndex].subsections];
+          subsections[subsectionIndex] = { ...subsections[subsectionIndex], content: value };
+          sections[sectionIndex] = { ...sections[sectionIndex], subsections };
+        }
+        return { ...prev, sections };
+      });
+    });
+    
+    source.addEventListener('form', (event) => {
+      setFormData(JSON.parse(event.data));
+      source.close();
+      resolve();
+    });
+    
+    source.addEventListener('failed', (event) => {
+      source.close();
+      reject(new Error(JSON.parse(event.data).error));
+    });
+    
+    source.onerror = () => {
+      source.close();
+      reject(new Error('Lost connection to the server'));
+    };
+  });
+  
   // Handle stop recording
   const handleStopRecording = async () => {
     if (!isRecording) return;
@@ -89,34 +142,15 @@ function App() {
       setProcessingTranscription(true);
       
       // Stop recording
-      const stopResponse = await axios.post(`${API_URL}/stop-recording`);
+      const stopResponse = await axios.post(`${API_URL}/stop-recording`, { session_id: getSessionId() });
       console.log('Stop response:', stopResponse.data);
       
       if (stopResponse.data.status === 'processing_started') {
         setStatus('Transcribing audio and generating document...');
         
-        // Process the recording
-        const processResponse = await axios.post(`${API_URL}/process`, {
-          filename: stopResponse.data.filename
-        });
-        console.log('Process response:', processResponse.data);
-        
-        // Get form data and transcription
-        try {
-          const formResponse = await axios.get(`${API_URL}/get-form`);
-          setFormData(formResponse.data);
-          
-          const transcriptionResponse = await axios.get(`${API_URL}/get-transcription`);
-          setTranscription(transcriptionResponse.data.transcription || '');
-          
-          setProcessingTranscription(false);
-          setShowDocument(true);
-          setStatus('Document generated successfully!');
-        } catch (getError) {
-          console.error('Error getting document:', getError);
-          setError(`Error retrieving document: ${getError.message}`);
-          setProcessingTranscription(false);
-        }
+        // Stream the document as it is generated
+        await streamForm(stopResponse.data.recording_id);
+        setStatus('Document generated successfully!');
       }
     } catch (error) {
       console.error('Error processing recording:', error);
@@ -157,6 +191,13 @@ function App() {
                 <div className="recording-icon"></div>
               </div>
               
+              <div className="level-meter">
+                <div
+                  className="level-meter-fill"
+                  style={{ width: `${Math.min(100, Math.max(0, 100 * (level - SILENCE_DB) / -SILENCE_DB))}%` }}
+                ></div>
+              </div>
+              
               <button className="stop-button" onClick={handleStopRecording}>
                 ჩაწერის შეწყვეტა
               </button>
@@ -36,11 +36,11 @@ const DocumentForm: React.FC = () => {
         setIsLoading(true);
         
         // Get form data
-        const formResponse = await axios.get(`${API_URL}/get-form`);
+        const formResponse = await axios.get(`${API_URL}/get-form`, { params: { recording_id: id } });
         setFormData(formResponse.data);
         
         // Get transcription
-        const transcriptionResponse = await axios.get(`${API_URL}/get-transcription`);
+        const transcriptionResponse = await axios.get(`${API_URL}/get-transcription`, { params: { recording_id: id } });
         setTranscription(transcriptionResponse.data.transcription);
         
         setIsLoading(false);
@@ -85,7 +85,7 @@ const DocumentForm: React.FC = () => {
   // Save the form
   const handleSave = async () => {
     try {
-      await axios.post(`${API_URL}/save-form`, formData);
+      await axios.post(`${API_URL}/save-form`, formData, { params: { recording_id: id } });
       alert('დოკუმენტი წარმატებით შეინახა');
     } catch (error) {
       console.error('Error saving form:', error);
@@ -96,7 +96,7 @@ const DocumentForm: React.FC = () => {
   // Save and navigate to history
   const handleFinish = async () => {
     try {
-      await axios.post(`${API_URL}/save-form`, formData);
+      await axios.post(`${API_URL}/save-form`, formData, { params: { recording_id: id } });
       navigate('/history');
     } catch (error) {
       console.error('Error saving form:', error);
@@ -204,6 +204,14 @@ const DocumentForm: React.FC = () => {
       ) : (
         <div className="bg-white rounded-lg shadow-md p-8">
           <h3 className="text-lg font-medium mb-4">ორიგინალი ტრანსკრიფცია</h3>
+          {id && (
+            <audio
+              className="w-full mb-4"
+              controls
+              preload="metadata"
+              src={`${API_URL}/get-audio/${id}?format=opus`}
+            />
+          )}
           <div className="p-4 bg-gray-50 rounded-md">
             <p className="whitespace-pre-line">
               {transcription || 'ტრანსკრიფცია არ არის ხელმისაწვდომი'}
@@ -2,33 +2,56 @@ import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import axios from 'axios';
 
-interface DocumentItem {
-  id: string;
-  title: string;
-  patient: string;
-  date: string;
+interface RecordingItem {
+  recording_id: string;
+  document: string | null;
+  patient: string | null;
   status: string;
+  created_at: number;
+  audio_seconds: number | null;
 }
 
 const API_URL = 'http://localhost:5000/api';
+const PER_PAGE = 20;
+
+const STATUS_LABELS: Record<string, string> = {
+  recording: 'ჩაწერა მიმდინარეობს',
+  recorded: 'ჩაწერილი',
+  processing: 'მუშავდება',
+  done: 'დასრულებული',
+  failed: 'შეცდომა',
+};
 
 const History: React.FC = () => {
-  const [documents, setDocuments] = useState<DocumentItem[]>([]);
+  const [documents, setDocuments] = useState<RecordingItem[]>([]);
   const [isLoading, setIsLoading] = useState(true);
+  const [page, setPage] = useState(1);
+  const [total, setTotal] = useState(0);
+  const [query, setQuery] = useState('');
+  const [status, setStatus] = useState('');
   
-  // Mock data while we don't have a real history endpoint
+  // One page of the recording index, newest first
   useEffect(() => {
-    // This would normally fetch from the API
-    // In a real app, you would implement a history endpoint
-    const mockDocuments = [
-      { id: '1', title: 'ფორმა IV-100ა', patient: 'გიორგი მაისურაძე', date: '2025-02-24', status: 'დასრულებული' },
-      { id: '2', title: 'ფორმა IV-106ა', patient: 'ნათია კვირკველია', date: '2025-02-20', status: 'დასრულებული' },
-      { id: '3', title: 'ფორმა IV-100ა', patient: 'ლევან გოგიჩაშვილი', date: '2025-02-18', status: 'დრაფტი' },
-    ];
+    const fetchPage = async () => {
+      try {
+        setIsLoading(true);
+        const response = await axios.get(`${API_URL}/recordings`, {
+          params: { page, per_page: PER_PAGE, q: query || undefined, status: status || undefined }
+        });
+        setDocuments(response.data.items);
+        setTotal(response.data.total);
+      } catch (error) {
+        console.error('Error fetching history:', error);
+      } finally {
+        setIsLoading(false);
+      }
+    };
     
-    setDocuments(mockDocuments);
-    setIsLoading(false);
-  }, []);
+    fetchPage();
+  }, [page, query, status]);
+  
+  const pageCount = Math.max(1, Math.ceil(total / PER_PAGE));
+  const formatDate = (timestamp: number) => new Date(timestamp * 1000).toISOString().slice(0, 10);
   
   return (
     <div>
@@ -43,16 +66,22 @@ const History: React.FC = () => {
               type="text" 
               placeholder="ძიება..." 
               className="py-2 px-8 border border-gray-300 rounded-md"
+              value={query}
+              onChange={(e) => { setQuery(e.target.value); setPage(1); }}
             />
             <svg xmlns="http://www.w3.org/2000/svg" className="h-5 w-5 text-gray-400 absolute left-2 top-2.5" fill="none" viewBox="0 0 24 24" stroke="currentColor">
               <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M21 21l-6-6m2-5a7 7 0 11-14 0 7 7 0 0114 0z" />
             </svg>
           </div>
-          <select className="py-2 px-3 border border-gray-300 rounded-md">
-            <option>ყველა დოკუმენტი</option>
-            <option>ფორმა IV-100ა</option>
-            <option>ფორმა IV-106ა</option>
-            <option>ფორმა IV-200ა</option>
+          <select
+            className="py-2 px-3 border border-gray-300 rounded-md"
+            value={status}
+            onChange={(e) => { setStatus(e.target.value); setPage(1); }}
+          >
+            <option value="">ყველა დოკუმენტი</option>
+            {Object.entries(STATUS_LABELS).map(([value, label]) => (
+              <option key={value} value={value}>{label}</option>
+            ))}
           </select>
         </div>
       </div>
@@ -85,46 +114,46 @@ const History: React.FC = () => {
             </thead>
             <tbody className="bg-white divide-y divide-gray-200">
               {documents.map((doc) => (
-                <tr key={doc.id} className="hover:bg-gray-50">
+                <tr key={doc.recording_id} className="hover:bg-gray-50">
                   <td className="px-6 py-4 whitespace-nowrap">
                     <div className="flex items-center">
                       <svg xmlns="http://www.w3.org/2000/svg" className="h-5 w-5 text-blue-600 mr-2" fill="none" viewBox="0 0 24 24" stroke="currentColor">
                         <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M9 12h6m-6 4h6m2 5H7a2 2 0 01-2-2V5a2 2 0 012-2h5.586a1 1 0 01.707.293l5.414 5.414a1 1 0 01.293.707V19a2 2 0 01-2 2z" />
                       </svg>
                       <div>
-                        <div className="text-sm font-medium text-gray-900">{doc.title}</div>
+                        <div className="text-sm font-medium text-gray-900">{doc.document || 'ფორმა IV-100ა'}</div>
                         <div className="text-xs text-gray-500">{doc.patient}</div>
                       </div>
                     </div>
                   </td>
                   <td className="px-6 py-4 whitespace-nowrap">
-                    <div className="text-sm text-gray-900">{doc.date}</div>
+                    <div className="text-sm text-gray-900">{formatDate(doc.created_at)}</div>
                   </td>
                   <td className="px-6 py-4 whitespace-nowrap">
                     <div className="text-sm text-gray-900">{doc.patient}</div>
                   </td>
                   <td className="px-6 py-4 whitespace-nowrap">
                     <span className={`px-2 inline-flex text-xs leading-5 font-semibold rounded-full ${
-                      doc.status === 'დასრულებული' 
+                      doc.status === 'done' 
                         ? 'bg-green-100 text-green-800' 
                         : 'bg-yellow-100 text-yellow-800'
                     }`}>
-                      {doc.status}
+                      {STATUS_LABELS[doc.status] || doc.status}
                     </span>
                   </td>
                   <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-500">
                     <div className="flex space-x-2">
-                      <Link to={`/document/${doc.id}`} className="px-2 py-1 bg-blue-600 text-white rounded-md hover:bg-blue-700">
+                      <Link to={`/document/${doc.recording_id}`} className="px-2 py-1 bg-blue-600 text-white rounded-md hover:bg-blue-700">
                         <svg xmlns="http://www.w3.org/2000/svg" className="h-4 w-4" fill="none" viewBox="0 0 24 24" stroke="currentColor">
                           <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M15 12a3 3 0 11-6 0 3 3 0 016 0z" />
                           <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M2.458 12C3.732 7.943 7.523 5 12 5c4.478 0 8.268 2.943 9.542 7-1.274 4.057-5.064 7-9.542 7-4.477 0-8.268-2.943-9.542-7z" />
                         </svg>
                       </Link>
-                      <button className="px-2 py-1 bg-gray-200 text-gray-700 rounded-md hover:bg-gray-300">
+                      <a href={`${API_URL}/get-audio/${doc.recording_id}`} className="px-2 py-1 bg-gray-200 text-gray-700 rounded-md hover:bg-gray-300">
                         <svg xmlns="http://www.w3.org/2000/svg" className="h-4 w-4" fill="none" viewBox="0 0 24 24" stroke="currentColor">
                           <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M4 16v1a3 3 0 003 3h10a3 3 0 003-3v-1m-4-4l-4 4m0 0l-4-4m4 4V4" />
                         </svg>
-                      </button>
+                      </a>
                       <button className="px-2 py-1 bg-gray-200 text-gray-700 rounded-md hover:bg-gray-300">
                         <svg xmlns="http://www.w3.org/2000/svg" className="h-4 w-4" fill="none" viewBox="0 0 24 24" stroke="currentColor">
                           <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16" />
@@ -136,6 +165,27 @@ const History: React.FC = () => {
               ))}
             </tbody>
           </table>
+          
+          <div className="px-6 py-3 flex justify-between items-center bg-gray-50 text-sm text-gray-600">
+            <span>{total} ჩანაწერი</span>
+            <div className="flex items-center space-x-2">
+              <button
+                className="px-3 py-1 border border-gray-300 rounded-md disabled:opacity-50"
+                disabled={page <= 1}
+                onClick={() => setPage(page - 1)}
+              >
+                &lt;
+              </button>
+              <span>{page} / {pageCount}</span>
+              <button
+                className="px-3 py-1 border border-gray-300 rounded-md disabled:opacity-50"
+                disabled={page >= pageCount}
+                onClick={() => setPage(page + 1)}
+              >
+                &gt;
+              </button>
+            </div>
+          </div>
         </div>
       )}
     </div>
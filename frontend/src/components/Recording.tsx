@@ -1,45 +1,42 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
+import { getSessionId } from '../session';
 
 const API_URL = 'http://localhost:5000/api';
+// Input level meter range in dBFS
+const SILENCE_DB = -60;
 
 const Recording: React.FC = () => {
   const [isRecording, setIsRecording] = useState(false);
   const [recordingTime, setRecordingTime] = useState(0);
+  const [level, setLevel] = useState(SILENCE_DB);
   const [processingTranscription, setProcessingTranscription] = useState(false);
-  const [recordingFilename, setRecordingFilename] = useState('');
   const navigate = useNavigate();
   
-  // Timer for recording
+  // Recording state, elapsed time and input level pushed by the server
   useEffect(() => {
-    let interval: NodeJS.Timeout;
+    if (!isRecording) return;
     
-    if (isRecording) {
-      interval = setInterval(() => {
-        setRecordingTime(prev => prev + 1);
-        
-        // Also check status from server
-        axios.get(`${API_URL}/status`)
-          .then(response => {
-            if (!response.data.is_recording) {
-              setIsRecording(false);
-              clearInterval(interval);
-            }
-          })
-          .catch(err => console.error('Error checking recording status:', err));
-      }, 1000);
-    }
+    const source = new EventSource(`${API_URL}/status-stream?session_id=${encodeURIComponent(getSessionId())}`);
+    source.addEventListener('status', (event) => {
+      const status = JSON.parse((event as MessageEvent).data);
+      if (!status.is_recording) {
+        setIsRecording(false);
+        return;
+      }
+      setRecordingTime(Math.floor(status.elapsed_time));
+      setLevel(status.levels ? status.levels.rms_db : SILENCE_DB);
+    });
+    source.onerror = () => console.error('Status stream interrupted; the browser will reconnect');
     
-    return () => {
-      if (interval) clearInterval(interval);
-    };
+    return () => source.close();
   }, [isRecording]);
   
   // Handle start recording
   const handleStartRecording = async () => {
     try {
-      const response = await axios.post(`${API_URL}/start-recording`);
+      const response = await axios.post(`${API_URL}/start-recording`, { session_id: getSessionId() });
       if (response.data.status === 'recording_started' || response.data.status === 'already_recording') {
         setIsRecording(true);
       }
@@ -48,6 +45,16 @@ const Recording: React.FC = () => {
     }
   };
   
+  // Poll a processing job until it finishes
+  const waitForJob = async (jobId: string) => {
+    while (true) {
+      const response = await axios.get(`${API_URL}/jobs/${jobId}`);
+      if (response.data.status === 'done') return response.data.result;
+      if (response.data.status === 'failed') throw new Error(response.data.error);
+      await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+  };
+  
   // Handle stop recording
   const handleStopRecording = async () => {
     try {
@@ -55,19 +62,19 @@ const Recording: React.FC = () => {
       setProcessingTranscription(true);
       
       // Stop recording
-      const stopResponse = await axios.post(`${API_URL}/stop-recording`);
+      const stopResponse = await axios.post(`${API_URL}/stop-recording`, { session_id: getSessionId() });
       
       if (stopResponse.data.status === 'processing_started') {
-        setRecordingFilename(stopResponse.data.filename);
-        
-        // Process the recording
+        // Queue the recording for processing and wait for the job
+        const recordingId = stopResponse.data.recording_id;
         const processResponse = await axios.post(`${API_URL}/process`, {
-          filename: stopResponse.data.filename
+          recording_id: recordingId
         });
+        await waitForJob(processResponse.data.job_id);
         
         // Navigate to form
         setProcessingTranscription(false);
-        navigate(`/document/${processResponse.data.document}`);
+        navigate(`/document/${recordingId}`);
       }
     } catch (error) {
       console.error('Error stopping recording:', error);
@@ -113,10 +120,11 @@ const Recording: React.FC = () => {
               </div>
               
               <div className="mb-8">
-                <div className="h-16 w-64">
-                  <svg viewBox="0 0 200 60" xmlns="http://www.w3.org/2000/svg" className="w-full h-full">
-                    <path d="M0,30 Q10,10 20,30 T40,30 T60,30 T80,10 T100,50 T120,30 T140,40 T160,20 T180,30 T200,30" fill="none" stroke="#4299e1" strokeWidth="2" />
-                  </svg>
+                <div className="h-3 w-64 bg-gray-200 rounded-full overflow-hidden">
+                  <div
+                    className="h-full bg-blue-500 transition-all duration-100"
+                    style={{ width: `${Math.min(100, Math.max(0, 100 * (level - SILENCE_DB) / -SILENCE_DB))}%` }}
+                  />
                 </div>
               </div>
               
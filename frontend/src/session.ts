@@ -0,0 +1,12 @@
+// Recording session of this browser tab: kept across reloads, separate for every tab,
+// so two doctors (or two tabs) don't start, stop or watch each other's recording
+const SESSION_KEY = 'recording_session_id';
+
+export function getSessionId(): string {
+  let sessionId = sessionStorage.getItem(SESSION_KEY);
+  if (!sessionId) {
+    sessionId = crypto.randomUUID();
+    sessionStorage.setItem(SESSION_KEY, sessionId);
+  }
+  return sessionId;
+}